@@ -1,6 +1,19 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class JobsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'jobs'
+
+    def ready(self):
+        # Keeps the search vectors up to date when a job is saved or a company or category is renamed
+        from jobs import signals  # noqa: F401
+
+        # Processes that serve requests (gunicorn, runserver) build the autocomplete index right
+        # away, the other management commands (migrate, the scrapers, test) have no use for it
+        if os.path.basename(sys.argv[0]) != 'manage.py' or sys.argv[1:2] == ['runserver']:
+            from utils.autocomplete import warm_index
+            warm_index()
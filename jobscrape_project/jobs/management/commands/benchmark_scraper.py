@@ -0,0 +1,74 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from utils.benchmark import (
+    BASELINE_PATH, GATED_METRICS, METRICS, SNAPSHOT_DIR, capture_snapshots, compare_to_baseline, run_benchmark,
+    run_date_benchmark,
+)
+
+class Command(BaseCommand):
+    help = ("Benchmark the scraper offline by replaying listing pages from a local server. The committed "
+            "snapshots only cover Home Depot and J. P. Morgan and are built to their selectors, companies "
+            "without snapshots are skipped; --capture records every company in data/websites.json. Fails "
+            "when the query counts regress against the baseline, timings are only reported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capture', action='store_true',
+                            help='Capture fresh snapshots of every listing page first (needs the real sites)')
+        parser.add_argument('--snapshots', default=SNAPSHOT_DIR, help='Directory of the snapshots')
+        parser.add_argument('--browser', action='store_true',
+                            help='Replay through Chrome, including the paginated and load more variants')
+        parser.add_argument('--repeat', type=int, default=5, help='Rounds per variant, the best value of each metric counts')
+        parser.add_argument('--baseline', default=BASELINE_PATH,
+                            help='JSON file with earlier results to compare against (default: %(default)s)')
+        parser.add_argument('--no-baseline', action='store_true', help='Only print the results')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed regression of the query counts against the baseline (0.25 = 25%%)')
+
+    def handle(self, *args, **kwargs):
+        # Load the websites configuration
+        with open('data/websites.json', 'r') as f:
+            websites = json.load(f)
+
+        if kwargs['capture']:
+            capture_snapshots(websites, kwargs['snapshots'])
+
+        # Never touch the real tables: the benchmark runs against a test database that is dropped afterwards
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = run_benchmark(websites, browser=kwargs['browser'], repeat=kwargs['repeat'],
+                                    snapshot_dir=kwargs['snapshots'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if not results:
+            raise CommandError(f"No snapshots found in {kwargs['snapshots']}, run with --capture first.")
+        results.update(run_date_benchmark())
+
+        for variant, passes in results.items():
+            for scrape_pass, metrics in passes.items():
+                self.stdout.write(f"{variant:10} {scrape_pass:6} " + '  '.join(f"{name}={value}" for name, value in metrics.items()))
+
+        baseline = None
+        if not kwargs['no_baseline']:
+            if not os.path.exists(kwargs['baseline']):
+                raise CommandError(f"Baseline {kwargs['baseline']} not found, pass --no-baseline to skip the comparison.")
+            with open(kwargs['baseline'], 'r') as f:
+                baseline = json.load(f)
+
+        if kwargs['save_baseline']:
+            with open(kwargs['save_baseline'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if baseline is not None:
+            timing_metrics = [metric for metric in METRICS if metric not in GATED_METRICS]
+            for change in compare_to_baseline(results, baseline, kwargs['threshold'], timing_metrics):
+                self.stderr.write(f"Slower than the baseline (timings depend on the machine, not failing): {change}")
+            regressions = compare_to_baseline(results, baseline, kwargs['threshold'])
+            if regressions:
+                raise CommandError("Performance regressed:\n" + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -4,24 +4,46 @@ from datetime import timedelta
 from django.db.models import Q
 
 from jobs.models import JobListing, Company
+from utils.job_partitions import RETENTION_DAYS, drop_partitions
+from utils.purge import DEFAULT_BATCH_SIZE, purge
 
 class Command(BaseCommand):
     help = 'Delete all jobs that are more than a month old'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Jobs deleted per statement')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
     def handle(self, *args, **options):
         # Calculate the date a month ago from now
-        one_month_ago = timezone.now() - timedelta(days=30)
+        one_month_ago = timezone.now() - timedelta(days=RETENTION_DAYS)
+        cutoff_day = timezone.localtime(one_month_ago).date()
 
-        # Get all jobs older than a month, considering both date_posted and discovered_at
-        old_jobs = JobListing.objects.filter(
+        # Get all jobs older than a month, considering both date_posted and discovered_at. The
+        # posted_on condition keeps PostgreSQL to the partitions that can hold them.
+        old_jobs = JobListing.objects.filter(posted_on__lte=cutoff_day).filter(
             Q(date_posted__lt=one_month_ago) | 
             Q(discovered_at__lt=one_month_ago, date_posted__isnull=True)
         )
 
-        # Delete these jobs
-        old_jobs.delete()
+        if options['dry_run']:
+            for name in drop_partitions(cutoff_day, dry_run=True):
+                self.stdout.write(f"Would drop {name}")
+            self.stdout.write(f"Would delete {old_jobs.count()} old jobs")
+            return
+
+        # Whole weeks of expired jobs go with their partition (PostgreSQL only)
+        for name in drop_partitions(cutoff_day):
+            self.stdout.write(f"Dropped {name}")
+
+        # Delete the rest in small batches, so the API's queries never wait long for a lock
+        def report(deleted, total):
+            self.stdout.write(f"Deleted {deleted}/{total} old jobs")
+
+        deleted = purge(old_jobs, batch_size=options['batch_size'], pause=options['pause'], progress=report)
 
-        self.stdout.write(self.style.SUCCESS('Successfully deleted old jobs'))
+        self.stdout.write(self.style.SUCCESS(f'Successfully deleted old jobs: {deleted}'))
         # company_id = 7
         # try:
         #     company = Company.objects.get(id=company_id)  # get the Company instance with the provided id
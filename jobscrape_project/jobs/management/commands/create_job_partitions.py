@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from utils.job_partitions import WEEKS_AHEAD, create_partitions, is_partitioned
+
+class Command(BaseCommand):
+    help = 'Create the weekly JobListing partitions ahead of time (run it from cron, e.g. daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks-ahead', type=int, default=WEEKS_AHEAD, help='Weeks to create partitions for')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write("JobListing is not partitioned on this database, nothing to do.")
+            return
+
+        created = create_partitions(weeks_ahead=options['weeks_ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(f'Successfully created {len(created)} partitions'))
@@ -0,0 +1,34 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.models import ScrapeRun
+
+from utils.telemetry import get_run_stats, to_prometheus
+
+class Command(BaseCommand):
+    help = "Export the stage timings and job counts of a scrape run as JSON or Prometheus text"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', type=int, help='Id of the scrape run (defaults to the latest one)')
+        parser.add_argument('--format', choices=['json', 'prometheus'], default='json')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['run'] is not None:
+            run = ScrapeRun.objects.filter(id=kwargs['run']).first()
+        else:
+            run = ScrapeRun.objects.order_by('-started_at').first()
+        if run is None:
+            raise CommandError("No scrape run found.")
+
+        run_stats = get_run_stats(run)
+        if kwargs['format'] == 'prometheus':
+            output = to_prometheus(run_stats)
+        else:
+            output = json.dumps(run_stats, indent=2) + '\n'
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output, ending='')
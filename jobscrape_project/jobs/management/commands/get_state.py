@@ -1,53 +1,79 @@
-from django.core.management.base import BaseCommand
-from jobs.models import JobListing
-import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from jobs.models import JobListing, LocationState
+from utils.gazetteer import resolve_state
+from utils.geocoding import (DEFAULT_REQUESTS_PER_SECOND, DEFAULT_WORKERS, GEOCODING_URL, Geocoder,
+                             normalize_location)
 import os
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_location_info(location, API_KEY):
-    response = requests.get(f'https://maps.googleapis.com/maps/api/geocode/json?address={location}&types=administrative_area_level_2&key={API_KEY}')
-    data = response.json()
-    administrative_area_level_1 = None
+# Keeps the IN (...) lists under the database's parameter limit
+BATCH_SIZE = 500
+
+
+def get_cached_states(keys):
+    cached = {}
+    for i in range(0, len(keys), BATCH_SIZE):
+        cached.update(LocationState.objects.filter(location__in=keys[i:i + BATCH_SIZE]).values_list('location', 'state'))
+    return cached
 
-    if data['results']:
-        for component in data['results'][0]['address_components']:
-            if 'administrative_area_level_1' in component['types']:
-                administrative_area_level_1 = component['long_name']
-                break
-    return administrative_area_level_1
 
 class Command(BaseCommand):
     help = 'Get State name by giving the city name'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Geocoding requests in flight')
+        parser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                            help='Geocoding requests per second')
+        parser.add_argument('--endpoint', default=os.getenv('GEOCODING_URL', GEOCODING_URL),
+                            help='Geocoding endpoint, e.g. a local stand-in for testing')
+
     def handle(self, *args, **options):
         API_KEY = os.getenv('GOOGLE_GEO_LOCATION_API')
-        job_listings = JobListing.objects.exclude(location__iexact='United States').exclude(state_location__isnull=False)
+        job_listings = JobListing.objects.exclude(location__iexact='United States').exclude(state_location__isnull=False).exclude(location__isnull=True)
+
+        # Thousands of jobs share a few hundred locations: look up each distinct one once, ever
+        locations_by_key = {}
+        for location in job_listings.values_list('location', flat=True).distinct():
+            locations_by_key.setdefault(normalize_location(location), []).append(location)
+        # Most are placed by the offline gazetteer, only the rest need the cache or the API
+        states = {}
+        for key, locations in locations_by_key.items():
+            state = resolve_state(locations[0])
+            if state:
+                states[key] = state
+        resolved_offline = len(states)
+        states.update(get_cached_states([key for key in locations_by_key if key not in states]))
+
+        unseen = [key for key in locations_by_key if key not in states]
+        if unseen:
+            if not API_KEY and options['endpoint'] == GEOCODING_URL:
+                raise CommandError('GOOGLE_GEO_LOCATION_API is not set.')
+            geocoder = Geocoder(API_KEY, url=options['endpoint'], workers=options['workers'],
+                                requests_per_second=options['rate'])
+            # Geocode the first spelling seen, the normalized key loses the capitalization
+            found = geocoder.get_states([locations_by_key[key][0] for key in unseen])
+            new_states = {normalize_location(location): state for location, state in found.items()}
+            LocationState.objects.bulk_create(
+                [LocationState(location=key, state=state) for key, state in new_states.items()],
+                ignore_conflicts=True,
+            )
+            states.update(new_states)
+            for key in unseen:
+                if key not in new_states:
+                    self.stdout.write(self.style.ERROR(f'State name extraction failed for location: {locations_by_key[key][0]}'))
+
+        # One UPDATE per location instead of a save() per job
         count = 0
-        if job_listings:
-            for job in job_listings:
-                try:
-                    location_info = get_location_info(job.location, API_KEY)
-                    if location_info == None:
-                        job.state_location = 'United States'
-                    else:
-                        job.state_location = location_info
-                    job.save()
-                    count +=1
-                except (IndexError, KeyError):
-                    self.stdout.write(self.style.ERROR(f'State name extraction failed for job id: {job.id}'))
-        self.stdout.write(self.style.SUCCESS(f"All the location's States are Added: {count}"))
-
-            
-        
-
-    
-        
-        
-
-        
-
-    
-        
+        with transaction.atomic():
+            for key, locations in locations_by_key.items():
+                if key in states:
+                    for location in locations:
+                        count += job_listings.filter(location=location).update(state_location=states[key])
+        self.stdout.write(self.style.SUCCESS(
+            f"All the location's States are Added: {count} ({len(unseen)} locations looked up, "
+            f"{resolved_offline} resolved offline, {len(locations_by_key) - len(unseen) - resolved_offline} from the cache)"
+        ))
@@ -1,14 +1,47 @@
 import json
+from collections import Counter
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 import time
 
+from jobs.models import ScrapeRun
+
+from utils.browser import BrowserProfile
+from utils.dimension_cache import DimensionCache
+from utils.extraction import load_extractors
 from utils.job_scraper import JobScraper
+from utils.politeness import PolitenessScheduler
+from utils.scrape_pool import get_scrape_units, scrape_in_parallel
+
+# ScrapeRun.source of the runs this command starts
+RUN_SOURCE = 'scrape_jobs'
 
 class Command(BaseCommand):
     help = "Command to start scraping jobs"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of browser worker processes to scrape with in parallel')
+        parser.add_argument('--page-load-strategy', choices=['normal', 'eager', 'none'], default='eager',
+                            help='When driver.get() returns: after the load event, after DOMContentLoaded, or right away')
+        parser.add_argument('--recycle-pages', type=int, default=50,
+                            help='Restart Chrome after this many pages (0 to disable)')
+        parser.add_argument('--max-browser-memory', type=int, default=1024,
+                            help='Restart Chrome once its processes use more than this many MB (0 to disable)')
+        parser.add_argument('--load-resources', action='store_true',
+                            help="Don't block images, fonts, media and trackers")
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the last unfinished run instead of starting over')
+
     def handle(self, *args, **kwargs):
         start_time = time.time()
+        workers = kwargs['workers']
+        browser_profile = BrowserProfile(
+            page_load_strategy=kwargs['page_load_strategy'],
+            block_resources=not kwargs['load_resources'],
+            recycle_after_pages=kwargs['recycle_pages'],
+            max_memory_mb=kwargs['max_browser_memory'],
+        )
 
         # Load the websites configuration
         with open('data/websites.json', 'r') as f:
@@ -16,18 +49,53 @@ class Command(BaseCommand):
 
         job_categories = websites.get('job_categories', {})
         job_types = websites.get('job_types', {})
-        # Initialize the scraper
-        scraper = JobScraper(driver_path='drivers/chromedriver.exe', dynamic=True)
-        # Scrape jobs
-        all_job_listings = []
-        for website in websites["companies"]:
-            job_listings = scraper.scrape_jobs(website, job_categories, job_types)
-            all_job_listings.extend(job_listings)
-
-        for job in all_job_listings:
-            self.stdout.write(self.style.SUCCESS(f"Scraped job: {job}"))
-        
+        # Compile each site's selectors once for the whole run
+        load_extractors(websites)
+        # Resolve every company, category, job type and tag once for the whole run
+        dimensions = DimensionCache.from_websites(websites)
+        # Per-host concurrency and rate limits, shared by all workers
+        scheduler = PolitenessScheduler.from_websites(websites)
+        # Every job seen during this run is stamped with its id
+        run = None
+        if kwargs['resume']:
+            # Only runs of this command, benchmarks and scrapers used on their own never finish theirs
+            run = ScrapeRun.objects.filter(source=RUN_SOURCE, finished_at__isnull=True).order_by('-started_at').first()
+            if run is None:
+                self.stdout.write("No unfinished run to resume, starting a new one.")
+            else:
+                self.stdout.write(f"Resuming scrape run {run.id} from {run.started_at}.")
+        if run is None:
+            run = ScrapeRun.objects.create(source=RUN_SOURCE)
+        # Scrape jobs, every page is written to the database as soon as it has been extracted
+        stats = Counter()
+        if workers > 1:
+            units = get_scrape_units(websites, dimensions)
+            stats = scrape_in_parallel(units, workers, driver_path='drivers/chromedriver.exe', run_id=run.id,
+                                                  browser_profile=browser_profile, scheduler=scheduler)
+        else:
+            # Initialize the scraper
+            scraper = JobScraper(driver_path='drivers/chromedriver.exe', dynamic=True, dimensions=dimensions, run_id=run.id,
+                                 browser_profile=browser_profile, scheduler=scheduler)
+            for website in websites["companies"]:
+                stats += scraper.scrape_jobs(website, job_categories, job_types)
+            scraper.close()
+
+        if stats['failed slices']:
+            # Left unfinished, so --resume can scrape the failed slices again
+            self.stderr.write(f"{stats['failed slices']} slices failed, resume run {run.id} with --resume.")
+        else:
+            run.finished_at = timezone.now()
+            run.save()
+            # The run's progress is only needed to resume it
+            run.checkpoints.all().delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scraped {stats['new'] + stats['existing']} jobs: {stats['new']} new, {stats['existing']} already known "
+            f"({stats['changed']} of them changed), "
+            f"{stats['unchanged pages']} unchanged pages skipped"
+        ))
+
         time_difference = time.time() - start_time
-        print(f'Scraping time: %.2f seconds.' % time_difference)
-    
-    
+        self.stdout.write('Scraping time: %.2f seconds.' % time_difference)
+
+
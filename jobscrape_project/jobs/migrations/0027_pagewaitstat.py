@@ -0,0 +1,22 @@
+# Generated by Django 3.2.2 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0026_alter_joblisting_state_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageWaitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=200, unique=True)),
+                ('samples', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.2 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0027_pagewaitstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='joblisting',
+            name='to_be_deleted',
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='last_seen_run',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['company', 'category', 'job_type', 'last_seen_run'], name='jobs_joblis_company_3eabb4_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0028_scraperun_last_seen_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500)),
+                ('page', models.PositiveIntegerField(default=1)),
+                ('etag', models.CharField(blank=True, max_length=200, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=100, null=True)),
+                ('fingerprint', models.CharField(max_length=40, null=True)),
+                ('job_hashes', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('url', 'page')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0030_scrapecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(blank=True, max_length=500)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('pages_unchanged', models.PositiveIntegerField(default=0)),
+                ('navigation_seconds', models.FloatField(default=0)),
+                ('wait_seconds', models.FloatField(default=0)),
+                ('interaction_seconds', models.FloatField(default=0)),
+                ('parse_seconds', models.FloatField(default=0)),
+                ('write_seconds', models.FloatField(default=0)),
+                ('jobs_found', models.PositiveIntegerField(default=0)),
+                ('jobs_created', models.PositiveIntegerField(default=0)),
+                ('jobs_updated', models.PositiveIntegerField(default=0)),
+                ('jobs_removed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='jobs.company')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='jobs.scraperun')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0031_scrapestat'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='listingpage',
+            old_name='job_hashes',
+            new_name='job_keys',
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='identity_key',
+            field=models.CharField(max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:17
+
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# Frozen copy of utils.job_identity as of this migration, the keys it backfills must not change
+# with later edits there.
+
+# Query parameters that say how a visitor got to the job, not which job it is
+TRACKING_PARAMS = {
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', '_gl', 'yclid',
+    'ref', 'referer', 'referrer', 'refid', 'source', 'src', 'trk', 'trackingid', 'sessionid',
+    'jsessionid', 'campaign', 'campaignid', 'iis', 'iisn',
+}
+TRACKING_PREFIXES = ('utm_', 'hsa_', 'pk_', 'mtm_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_link(link, base_url=None):
+    # Absolute url, lower case scheme and host, no default port, fragment, tracking parameters or
+    # trailing slash, remaining parameters sorted. Two links to the same job come out the same.
+    if not link:
+        return None
+    link = link.strip()
+    if base_url:
+        link = urljoin(base_url, link)
+    parts = urlsplit(link)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def get_identity_key(title, link, base_url=None, company_name=None):
+    # Which job this is: its canonical url, or the company and title for jobs without a link
+    canonical_link = canonicalize_link(link, base_url)
+    if canonical_link:
+        identity = canonical_link
+    else:
+        identity = f'{company_name}\n{title}'
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def get_content_hash(title, location, date_posted, link):
+    # What the job looks like: any change means the stored row has to be updated. Dates count by
+    # day, so "3 days ago" scraped again tomorrow as "4 days ago" is no change.
+    date = date_posted.date().isoformat() if date_posted is not None else ''
+    content = '\0'.join((title or '', location or '', date, link or ''))
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def backfill_identity_keys(apps, schema_editor):
+    JobListing = apps.get_model('jobs', 'JobListing')
+    ListingPage = apps.get_model('jobs', 'ListingPage')
+
+    # Relative and absolute links to the same job used to make two rows. Keep the one seen
+    # most recently and drop the others before the key becomes unique.
+    seen_keys = set()
+    duplicate_ids = []
+    batch = []
+    jobs = (
+        JobListing.objects.select_related('company')
+        .only('id', 'title', 'location', 'date_posted', 'link', 'company__name', 'company__job_base_url')
+        .order_by('-last_seen_run', '-id')
+    )
+    for job in jobs.iterator(chunk_size=BATCH_SIZE):
+        job.identity_key = get_identity_key(job.title, job.link, job.company.job_base_url, job.company.name)
+        if job.identity_key in seen_keys:
+            duplicate_ids.append(job.id)
+            continue
+        seen_keys.add(job.identity_key)
+        job.content_hash = get_content_hash(job.title, job.location, job.date_posted, job.link)
+        batch.append(job)
+        if len(batch) >= BATCH_SIZE:
+            JobListing.objects.bulk_update(batch, ['identity_key', 'content_hash'])
+            batch = []
+    JobListing.objects.bulk_update(batch, ['identity_key', 'content_hash'])
+
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        JobListing.objects.filter(id__in=duplicate_ids[start:start + BATCH_SIZE]).delete()
+
+    # The pages remember their jobs by the old hashes, make the next run scrape them in full
+    ListingPage.objects.update(fingerprint=None, etag=None, last_modified=None, job_keys=[])
+
+
+class Migration(migrations.Migration):
+    # Separate from the schema changes around it, Postgres won't alter a table with pending trigger events
+
+    dependencies = [
+        ('jobs', '0032_job_identity_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_identity_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0033_backfill_identity_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='joblisting',
+            name='identity_key',
+            field=models.CharField(max_length=40, null=True, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='joblisting',
+            name='hash',
+        ),
+    ]
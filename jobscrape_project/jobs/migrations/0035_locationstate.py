@@ -0,0 +1,22 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0034_remove_joblisting_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=200, unique=True)),
+                ('state', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
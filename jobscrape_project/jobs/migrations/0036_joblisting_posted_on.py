@@ -0,0 +1,26 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:23
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+import django.utils.timezone
+
+
+def backfill_posted_on(apps, schema_editor):
+    JobListing = apps.get_model('jobs', 'JobListing')
+    JobListing.objects.update(posted_on=TruncDate(Coalesce('date_posted', 'discovered_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0035_locationstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joblisting',
+            name='posted_on',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(backfill_posted_on, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:23
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of what utils.job_partitions looked like when this was written, later changes
+# there must not change what this migration does
+TABLE = 'jobs_joblisting'
+DEFAULT_PARTITION = f'{TABLE}_default'
+RETENTION_DAYS = 30
+WEEKS_AHEAD = 8
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def recreate_table(schema_editor, model, partitioned):
+    # PostgreSQL can't partition a table in place (or undo it): the rows are copied into a new table
+    # that takes over the name and sequence. Its keys, foreign keys and indexes are then created
+    # again from the model, the way Django created them on the old one.
+    old_table = f'{TABLE}_old'
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {old_table}")
+    schema_editor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {old_table} INCLUDING DEFAULTS)"
+        + (" PARTITION BY RANGE (posted_on)" if partitioned else "")
+    )
+    schema_editor.execute(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    if partitioned:
+        # One partition per week starting on Monday, from the oldest week still kept, plus a
+        # default partition for dates outside all of them. Created first, so the rows are copied
+        # straight into the right one.
+        schema_editor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+        today = timezone.localdate()
+        week = week_start(today - timedelta(days=RETENTION_DAYS))
+        while week <= week_start(today + timedelta(weeks=WEEKS_AHEAD)):
+            schema_editor.execute(
+                f"CREATE TABLE {TABLE}_p{week:%Y%m%d} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{week.isoformat()}') TO ('{(week + timedelta(weeks=1)).isoformat()}')"
+            )
+            week += timedelta(weeks=1)
+    schema_editor.execute(f"INSERT INTO {TABLE} SELECT * FROM {old_table}")
+    # Dropped before the keys and indexes are added, their names are still taken until then
+    schema_editor.execute(f"DROP TABLE {old_table}")
+
+    # The partition key has to be part of the primary key and every unique constraint
+    primary_key = ['id', 'posted_on'] if partitioned else ['id']
+    schema_editor.execute(schema_editor.sql_create_pk % {
+        'table': schema_editor.quote_name(TABLE),
+        'name': schema_editor.quote_name(f'{TABLE}_pkey'),
+        'columns': ', '.join(schema_editor.quote_name(column) for column in primary_key),
+    })
+    for field in model._meta.local_fields:
+        if field.unique and not field.primary_key:
+            schema_editor.execute(schema_editor._create_unique_sql(model, [field.column]))
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+    for constraint in model._meta.constraints:
+        schema_editor.add_constraint(model, constraint)
+    # Field indexes (foreign keys, LIKE indexes of indexed varchar columns) and Meta.indexes
+    for statement in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(statement)
+
+
+# Only PostgreSQL tables are partitioned, elsewhere (the sqlite development database) this does nothing
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        recreate_table(schema_editor, apps.get_model('jobs', 'JobListing'), partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        recreate_table(schema_editor, apps.get_model('jobs', 'JobListing'), partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0036_joblisting_posted_on'),
+    ]
+
+    operations = [
+        # What the partitioned table can enforce: the identity key is unique per posted_on.
+        # ingest_jobs looks jobs up by identity key before inserting, so that's enough.
+        migrations.AlterField(
+            model_name='joblisting',
+            name='identity_key',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='joblisting',
+            constraint=models.UniqueConstraint(fields=('identity_key', 'posted_on'), name='jobs_joblisting_identity_key_posted_on_uniq'),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
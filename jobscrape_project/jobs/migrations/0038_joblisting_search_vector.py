@@ -0,0 +1,66 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    # GIN and other PostgreSQL-only indexes: the sqlite development database goes without them
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def get_search_vector(company_name, category_name):
+    # Frozen copy of utils.search.get_search_vector as of this migration
+    return (
+        SearchVector('title', weight='A', config='english')
+        + SearchVector(Value(company_name or ''), weight='B', config='english')
+        + SearchVector(Value(category_name or ''), weight='C', config='english')
+        + SearchVector('location', weight='D', config='english')
+    )
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # tsvectors only exist on PostgreSQL, elsewhere search_vector stays empty
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    JobListing = apps.get_model('jobs', 'JobListing')
+    Company = apps.get_model('jobs', 'Company')
+    Category = apps.get_model('jobs', 'Category')
+    companies = Company.objects.in_bulk()
+    categories = Category.objects.in_bulk()
+    # One UPDATE per company and category, the names go in as values
+    slices = JobListing.objects.values_list('company_id', 'category_id').distinct()
+    for company_id, category_id in slices:
+        category = categories.get(category_id)
+        JobListing.objects.filter(company_id=company_id, category_id=category_id).update(
+            search_vector=get_search_vector(companies[company_id].name, category.name if category else None)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0037_partition_joblisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joblisting',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        PostgresAddIndex(
+            model_name='joblisting',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='jobs_joblisting_search_gin'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:27
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    # GIN and other PostgreSQL-only indexes: the sqlite development database goes without them
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0038_joblisting_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PostgresAddIndex(
+            model_name='joblisting',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='jobs_joblisting_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.2 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0039_joblisting_title_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scraperun',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 from django.db.models import Q
@@ -60,10 +62,120 @@ class JobListing(models.Model):
     state_location = models.CharField(max_length=200, null=True, blank=True)
     date_posted = models.DateTimeField(blank=True, null=True)
     link = models.URLField(max_length=500, null=True)
-    hash = models.CharField(max_length=32, unique=True,
-                            null=True)  # MD5 hash length is 32
-    to_be_deleted = models.BooleanField(default=False)
+    # SHA-1 of the job's canonical url (see utils.job_identity), what a scraped job is matched on.
+    # Unique per posted_on only (see Meta), the partition key has to be part of every unique key.
+    identity_key = models.CharField(max_length=40, null=True)
+    # Short hash of the scraped fields, tells a changed job from an unchanged one
+    content_hash = models.CharField(max_length=16, null=True, blank=True)
+    # Id of the last ScrapeRun that saw this job, rows of a scraped slice that weren't seen get deleted
+    last_seen_run = models.BigIntegerField(default=0)
     discovered_at = models.DateTimeField(auto_now_add=True)
+    # Day the job was posted, or discovered if the site doesn't say. On PostgreSQL the table is
+    # partitioned by it (see utils.job_partitions).
+    posted_on = models.DateField(default=timezone.localdate)
+    # Weighted title, company, category and location, kept up to date at ingestion (utils.search)
+    # and by jobs.signals when a job is saved
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'category', 'job_type', 'last_seen_run']),
+            GinIndex(fields=['search_vector'], name='jobs_joblisting_search_gin'),
+            # Trigram index for the typo tolerant title search
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='jobs_joblisting_title_trgm'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['identity_key', 'posted_on'], name='jobs_joblisting_identity_key_posted_on_uniq'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ListingPage(models.Model):
+    # What a listing page looked like when it was last scraped, used to skip unchanged pages
+    url = models.URLField(max_length=500)
+    page = models.PositiveIntegerField(default=1)
+    etag = models.CharField(max_length=200, null=True, blank=True)
+    last_modified = models.CharField(max_length=100, null=True, blank=True)
+    fingerprint = models.CharField(max_length=40, null=True)  # SHA-1 of the page's job elements
+    job_keys = models.JSONField(default=list)  # identity keys of the page's jobs
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('url', 'page')
+
+    def __str__(self):
+        return f"{self.url} (page {self.page})"
+
+
+class ScrapeRun(models.Model):
+    # What started the run: the scrape_jobs command, or empty for benchmarks and scrapers used on their own
+    source = models.CharField(max_length=50, blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Only set once every slice of the run was scraped, a run with failed slices can be resumed
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Scrape run {self.id}"
+
+
+class ScrapeStat(models.Model):
+    # Where the time of one listing url went during a run, and what came out of it. Rows with
+    # an empty url hold the jobs a slice's reconciliation removed.
+    run = models.ForeignKey(ScrapeRun, on_delete=models.CASCADE, related_name='stats')
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True)
+    url = models.URLField(max_length=500, blank=True)
+    pages = models.PositiveIntegerField(default=0)
+    pages_unchanged = models.PositiveIntegerField(default=0)
+    navigation_seconds = models.FloatField(default=0)
+    wait_seconds = models.FloatField(default=0)
+    interaction_seconds = models.FloatField(default=0)  # load more clicks and infinite scrolling
+    parse_seconds = models.FloatField(default=0)
+    write_seconds = models.FloatField(default=0)
+    jobs_found = models.PositiveIntegerField(default=0)
+    jobs_created = models.PositiveIntegerField(default=0)
+    jobs_updated = models.PositiveIntegerField(default=0)
+    jobs_removed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.url or self.company} (run {self.run_id})"
+
+
+class ScrapeCheckpoint(models.Model):
+    # Progress of one listing url within a run, so an interrupted run can be resumed
+    run = models.ForeignKey(ScrapeRun, on_delete=models.CASCADE, related_name='checkpoints')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    job_type = models.ForeignKey(JobType, on_delete=models.CASCADE)
+    url = models.URLField(max_length=500)
+    pages_done = models.PositiveIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('run', 'company', 'category', 'job_type', 'url')
+
+    def __str__(self):
+        return f"{self.url} (run {self.run_id}, {self.pages_done} pages)"
+
+
+class PageWaitStat(models.Model):
+    # Recent page readiness wait times (seconds) per site, used to tighten its timeout
+    site = models.CharField(max_length=200, unique=True)
+    samples = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.site
+
+
+class LocationState(models.Model):
+    # Geocoded state of a job location, so each distinct location is only looked up once
+    location = models.CharField(max_length=200, unique=True)  # normalized, see utils.geocoding
+    state = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.location}: {self.state}"
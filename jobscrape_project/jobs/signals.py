@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from jobs.models import Category, Company, JobListing
+from utils.search import update_search_vectors
+
+# Fields of a job that go into its search vector
+VECTOR_FIELDS = {'title', 'location', 'company', 'company_id', 'category', 'category_id'}
+
+
+# The company and category names are stored in the search vectors of their jobs, so renaming
+# one has to recompute them: one UPDATE per company and category, like the ingestion does.
+@receiver(pre_save, sender=Company)
+@receiver(pre_save, sender=Category)
+def check_renamed(sender, instance, **kwargs):
+    instance._renamed = instance.pk is not None and sender.objects.filter(pk=instance.pk).exclude(name=instance.name).exists()
+
+
+@receiver(post_save, sender=Company)
+def update_company_vectors(sender, instance, **kwargs):
+    if getattr(instance, '_renamed', False):
+        category_ids = set(JobListing.objects.filter(company=instance).values_list('category_id', flat=True).distinct())
+        categories = Category.objects.in_bulk(category_ids - {None})
+        for category_id in category_ids:
+            update_search_vectors(JobListing.objects.filter(company=instance, category_id=category_id),
+                                  instance, categories.get(category_id))
+
+
+@receiver(post_save, sender=Category)
+def update_category_vectors(sender, instance, **kwargs):
+    if getattr(instance, '_renamed', False):
+        companies = Company.objects.in_bulk(set(JobListing.objects.filter(category=instance).values_list('company_id', flat=True).distinct()))
+        for company_id, company in companies.items():
+            update_search_vectors(JobListing.objects.filter(company_id=company_id, category=instance),
+                                  company, instance)
+
+
+# Scraped jobs are written in bulk and get their vectors at ingestion, this covers the ones
+# created or edited one at a time (the API, the admin) so that they can be searched too
+@receiver(post_save, sender=JobListing)
+def update_job_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or VECTOR_FIELDS & set(update_fields):
+        update_search_vectors(JobListing.objects.filter(pk=instance.pk), instance.company, instance.category)
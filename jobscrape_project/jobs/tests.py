@@ -1,3 +1,1145 @@
-from django.test import TestCase
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import StringIO
+import json
+import threading
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import slugify
+from requests.exceptions import HTTPError, RequestException
+
+from jobs.models import (
+    Category, Company, JobListing, JobType, LocationState, ScrapeCheckpoint, ScrapeRun, ScrapeStat,
+)
+from utils import date_conversion
+from utils.api_source import ApiSource, PageLimitReached
+from utils.autocomplete import TitleIndex, warm_index
+from utils.benchmark import BASELINE_PATH, SnapshotServer, best_of, compare_to_baseline, load_snapshots
+from utils.checkpoints import SliceCheckpoints
+from utils.date_conversion import convert_date_format, convert_dates
+from utils.dimension_cache import DimensionCache
+from utils.extraction import SiteExtractor, SoupExtractor, get_extractor
+from utils.gazetteer import resolve_state
+from utils.http_fetcher import StaticFetcher
+from utils.job_identity import canonicalize_link, get_content_hash, get_identity_key
+from utils.job_ingestion import ingest_jobs
+from utils.job_scraper import JobScraper
+from utils.page_readiness import MIN_WAIT, PageNotReady, PageReadiness, get_adaptive_timeout
+from utils.politeness import DomainPolicy, PolitenessScheduler, TokenBucket
+from utils.purge import purge
+from utils.scrape_pipeline import FetchedPage, ScrapePipeline
+from utils.scrape_pool import get_scrape_units, scrape_in_parallel
+from utils.search import search_jobs
+from utils.telemetry import get_run_stats, to_prometheus
+
+
+class PageReadinessTests(TestCase):
+    website_config = {'company_name': 'Test', 'job_selector': '.job', 'max_wait': 15}
+
+    def test_adaptive_timeout_tightens_to_fast_sites(self):
+        self.assertEqual(get_adaptive_timeout([0.1] * 10, 15), MIN_WAIT)
+        self.assertEqual(get_adaptive_timeout([0.1] * 2, 15), 15)
+
+    def test_waits_for_more_jobs_use_the_full_max_wait(self):
+        readiness = PageReadiness(self.website_config)
+        readiness.timeout = MIN_WAIT
+        with mock.patch.object(readiness, 'wait', return_value=False) as wait:
+            readiness.wait_for_job_count_change(None, 10)
+            readiness.wait_for_job_signature_change(None, 'a')
+            readiness.wait_for_height_or_count_change(None, 100, 10)
+        for call in wait.call_args_list:
+            self.assertEqual(call.kwargs['timeout'], 15)
+
+    def test_slow_page_gets_the_full_max_wait_for_its_jobs(self):
+        readiness = PageReadiness(self.website_config)
+        readiness.timeout = MIN_WAIT
+        with mock.patch.object(readiness, 'wait_for_page', return_value=False), \
+                mock.patch.object(readiness, 'wait', return_value=True) as wait:
+            self.assertTrue(readiness.wait_for_jobs(None))
+        self.assertEqual(wait.call_args.kwargs['timeout'], 15)
+
+    def test_ready_page_with_jobs_needs_no_second_wait(self):
+        readiness = PageReadiness(self.website_config)
+        with mock.patch.object(readiness, 'wait_for_page', return_value=True), \
+                mock.patch.object(readiness, 'count_jobs', return_value=3), \
+                mock.patch.object(readiness, 'wait') as wait:
+            self.assertTrue(readiness.wait_for_jobs(None))
+        wait.assert_not_called()
+
+
+class LoadWebsiteTests(TestCase):
+    website_config = {'company_name': 'Test', 'job_selector': '.job', 'dynamic': True}
+
+    def test_raises_once_every_attempt_failed(self):
+        # Returning normally would let scrape_job_urls delete the jobs of a page that never loaded
+        scraper = JobScraper(None, dynamic=True)
+        scraper.browser_profile = mock.Mock(**{'needs_recycling.return_value': False})
+        scraper._driver = mock.Mock(**{'get.side_effect': RequestException('down')})
+        try:
+            with mock.patch('utils.job_scraper.time.sleep'):
+                with self.assertRaises(RequestException):
+                    scraper.load_website('https://example.com/jobs', website_config=self.website_config)
+            self.assertEqual(scraper._driver.get.call_count, 3)
+        finally:
+            scraper._driver = None
+            scraper.close()
+
+    def test_raises_when_the_page_shows_no_jobs(self):
+        scraper = JobScraper(None, dynamic=True)
+        scraper.browser_profile = mock.Mock(**{'needs_recycling.return_value': False})
+        scraper._driver = mock.Mock()
+        readiness = scraper.get_readiness(self.website_config)
+        try:
+            with mock.patch.object(readiness, 'wait_for_jobs', return_value=False), \
+                    mock.patch.object(scraper, 'scrape_browser_page') as scrape_browser_page:
+                with self.assertRaises(PageNotReady):
+                    scraper.load_website('https://example.com/jobs', website_config=self.website_config)
+            scrape_browser_page.assert_not_called()
+        finally:
+            scraper._driver = None
+            scraper.close()
+
+
+class RecycleBetweenPagesTests(TestCase):
+    website_config = {'company_name': 'Test', 'job_selector': '.job', 'dynamic': True}
+    url = 'https://example.com/jobs'
+
+    def scrape(self, page_urls):
+        # Pages through a listing of len(page_urls) + 1 pages, Chrome needs recycling after 3 pages
+        scraper = JobScraper(None, dynamic=True)
+        self.drivers = [mock.Mock(current_url=self.url) for _ in range(2)]
+        scraper.browser_profile = mock.Mock(**{'create_driver.side_effect': self.drivers})
+        scraper.browser_profile.needs_recycling.side_effect = lambda driver, pages_loaded: pages_loaded >= 3
+        readiness = scraper.get_readiness(self.website_config)
+        scraped = []
+
+        def navigate_next_page(next_page_selector, readiness):
+            if len(scraped) > len(page_urls):
+                return False
+            scraper.driver.current_url = page_urls[len(scraped) - 1]
+            scraper.pages_loaded += 1
+            return True
+
+        def scrape_browser_page(url, page, *args):
+            scraped.append((page, self.drivers.index(scraper.driver)))
+
+        try:
+            with mock.patch.object(readiness, 'wait_for_jobs', return_value=True), \
+                    mock.patch.object(scraper, 'navigate_next_page', side_effect=navigate_next_page), \
+                    mock.patch.object(scraper, 'scrape_browser_page', side_effect=scrape_browser_page):
+                scraper.load_website(self.url, next_page_selector='.next', website_config=self.website_config)
+        finally:
+            scraper.close()
+        return scraped
+
+    def test_chrome_is_replaced_within_a_long_listing(self):
+        scraped = self.scrape([f'{self.url}?page={page}' for page in range(2, 5)])
+        self.assertEqual(scraped, [(1, 0), (2, 0), (3, 1), (4, 1)])
+        self.drivers[0].quit.assert_called_once_with()
+        # The new browser picks up at the page the old one was on
+        self.drivers[1].get.assert_called_once_with(f'{self.url}?page=3')
+
+    def test_pages_without_their_own_url_keep_the_browser(self):
+        scraped = self.scrape([self.url] * 3)
+        self.assertEqual(scraped, [(1, 0), (2, 0), (3, 0), (4, 0)])
+        self.drivers[0].quit.assert_called_once_with()  # by close()
+
+
+class StaticUnchangedPageTests(TestCase):
+    def test_not_modified_page_counts_as_unchanged(self):
+        scraper = JobScraper(None)
+        response = mock.Mock(status_code=304)
+        response.elapsed.total_seconds.return_value = 0.1
+        scraper.fetcher = mock.Mock(**{'fetch_all.return_value': [response]})
+        try:
+            with mock.patch('utils.job_scraper.PageTracker') as tracker:
+                tracker.return_value.refresh.return_value = True
+                scraper.scrape_static_urls(['https://example.com/jobs'], {'company_name': 'Test'}, None, None, None)
+            self.assertEqual(scraper.pipeline.flush(), [])
+            self.assertEqual(scraper.stats['unchanged pages'], 1)
+        finally:
+            scraper.close()
+
+
+class ApiPaginationTests(TestCase):
+    def get_source(self, **api):
+        return ApiSource({'api': {'fields': {}, 'page_size': 20, **api}})
+
+    def test_stops_at_the_total(self):
+        source = self.get_source()
+        self.assertTrue(source.has_next_page(1, 20, 45))
+        self.assertFalse(source.has_next_page(3, 5, 45))
+
+    def test_stops_at_a_short_page_without_total(self):
+        source = self.get_source()
+        self.assertTrue(source.has_next_page(1, 20, None))
+        self.assertFalse(source.has_next_page(2, 7, None))
+
+    def test_max_pages_with_jobs_left_raises(self):
+        source = self.get_source(max_pages=2)
+        with self.assertRaises(PageLimitReached):
+            source.has_next_page(2, 20, 100)
+        with self.assertRaises(PageLimitReached):
+            source.has_next_page(2, 20, None)
+
+    def test_max_pages_on_the_last_page_is_fine(self):
+        source = self.get_source(max_pages=2)
+        self.assertFalse(source.has_next_page(2, 20, 40))
+        self.assertFalse(source.has_next_page(2, 3, None))
+
+
+class DateConversionTests(TestCase):
+    def setUp(self):
+        date_conversion.site_formats.clear()
+
+    def assertDaysAgo(self, date_str, days):
+        self.assertEqual(convert_date_format(date_str).date(), (timezone.now() - timedelta(days=days)).date())
+
+    def test_absolute_formats(self):
+        self.assertEqual(convert_date_format('2023-06-15'), datetime(2023, 6, 15))
+        self.assertEqual(convert_date_format('Jun 15, 2023'), datetime(2023, 6, 15))
+        self.assertEqual(convert_date_format('15 June 2023'), datetime(2023, 6, 15))
+        self.assertEqual(convert_date_format('06/15/2023'), datetime(2023, 6, 15))
+        self.assertEqual(convert_date_format('2023-06-15T08:30:00').date(), datetime(2023, 6, 15).date())
+
+    def test_relative_dates(self):
+        self.assertDaysAgo('Today', 0)
+        self.assertDaysAgo('Yesterday', 1)
+        self.assertDaysAgo('30+ days ago', 30)
+        self.assertDaysAgo('5d', 5)
+        self.assertDaysAgo('2 weeks ago', 14)
+
+    def test_posted_and_weekday_prefixes(self):
+        self.assertDaysAgo('Posted: 3 days ago', 3)
+        self.assertDaysAgo('Posted 3 days ago', 3)
+        self.assertDaysAgo('Posted Today', 0)
+        self.assertEqual(convert_date_format('Posted on 06/15/2023'), datetime(2023, 6, 15))
+        self.assertEqual(convert_date_format('Monday, June 5, 2023'), datetime(2023, 6, 5))
+        self.assertEqual(convert_date_format('Posted on Mon, Jun 5, 2023'), datetime(2023, 6, 5))
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            convert_date_format('not a date')
+        self.assertEqual(convert_dates(['not a date', None]), {'not a date': None})
+
+    def test_site_format_learned_from_an_unambiguous_date(self):
+        convert_date_format('15/06/2023', site='Test')
+        self.assertEqual(date_conversion.site_formats['Test'], '%d/%m/%Y')
+        self.assertEqual(convert_date_format('05/06/2023', site='Test'), datetime(2023, 6, 5))
+
+    def test_ambiguous_date_is_not_remembered(self):
+        convert_date_format('05/06/2023', site='Test')
+        self.assertNotIn('Test', date_conversion.site_formats)
+        self.assertEqual(convert_date_format('06/15/2023', site='Test'), datetime(2023, 6, 15))
+        self.assertEqual(date_conversion.site_formats['Test'], '%m/%d/%Y')
+
+
+class GazetteerTests(TestCase):
+    def test_us_locations(self):
+        cases = {
+            'Austin, TX': 'Texas',
+            'Remote - OR': 'Oregon',
+            'TX / Remote': 'Texas',
+            'Remote (Texas)': 'Texas',
+            'US-TX-Austin': 'Texas',
+            'Washington, DC': 'District of Columbia',
+            'Greater Seattle Area': 'Washington',
+            'Indianapolis, IN': 'Indiana',
+            'Bloomington, IN, US': 'Indiana',
+            'San Francisco, CA': 'California',
+            'Atlanta, Georgia': 'Georgia',
+            'Chicago, IL; London, UK': 'Illinois',
+        }
+        for location, state in cases.items():
+            with self.subTest(location=location):
+                self.assertEqual(resolve_state(location), state)
+
+    def test_foreign_locations_are_not_states(self):
+        for location in ('Bangalore, IN', 'Hyderabad, Telangana, IN', 'Pune, MH, IN', 'Berlin, DE',
+                         'Tbilisi, Georgia', 'Toronto, ON, CA', 'London, GB', 'Cambridge, United Kingdom'):
+            with self.subTest(location=location):
+                self.assertIsNone(resolve_state(location))
+
+    def test_ambiguous_locations_are_left_to_the_geocoder(self):
+        self.assertIsNone(resolve_state('Modesto, CA'))
+        self.assertEqual(resolve_state('Modesto, CA, USA'), 'California')
+
+    def test_city_names_shared_with_other_places_need_their_state(self):
+        for location in ('Cambridge', 'Birmingham', 'Augusta', 'Birmingham - Hybrid'):
+            with self.subTest(location=location):
+                self.assertIsNone(resolve_state(location))
+        cases = {'Cambridge, MA': 'Massachusetts', 'Cambridge MA': 'Massachusetts', 'Birmingham, AL': 'Alabama',
+                 'Augusta, ME': 'Maine', 'Augusta GA': 'Georgia'}
+        for location, state in cases.items():
+            with self.subTest(location=location):
+                self.assertEqual(resolve_state(location), state)
+
+
+class PartitionMigrationTests(TestCase):
+    # The SQL is only collected, no PostgreSQL server is needed
+    def get_sql(self, partitioned):
+        migration = import_module('jobs.migrations.0037_partition_joblisting')
+        state = MigrationLoader(connection).project_state(('jobs', '0037_partition_joblisting'))
+        model = state.apps.get_model('jobs', 'JobListing')
+        postgres = PostgresDatabaseWrapper({**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'}, alias='postgres')
+        schema_editor = postgres.schema_editor(collect_sql=True, atomic=False)
+        migration.recreate_table(schema_editor, model, partitioned)
+        return model, '\n'.join(schema_editor.collected_sql)
+
+    def test_recreates_every_key_and_index(self):
+        for partitioned in (True, False):
+            model, sql = self.get_sql(partitioned)
+            with self.subTest(partitioned=partitioned):
+                for name in [index.name for index in model._meta.indexes] + [constraint.name for constraint in model._meta.constraints]:
+                    self.assertIn(f'"{name}"', sql)
+                for column in ('company_id', 'category_id', 'job_type_id'):
+                    self.assertIn(f'FOREIGN KEY ("{column}")', sql)
+                    self.assertIn(f'ON "jobs_joblisting" ("{column}")', sql)
+
+    def test_partition_key_is_in_the_primary_key(self):
+        _, sql = self.get_sql(True)
+        self.assertIn('PARTITION BY RANGE (posted_on)', sql)
+        self.assertIn('PRIMARY KEY ("id", "posted_on")', sql)
+        self.assertIn('UNIQUE ("identity_key", "posted_on")', sql)
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Test')
+        JobListing.objects.bulk_create([
+            JobListing(company=self.company, title=f'Job {number}', last_seen_run=number % 2) for number in range(9)
+        ])
+
+    def test_deletes_in_batches(self):
+        progress = []
+        deleted = purge(JobListing.objects.filter(last_seen_run=0), batch_size=2,
+                        progress=lambda deleted, total: progress.append((deleted, total)))
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(JobListing.objects.count(), 4)
+        self.assertFalse(JobListing.objects.filter(last_seen_run=0).exists())
+
+    def test_jobs_are_deleted_without_loading_them(self):
+        with CaptureQueriesContext(connection) as queries:
+            purge(JobListing.objects.all(), batch_size=100)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 1)
+        self.assertFalse(any('"title"' in query['sql'] for query in queries))
+
+    def test_dry_run_only_counts(self):
+        self.assertEqual(purge(JobListing.objects.all(), dry_run=True), 9)
+        self.assertEqual(JobListing.objects.count(), 9)
+
+    def test_cascades_still_run(self):
+        # Company has jobs pointing to it, so its batches can't be raw deletes
+        self.assertEqual(purge(Company.objects.all()), 1)
+        self.assertEqual(JobListing.objects.count(), 0)
+
+
+class SearchTests(TestCase):
+    def get_sql(self, queryset):
+        postgres = PostgresDatabaseWrapper({**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'}, alias='postgres')
+        return str(queryset.query.get_compiler(connection=postgres).as_sql()[0])
+
+    def test_fuzzy_matches_without_rank_come_last(self):
+        sql = self.get_sql(search_jobs(JobListing.objects.all(), 'engineer', fuzzy=True))
+        order_by = sql.split('ORDER BY')[1]
+        self.assertRegex(order_by, r'^ ts_rank\(.*\) DESC NULLS LAST, SIMILARITY\(.*\) DESC NULLS LAST$')
+
+    @mock.patch('jobs.signals.update_search_vectors')
+    def test_renaming_a_company_updates_its_vectors(self, update_search_vectors):
+        category = Category.objects.create(name='Technology')
+        company = Company.objects.create(name='Old')
+        JobListing.objects.create(company=company, category=category, title='Engineer')
+        JobListing.objects.create(company=company, title='Engineer')
+        update_search_vectors.reset_mock()
+        company.save()
+        update_search_vectors.assert_not_called()
+
+        company.name = 'New'
+        company.save()
+        self.assertEqual(update_search_vectors.call_count, 2)
+        self.assertEqual({call.args[1].name for call in update_search_vectors.call_args_list}, {'New'})
+        self.assertEqual({call.args[2] for call in update_search_vectors.call_args_list}, {category, None})
+
+    @mock.patch('jobs.signals.update_search_vectors')
+    def test_renaming_a_category_updates_its_vectors(self, update_search_vectors):
+        category = Category.objects.create(name='Technology')
+        JobListing.objects.create(company=Company.objects.create(name='Test'), category=category, title='Engineer')
+        update_search_vectors.reset_mock()
+        category.name = 'Engineering'
+        category.save()
+        update_search_vectors.assert_called_once()
+        self.assertEqual(update_search_vectors.call_args.args[2].name, 'Engineering')
+
+    @mock.patch('jobs.signals.update_search_vectors')
+    def test_saving_a_job_updates_its_vector(self, update_search_vectors):
+        company = Company.objects.create(name='Test')
+        job = JobListing.objects.create(company=company, title='Engineer')
+        queryset, vector_company, vector_category = update_search_vectors.call_args.args
+        self.assertEqual((list(queryset), vector_company, vector_category), ([job], company, None))
+
+        job.title = 'Senior Engineer'
+        job.save()
+        self.assertEqual(update_search_vectors.call_count, 2)
+        job.save(update_fields=['last_seen_run'])
+        self.assertEqual(update_search_vectors.call_count, 2)
+
+
+class BenchmarkTests(TestCase):
+    def test_committed_snapshots_match_the_site_configuration(self):
+        with open('data/websites.json', 'r') as f:
+            websites = json.load(f)
+        with open(BASELINE_PATH, 'r') as f:
+            baseline_jobs = json.load(f)['page']['cold']['jobs']
+        jobs = 0
+        for website in websites['companies']:
+            extractor = get_extractor(website)
+            for html in load_snapshots(website).values():
+                job_data = extractor.extract(extractor.get_job_elements(html))
+                self.assertTrue(all(job['title'] and job['link'] for job in job_data))
+                jobs += len(job_data)
+        self.assertEqual(jobs, baseline_jobs)
+
+    def test_regressions_beyond_the_threshold_are_reported(self):
+        baseline = {'page': {'cold': {'pages_per_second': 100, 'queries_per_job': 1.0, 'jobs_per_second': None}}}
+        results = {'page': {'cold': {'pages_per_second': 80, 'queries_per_job': 1.5, 'jobs_per_second': 10}}}
+        self.assertEqual(compare_to_baseline(results, baseline, 0.25), ['page/cold queries_per_job: 1.0 -> 1.5 (+50%)'])
+        self.assertEqual(compare_to_baseline(results, baseline, 0.5), [])
+
+    def test_timings_are_only_compared_when_asked_for(self):
+        baseline = {'page': {'cold': {'parse_ms_per_page': 1.0, 'queries_per_page': 4.0}}}
+        results = {'page': {'cold': {'parse_ms_per_page': 3.0, 'queries_per_page': 4.0}}}
+        self.assertEqual(compare_to_baseline(results, baseline, 0.25), [])
+        self.assertEqual(
+            compare_to_baseline(results, baseline, 0.25, ['parse_ms_per_page']),
+            ['page/cold parse_ms_per_page: 1.0 -> 3.0 (+200%)'],
+        )
+
+    def test_best_of_takes_each_metric_from_its_best_round(self):
+        best = best_of([
+            {'seconds': 1.0, 'pages_per_second': 10, 'parse_ms_per_page': 2.0},
+            {'seconds': 2.0, 'pages_per_second': 5, 'parse_ms_per_page': 1.0},
+        ])
+        self.assertEqual(best, {'seconds': 1.0, 'pages_per_second': 10, 'parse_ms_per_page': 1.0})
+
+
+class ScrapePoolTests(TransactionTestCase):
+    job_categories = {'1': 'Technology', '2': 'Sales'}
+    job_types = {'1': 'Full-time'}
+
+    def get_website(self, name, urls_by_category):
+        return {'company_name': name, 'dynamic': False, 'job_selector': '.job', 'title_selector': '.title',
+                'location_selector': '.where', 'date_selector': '.date', 'link_selector': '.title',
+                'job_urls': [{'url': urls, 'category_id': category_id, 'type_id': '1'}
+                             for category_id, urls in urls_by_category.items()]}
+
+    def get_units(self, companies):
+        websites = {'job_categories': self.job_categories, 'job_types': self.job_types, 'companies': companies}
+        return get_scrape_units(websites, DimensionCache.from_websites(websites))
+
+    def test_units_take_turns_between_domains(self):
+        units = self.get_units([
+            self.get_website('Busy', {'1': [f'https://busy.example/{n}' for n in range(3)],
+                                      '2': ['https://busy.example/sales']}),
+            self.get_website('Quiet', {'1': ['https://quiet.example/1']}),
+        ])
+        self.assertEqual([(unit[1].name, unit[2].name, len(unit[4])) for unit in units],
+                         [('Busy', 'Technology', 3), ('Quiet', 'Technology', 1), ('Busy', 'Sales', 1)])
+
+    def test_workers_write_every_company(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("The worker processes can't reach an in-memory test database, set DEV_TEST_DB_NAME")
+        with SnapshotServer() as server:
+            companies = []
+            for name in ('Alpha', 'Beta'):
+                html = ''.join(f'<div class="job"><a class="title" href="/{slugify(name)}/{number}">{name} job {number}</a>'
+                               f'<span class="where">Austin, TX</span><span class="date">Jun 15, 2023</span></div>'
+                               for number in range(3))
+                url = server.add(f'/{slugify(name)}', f'<html><body>{html}</body></html>')
+                companies.append(dict(self.get_website(name, {'1': [url]}), compnany_job_base_url=server.base_url))
+            units = self.get_units(companies)
+            run = ScrapeRun.objects.create()
+            stats = scrape_in_parallel(units, 2, driver_path=None, run_id=run.id)
+
+        self.assertEqual(stats['new'], 6)
+        for name in ('Alpha', 'Beta'):
+            with self.subTest(company=name):
+                jobs = JobListing.objects.filter(company__name=name, last_seen_run=run.id)
+                self.assertEqual(sorted(jobs.values_list('title', flat=True)), [f'{name} job {number}' for number in range(3)])
+
+
+class ExtractionParityTests(TestCase):
+    # The lxml extractor has to read the same values BeautifulSoup did
+    html = """<html><body><div id="results">
+        <div class="job"><h3 class="title"><a href="/job/1"> Senior <b>Software</b> Engineer </a></h3>
+            <span class="where">Location:</span> Austin, TX <span class="date">Jun 15, 2023</span></div>
+        <div class="job"><h3 class="title"><a href="/job/2">Data Analyst</a></h3>
+            <span class="where">Location:</span><!-- Remote --></div>
+        <div class="job"><h3 class="title">No link</h3></div>
+        <a class="job" href="/job/4"><span class="title">Card Job</span></a>
+    </div></body></html>"""
+
+    def assertSameExtraction(self, website_config):
+        lxml_extractor = SiteExtractor(website_config)
+        soup_extractor = SoupExtractor(website_config)
+        lxml_jobs = lxml_extractor.extract(lxml_extractor.get_job_elements(self.html))
+        soup_jobs = soup_extractor.extract(soup_extractor.get_job_elements(self.html))
+        self.assertEqual(lxml_jobs, soup_jobs)
+        return lxml_jobs
+
+    def test_fields(self):
+        jobs = self.assertSameExtraction({
+            'company_name': 'Test', 'job_selector': '#results .job', 'title_selector': '.title',
+            'location_selector': '.where', 'date_selector': '.date', 'link_selector': '.title a',
+        })
+        self.assertEqual(jobs[0], {'title': 'SeniorSoftwareEngineer', 'location': 'Location:',
+                                   'date': 'Jun 15, 2023', 'link': '/job/1'})
+        self.assertEqual(len(jobs), 4)
+
+    def test_link_in_job_selector(self):
+        jobs = self.assertSameExtraction({
+            'company_name': 'Test', 'job_selector': 'a.job', 'title_selector': '.title', 'location_selector': None,
+            'date_selector': None, 'link_in_job_selector': True,
+        })
+        self.assertEqual(jobs, [{'title': 'Card Job', 'location': None, 'date': None, 'link': '/job/4'}])
+
+    def test_location_next_to_its_label(self):
+        lxml_extractor = SiteExtractor({'company_name': 'Test', 'job_selector': '#results div.job',
+                                        'location_selector': '.where', 'next_sibling': True})
+        jobs = lxml_extractor.extract(lxml_extractor.get_job_elements(self.html))
+        # A comment standing right after the label counts as its text
+        self.assertEqual([job['location'] for job in jobs], ['Austin, TX', 'Remote', None])
+
+    def test_element_names_ignore_case(self):
+        jobs = self.assertSameExtraction({
+            'company_name': 'Test', 'job_selector': 'DIV#results > Div.job', 'title_selector': 'H3', 'location_selector': None,
+            'date_selector': None, 'link_selector': 'A',
+        })
+        self.assertEqual([job['link'] for job in jobs], ['/job/1', '/job/2', None])
+
+    def test_empty_page(self):
+        extractor = SiteExtractor({'company_name': 'Test', 'job_selector': '.job'})
+        self.assertEqual(extractor.extract(extractor.get_job_elements('')), [])
+
+
+class ScrapePipelineTests(TestCase):
+    def setUp(self):
+        self.written = []
+        self.pipeline = ScrapePipeline(self.extract, lambda page: self.written.append(page.url))
+        self.addCleanup(self.pipeline.close)
+
+    def get_page(self, url):
+        return FetchedPage(url, 1, {}, None, None, None, None)
+
+    def extract(self, page):
+        if page.url == 'bad':
+            raise ValueError(page.url)
+
+    def test_flush_waits_for_every_page(self):
+        for number in range(10):
+            self.pipeline.put(self.get_page(number))
+        self.pipeline.after(lambda: self.written.append('done'))
+        self.assertEqual(self.pipeline.flush(), [])
+        self.assertEqual(self.written, list(range(10)) + ['done'])
+
+    def test_errors_are_returned_once_and_skip_the_callbacks(self):
+        with self.assertLogs('utils.scrape_pipeline', 'ERROR'):
+            self.pipeline.put(self.get_page('bad'))
+            self.pipeline.put(self.get_page('good'))
+            self.pipeline.after(lambda: self.written.append('done'))
+            errors = self.pipeline.flush()
+        self.assertEqual([str(error) for error in errors], ['bad'])
+        self.assertEqual(self.written, ['good'])
+
+        self.pipeline.after(lambda: self.written.append('done'))
+        self.assertEqual(self.pipeline.flush(), [])
+        self.assertEqual(self.written, ['good', 'done'])
+
+    def test_write_errors_are_returned(self):
+        def write(page):
+            raise RuntimeError('database down')
+        pipeline = ScrapePipeline(self.extract, write)
+        self.addCleanup(pipeline.close)
+        with self.assertLogs('utils.scrape_pipeline', 'ERROR'):
+            pipeline.put(self.get_page('good'))
+            errors = pipeline.flush()
+        self.assertEqual([str(error) for error in errors], ['database down'])
+
+    def test_pages_are_written_in_the_write_thread(self):
+        threads = []
+        pipeline = ScrapePipeline(self.extract, lambda page: threads.append(threading.current_thread().name))
+        self.addCleanup(pipeline.close)
+        pipeline.put(self.get_page('good'))
+        pipeline.flush()
+        self.assertEqual(threads, ['scrape-write'])
+
+
+class JobIdentityTests(TestCase):
+    def test_links_to_the_same_job_get_one_key(self):
+        key = get_identity_key('Engineer', 'https://jobs.example.com/job/1?id=2&a=1')
+        for link in ('/job/1/?a=1&id=2', 'HTTPS://Jobs.Example.com:443/job/1?a=1&id=2&utm_source=x#apply',
+                     'https://jobs.example.com/job/1?gclid=abc&a=1&id=2&ref=home'):
+            with self.subTest(link=link):
+                self.assertEqual(get_identity_key('Renamed', link, 'https://jobs.example.com'), key)
+
+    def test_other_parameters_are_kept(self):
+        self.assertEqual(canonicalize_link('https://example.com/jobs?page=2&q=dev'), 'https://example.com/jobs?page=2&q=dev')
+        self.assertNotEqual(get_identity_key(None, 'https://example.com/job?id=1'),
+                            get_identity_key(None, 'https://example.com/job?id=2'))
+
+    def test_jobs_without_link_are_told_apart_by_company_and_title(self):
+        self.assertEqual(get_identity_key('Engineer', None, company_name='A'), get_identity_key('Engineer', '', company_name='A'))
+        self.assertNotEqual(get_identity_key('Engineer', None, company_name='A'), get_identity_key('Engineer', None, company_name='B'))
+
+    def test_content_hash_counts_dates_by_day(self):
+        morning = get_content_hash('Engineer', 'Austin, TX', datetime(2023, 6, 15, 8), '/job/1')
+        self.assertEqual(morning, get_content_hash('Engineer', 'Austin, TX', datetime(2023, 6, 15, 20), '/job/1'))
+        self.assertNotEqual(morning, get_content_hash('Engineer', 'Austin, TX', datetime(2023, 6, 16, 8), '/job/1'))
+        self.assertNotEqual(morning, get_content_hash('Engineer', 'Dallas, TX', datetime(2023, 6, 15, 8), '/job/1'))
+
+
+class AutocompleteTests(TestCase):
+    def test_word_starts_ranked_by_live_jobs(self):
+        index = TitleIndex({'Software Engineer': 5, 'Senior Software Engineer': 9, 'Sales Engineer': 1,
+                            'Engineering Manager': 5, 'Nurse': 20})
+        self.assertEqual(index.complete('engineer', 10),
+                         ['Senior Software Engineer', 'Engineering Manager', 'Software Engineer', 'Sales Engineer'])
+        self.assertEqual(index.complete('soft', 1), ['Senior Software Engineer'])
+        self.assertEqual(index.complete('gineer', 10), [])
+
+    def test_dense_prefixes_rank_the_same(self):
+        # Enough matches to take the walk in rank order instead of ranking every match
+        titles = {f'Engineer {number}': number % 7 for number in range(300)}
+        titles.update({f'Analyst {number}': number for number in range(20)})
+        index = TitleIndex(titles)
+        matches = sorted((title for title in titles if title.startswith('Engineer')), key=lambda title: (-titles[title], title))
+        self.assertEqual(index.complete('engineer', 10), matches[:10])
+        self.assertEqual(index.complete('analyst', 3), ['Analyst 19', 'Analyst 18', 'Analyst 17'])
+
+    @mock.patch('utils.autocomplete.get_index')
+    def test_warm_up_builds_the_index(self, get_index):
+        warm_index().join()
+        get_index.assert_called_once_with()
+
+    @mock.patch('utils.autocomplete.warm_index')
+    def test_only_serving_processes_warm_up(self, warm_index):
+        for argv, warmed in ((['gunicorn', 'jobscrape_project.wsgi'], True), (['manage.py', 'runserver'], True),
+                             (['manage.py', 'migrate'], False), (['manage.py', 'scrape_jobs'], False)):
+            with self.subTest(argv=argv), mock.patch('sys.argv', argv):
+                warm_index.reset_mock()
+                apps.get_app_config('jobs').ready()
+                self.assertEqual(warm_index.called, warmed)
+
+
+class IngestJobsTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Test')
+        self.category = Category.objects.create(name='Technology')
+        self.job_type = JobType.objects.create(name='Full-time')
+
+    def get_job(self, identity_key, content_hash, title='Engineer'):
+        return {'identity_key': identity_key, 'content_hash': content_hash, 'title': title, 'location': 'Austin, TX',
+                'state_location': 'TX', 'date_posted': None, 'posted_on': None, 'link': f'/job/{identity_key}'}
+
+    def ingest(self, jobs, run_id):
+        with CaptureQueriesContext(connection) as queries:
+            counts = ingest_jobs(jobs, self.company, self.job_type, self.category, run_id)
+        return counts, [query['sql'] for query in queries]
+
+    def test_new_job_is_inserted(self):
+        counts, queries = self.ingest([self.get_job('a', 'hash')], 1)
+        self.assertEqual(counts, (1, 0, 0))
+        job = JobListing.objects.get(identity_key='a')
+        self.assertEqual((job.title, job.last_seen_run, job.category, job.job_type, job.posted_on),
+                         ('Engineer', 1, self.category, self.job_type, timezone.localdate()))
+        self.assertEqual(sum(sql.startswith('INSERT') for sql in queries), 1)
+
+    def test_changed_job_is_updated(self):
+        self.ingest([self.get_job('a', 'hash')], 1)
+        counts, _ = self.ingest([self.get_job('a', 'new hash', title='Senior Engineer')], 2)
+        self.assertEqual(counts, (0, 1, 0))
+        job = JobListing.objects.get(identity_key='a')
+        self.assertEqual((job.title, job.content_hash, job.last_seen_run), ('Senior Engineer', 'new hash', 2))
+        self.assertEqual(JobListing.objects.count(), 1)
+
+    def test_unchanged_job_is_only_stamped(self):
+        self.ingest([self.get_job('a', 'hash')], 1)
+        counts, queries = self.ingest([self.get_job('a', 'hash', title='Not written')], 2)
+        self.assertEqual(counts, (0, 0, 1))
+        updates = [sql for sql in queries if sql.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET "last_seen_run" = 2', updates[0])
+        self.assertFalse(any(sql.startswith('INSERT') for sql in queries))
+        self.assertEqual(JobListing.objects.get(identity_key='a').title, 'Engineer')
+
+    def test_duplicates_in_a_batch_are_written_once(self):
+        counts, _ = self.ingest([self.get_job('a', 'hash'), self.get_job('a', 'other hash', title='Copy')], 1)
+        self.assertEqual(counts, (1, 0, 0))
+        self.assertEqual(list(JobListing.objects.values_list('title', flat=True)), ['Engineer'])
+
+
+class ReconciliationTests(TransactionTestCase):
+    # The pipeline writes from its own thread, so the rows have to be committed
+    def setUp(self):
+        self.company = Company.objects.create(name='Test')
+        self.category, other_category = Category.objects.create(name='Technology'), Category.objects.create(name='Sales')
+        self.job_type = JobType.objects.create(name='Full-time')
+        old_run = ScrapeRun.objects.create()
+        JobListing.objects.create(company=self.company, category=self.category, job_type=self.job_type,
+                                  title='Gone', identity_key='gone', last_seen_run=old_run.id)
+        # Another slice of the same company, not reconciled here
+        JobListing.objects.create(company=self.company, category=other_category, job_type=self.job_type,
+                                  title='Other slice', identity_key='other', last_seen_run=old_run.id)
+        self.scraper = JobScraper(None, run_id=ScrapeRun.objects.create().id)
+        self.addCleanup(self.scraper.close)
+
+    def scrape(self, server):
+        html = ''.join(f'<div class="job"><a class="title" href="/job/{number}">Job {number}</a>'
+                       f'<span class="where">Austin, TX</span></div>' for number in range(2))
+        url = server.add('/jobs', f'<html><body>{html}</body></html>')
+        website_config = {'company_name': 'Test', 'compnany_job_base_url': server.base_url, 'job_selector': '.job',
+                          'title_selector': '.title', 'location_selector': '.where', 'date_selector': '.date',
+                          'link_selector': '.title'}
+        return self.scraper.scrape_job_urls(website_config, self.company, self.category, self.job_type, [url])
+
+    def test_unseen_jobs_are_deleted_after_the_slice(self):
+        with SnapshotServer() as server:
+            stats = self.scrape(server)
+        self.assertEqual(stats['new'], 2)
+        self.assertEqual(sorted(JobListing.objects.values_list('title', flat=True)), ['Job 0', 'Job 1', 'Other slice'])
+
+    def test_unseen_jobs_are_kept_when_the_slice_fails(self):
+        with SnapshotServer() as server, \
+                mock.patch.object(self.scraper, 'scrape_static_urls', side_effect=RequestException('down')), \
+                self.assertLogs('utils.job_scraper', 'ERROR'):
+            self.scrape(server)
+        self.assertEqual(sorted(JobListing.objects.values_list('title', flat=True)), ['Gone', 'Other slice'])
+
+
+class ScrapeResumeTests(TestCase):
+    urls = ['https://example.com/jobs/1', 'https://example.com/jobs/2', 'https://example.com/jobs/3']
+
+    def setUp(self):
+        self.slice = {'company': Company.objects.create(name='Test'), 'category': Category.objects.create(name='Technology'),
+                      'job_type': JobType.objects.create(name='Full-time')}
+
+    def get_checkpoints(self, run):
+        return SliceCheckpoints(run.id, **self.slice)
+
+    def test_completed_urls_are_skipped(self):
+        run = ScrapeRun.objects.create(source='scrape_jobs')
+        checkpoints = self.get_checkpoints(run)
+        checkpoints.page_done(self.urls[0], 2)
+        checkpoints.url_done(self.urls[1])
+
+        checkpoints = self.get_checkpoints(run)
+        with self.assertLogs('utils.checkpoints', 'INFO'):
+            self.assertEqual(checkpoints.get_remaining_urls(self.urls), [self.urls[0], self.urls[2]])
+        self.assertEqual(checkpoints.get_pages_done(self.urls[0]), 2)
+        # Other runs start from scratch
+        self.assertEqual(self.get_checkpoints(ScrapeRun.objects.create()).get_remaining_urls(self.urls), self.urls)
+
+    def test_api_url_resumes_after_its_last_written_page(self):
+        run = ScrapeRun.objects.create(source='scrape_jobs')
+        checkpoints = self.get_checkpoints(run)
+        checkpoints.page_done(self.urls[0], 2)
+        website_config = {'company_name': 'Test', 'mode': 'api', 'api': {'fields': {'title': 'title'}, 'page_size': 20}}
+        scraper = JobScraper(None, run_id=run.id)
+        response = mock.Mock(**{'json.return_value': [{'title': 'Engineer'}]})
+        response.elapsed.total_seconds.return_value = 0.1
+        scraper.fetcher = mock.Mock(**{'fetch.return_value': response})
+        scraper.pipeline.close()
+        scraper.pipeline = mock.Mock()
+        try:
+            scraper.scrape_api_urls(self.urls[:1], website_config, self.slice['company'], self.slice['job_type'],
+                                    self.slice['category'], checkpoints)
+        finally:
+            scraper.close()
+        scraper.fetcher.fetch.assert_called_once_with(self.urls[0], **ApiSource(website_config).get_request(3))
+        self.assertEqual([call.args[0].page for call in scraper.pipeline.put.call_args_list], [3])
+
+    def call_command(self, stats, *args):
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch('jobs.management.commands.scrape_jobs.JobScraper') as scraper_class, \
+                mock.patch('jobs.management.commands.scrape_jobs.load_extractors'):
+            scraper_class.return_value.scrape_jobs.return_value = stats
+            call_command('scrape_jobs', *args, stdout=stdout, stderr=stderr)
+        return scraper_class, stdout.getvalue(), stderr.getvalue()
+
+    def test_resume_continues_the_last_run_of_the_command(self):
+        run = ScrapeRun.objects.create(source='scrape_jobs')
+        self.get_checkpoints(run).url_done(self.urls[0])
+        # Unfinished, but started by a benchmark
+        ScrapeRun.objects.create()
+
+        scraper_class, stdout, _ = self.call_command(Counter({'new': 1}), '--resume')
+        self.assertEqual(scraper_class.call_args.kwargs['run_id'], run.id)
+        self.assertIn(f'Resuming scrape run {run.id}', stdout)
+        run.refresh_from_db()
+        self.assertIsNotNone(run.finished_at)
+        self.assertFalse(ScrapeCheckpoint.objects.exists())
+
+    def test_run_with_failed_slices_stays_unfinished(self):
+        scraper_class, _, stderr = self.call_command(Counter({'new': 1, 'failed slices': 1}))
+        run = ScrapeRun.objects.get(id=scraper_class.call_args.kwargs['run_id'])
+        self.assertEqual(run.source, 'scrape_jobs')
+        self.assertIsNone(run.finished_at)
+        self.assertIn('--resume', stderr)
+
+
+class GeocodingStub:
+    # Stands in for the Geocoding API: answers each address with its state from `states`, or with
+    # an error for the ones missing there, a little slowly so that concurrent lookups overlap
+    def __init__(self, states):
+        self.addresses = []
+        self.in_flight = self.max_in_flight = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                address = parse_qs(urlsplit(self.path).query)['address'][0]
+                with lock:
+                    stub.addresses.append(address)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(0.1)
+                with lock:
+                    stub.in_flight -= 1
+                if address not in states:
+                    self.send_error(500)
+                    return
+                body = json.dumps({'status': 'OK', 'results': [{'address_components': [
+                    {'long_name': states[address], 'types': ['administrative_area_level_1', 'political']},
+                ]}]}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/geocode/json'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class GetStateTests(TestCase):
+    states = {'Gotham': 'New Jersey', 'Metropolis': 'Illinois', 'Emerald City': 'Kansas', 'Twin Peaks': 'Washington'}
+
+    def setUp(self):
+        company = Company.objects.create(name='Test')
+        for location in list(self.states) + ['Smallville', '  smallville ', 'Atlantis']:
+            JobListing.objects.create(company=company, title='Engineer', location=location)
+        LocationState.objects.create(location='smallville', state='Kansas')
+
+    def test_locations_are_looked_up_once_and_concurrently(self):
+        stdout = StringIO()
+        with GeocodingStub(self.states) as stub, self.assertLogs('utils.geocoding', 'WARNING') as logs:
+            call_command('get_state', '--endpoint', stub.url, '--workers', '4', stdout=stdout)
+
+        # The cached location isn't looked up, the others once each and several at a time
+        self.assertEqual(sorted(stub.addresses), sorted(list(self.states) + ['Atlantis']))
+        self.assertGreater(stub.max_in_flight, 1)
+        self.assertEqual(dict(JobListing.objects.filter(location__in=self.states).values_list('location', 'state_location')),
+                         self.states)
+        self.assertEqual(set(JobListing.objects.filter(location__icontains='smallville').values_list('state_location', flat=True)),
+                         {'Kansas'})
+        self.assertEqual(LocationState.objects.get(location='gotham').state, 'New Jersey')
+
+        # The failed lookup is reported and not cached, so the next run tries it again
+        self.assertIn("Geocoding 'Atlantis' failed: HTTP 500", logs.output[0])
+        self.assertIn('State name extraction failed for location: Atlantis', stdout.getvalue())
+        self.assertIsNone(JobListing.objects.get(location='Atlantis').state_location)
+        self.assertFalse(LocationState.objects.filter(location='atlantis').exists())
+
+    def test_second_run_uses_the_cache(self):
+        with GeocodingStub(self.states) as stub, self.assertLogs('utils.geocoding', 'WARNING'):
+            call_command('get_state', '--endpoint', stub.url, stdout=StringIO())
+        JobListing.objects.update(state_location=None)
+        with GeocodingStub(self.states) as stub, self.assertLogs('utils.geocoding', 'WARNING'):
+            call_command('get_state', '--endpoint', stub.url, stdout=StringIO())
+        self.assertEqual(stub.addresses, ['Atlantis'])
+
+
+class TelemetryExportTests(TestCase):
+    def setUp(self):
+        started_at = timezone.now()
+        self.run = ScrapeRun.objects.create(finished_at=started_at + timedelta(seconds=90))
+        ScrapeRun.objects.filter(id=self.run.id).update(started_at=started_at)
+        self.run.refresh_from_db()
+        company = Company.objects.create(name='Test "Co"')
+        url = 'https://example.com/jobs'
+        # A resumed run writes a second row for the same url
+        ScrapeStat.objects.create(run=self.run, company=company, url=url, pages=2, navigation_seconds=1.5,
+                                  jobs_found=20, jobs_created=5)
+        ScrapeStat.objects.create(run=self.run, company=company, url=url, pages=1, pages_unchanged=1,
+                                  navigation_seconds=0.5, jobs_found=10)
+        ScrapeStat.objects.create(run=self.run, company=company, url='', jobs_removed=3)
+        # Another run's row
+        ScrapeStat.objects.create(run=ScrapeRun.objects.create(), company=company, url=url, pages=7)
+
+    def test_run_stats_add_up_each_url(self):
+        run_stats = get_run_stats(self.run)
+        self.assertEqual(run_stats['duration_seconds'], 90)
+        self.assertEqual([(stat['url'], stat['pages'], stat['navigation_seconds'], stat['jobs_found'], stat['jobs_removed'])
+                          for stat in run_stats['stats']],
+                         [('', 0, 0, 0, 3), ('https://example.com/jobs', 3, 2.0, 30, 0)])
+        self.assertEqual((run_stats['totals']['pages'], run_stats['totals']['jobs_created']), (3, 5))
+
+    def test_prometheus_metrics(self):
+        lines = to_prometheus(get_run_stats(self.run)).splitlines()
+        labels = f'run="{self.run.id}",company="Test \\"Co\\"",url="https://example.com/jobs"'
+        for line in (
+            '# TYPE jobscrape_run_duration_seconds gauge',
+            f'jobscrape_run_duration_seconds{{run="{self.run.id}"}} 90.0',
+            '# TYPE jobscrape_stage_seconds gauge',
+            f'jobscrape_stage_seconds{{{labels},stage="navigation"}} 2.0',
+            f'jobscrape_pages{{{labels},kind="scraped"}} 3',
+            f'jobscrape_pages{{{labels},kind="unchanged"}} 1',
+            f'jobscrape_jobs{{{labels},kind="found"}} 30',
+            f'jobscrape_jobs{{{labels},kind="created"}} 5',
+            f'jobscrape_jobs{{run="{self.run.id}",company="Test \\"Co\\"",url="",kind="removed"}} 3',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+        # 5 stages, 2 page kinds and 4 job kinds for each of the 2 urls
+        self.assertEqual(sum(not line.startswith('#') for line in lines), 1 + 2 * (5 + 2 + 4))
+
+
+class ApiSourceEndToEndTests(TransactionTestCase):
+    # Pages through a JSON endpoint served by SnapshotServer, written by the pipeline's thread
+    def setUp(self):
+        self.company = Company.objects.create(name='Test')
+        self.category = Category.objects.create(name='Technology')
+        self.job_type = JobType.objects.create(name='Full-time')
+        JobListing.objects.create(company=self.company, category=self.category, job_type=self.job_type,
+                                  title='Gone', identity_key='gone', last_seen_run=ScrapeRun.objects.create().id)
+        self.scraper = JobScraper(None, run_id=ScrapeRun.objects.create().id)
+        self.addCleanup(self.scraper.close)
+
+    def scrape(self, **api):
+        jobs = [{'name': f'Job {number}', 'where': {'city': 'Austin, TX'}, 'path': f'/job/{number}'} for number in range(5)]
+        with SnapshotServer() as server:
+            self.base_url = server.base_url
+            for page in range(1, 4):
+                server.add(f'/api/jobs?page={page}&size=2',
+                           json.dumps({'total': len(jobs), 'jobs': jobs[(page - 1) * 2:page * 2]}))
+            website_config = {'company_name': 'Test', 'mode': 'api', 'api': {
+                'pagination': 'page', 'page_size': 2, 'size_param': 'size', 'jobs_path': 'jobs', 'total_path': 'total',
+                'fields': {'title': 'name', 'location': 'where.city', 'link': 'path'}, 'link_prefix': server.base_url,
+                **api,
+            }}
+            return self.scraper.scrape_job_urls(website_config, self.company, self.category, self.job_type,
+                                                [server.base_url + '/api/jobs'])
+
+    def test_every_page_is_written(self):
+        stats = self.scrape()
+        self.assertEqual(stats['new'], 5)
+        self.assertEqual(sorted(JobListing.objects.values_list('title', flat=True)), [f'Job {number}' for number in range(5)])
+        job = JobListing.objects.get(title='Job 4')
+        self.assertEqual((job.link, job.location, job.date_posted), (self.base_url + '/job/4', 'Austin, TX', None))
+        self.assertEqual(ScrapeCheckpoint.objects.get().pages_done, 3)
+
+    def test_page_limit_fails_the_slice(self):
+        with self.assertLogs('utils', 'ERROR') as logs:
+            stats = self.scrape(max_pages=2)
+        self.assertEqual(stats['failed slices'], 1)
+        self.assertTrue(any('PageLimitReached' in line for line in logs.output))
+        # The pages read are written, but nothing is purged
+        self.assertEqual(sorted(JobListing.objects.values_list('title', flat=True)), ['Gone', 'Job 0', 'Job 1', 'Job 2', 'Job 3'])
+
+
+class FakeClock:
+    # Stands in for the time module: sleep() moves monotonic() forward instead of waiting
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class PolitenessTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('utils.politeness.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def acquire_times(self, bucket, count):
+        times = []
+        for _ in range(count):
+            bucket.acquire()
+            times.append(self.clock.now - 1000)
+        return times
+
+    def test_requests_are_spaced_after_the_burst(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        self.assertEqual(self.acquire_times(bucket, 6), [0, 0, 0, 0.5, 1.0, 1.5])
+
+    def test_idle_time_refills_up_to_the_burst(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        self.acquire_times(bucket, 3)
+        self.clock.now += 60
+        self.assertEqual(self.acquire_times(bucket, 4), [60, 60, 60, 60.5])
+
+    def test_each_domain_has_its_own_limits(self):
+        scheduler = PolitenessScheduler.from_websites({'companies': [
+            {'requests_per_minute': 30, 'burst': 1, 'job_urls': [{'url': ['https://a.example/jobs', 'https://a.example/more']}]},
+            {'job_urls': [{'url': ['https://b.example/jobs']}]},
+        ]})
+        self.assertEqual(set(scheduler.policies), {'a.example', 'b.example'})
+        scheduler.throttle('https://a.example/jobs')
+        scheduler.throttle('https://b.example/jobs')
+        scheduler.throttle('https://a.example/page/2')
+        # 30 a minute: the second request on a.example waits 2 seconds, b.example didn't wait
+        self.assertEqual(self.clock.sleeps, [2.0])
+
+    def test_slots_cap_concurrent_requests(self):
+        url = 'https://a.example/jobs'
+        scheduler = PolitenessScheduler({'a.example': DomainPolicy(max_concurrency=2)})
+        entered = threading.Event()
+
+        def third_request():
+            with scheduler.slot(url):
+                entered.set()
+
+        with scheduler.slot(url), scheduler.slot(url):
+            thread = threading.Thread(target=third_request)
+            thread.start()
+            self.assertFalse(entered.wait(0.2))
+            # Other hosts aren't held up
+            with scheduler.slot('https://b.example/jobs'):
+                pass
+        self.assertTrue(entered.wait(5))
+        thread.join()
+
+
+class StaticFetcherTests(TestCase):
+    def setUp(self):
+        self.server = SnapshotServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.url = self.server.add('/jobs', '<html><body><div class="job">Engineer</div></body></html>')
+        self.fetcher = StaticFetcher(max_attempts=3, backoff=1.0)
+        self.addCleanup(self.fetcher.close)
+        patcher = mock.patch('utils.http_fetcher.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_delays(self):
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_retries_with_exponential_backoff(self):
+        self.server.fail('/jobs', 503, times=2)
+        with self.assertLogs('utils.http_fetcher', 'WARNING'):
+            response = self.fetcher.fetch(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        first, second = self.get_delays()
+        self.assertTrue(1 <= first < 2 and 2 <= second < 3, (first, second))
+
+    def test_retry_after_is_honoured(self):
+        self.server.fail('/jobs', 429, retry_after=7)
+        with self.assertLogs('utils.http_fetcher', 'WARNING'):
+            self.assertEqual(self.fetcher.fetch(self.url).status_code, 200)
+        self.assertEqual(self.get_delays(), [7.0])
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.fail('/jobs', 500, times=3)
+        with self.assertLogs('utils.http_fetcher', 'WARNING'), self.assertRaises(HTTPError):
+            self.fetcher.fetch(self.url)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(HTTPError):
+            self.fetcher.fetch(self.server.base_url + '/missing')
+        self.assertEqual(len(self.server.requests), 1)
+        self.sleep.assert_not_called()
+
+    def test_conditional_get(self):
+        etag = self.fetcher.fetch(self.url).headers['ETag']
+        self.assertEqual(self.fetcher.fetch(self.url, headers={'If-None-Match': etag}).status_code, 304)
+        self.server.add('/jobs', '<html><body>Changed</body></html>')
+        self.assertEqual(self.fetcher.fetch(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class StaticNotModifiedTests(TransactionTestCase):
+    # A second run sends the stored ETag and skips the page on a 304
+    def test_unchanged_page_is_not_downloaded_again(self):
+        company = Company.objects.create(name='Test')
+        category, job_type = Category.objects.create(name='Technology'), JobType.objects.create(name='Full-time')
+        with SnapshotServer() as server:
+            url = server.add('/jobs', '<html><body><div class="job"><a class="title" href="/job/1">Engineer</a>'
+                                      '<span class="where">Austin, TX</span></div></body></html>')
+            website_config = {'company_name': 'Test', 'compnany_job_base_url': server.base_url, 'job_selector': '.job',
+                              'title_selector': '.title', 'location_selector': '.where', 'date_selector': '.date',
+                              'link_selector': '.title'}
+            for run in range(2):
+                scraper = JobScraper(None, run_id=ScrapeRun.objects.create().id)
+                try:
+                    stats = scraper.scrape_job_urls(website_config, company, category, job_type, [url])
+                finally:
+                    scraper.close()
+        self.assertEqual((stats['new'], stats['existing'], stats['unchanged pages']), (0, 0, 1))
+        self.assertEqual(JobListing.objects.get().last_seen_run, scraper.run_id)
+
+
+class DimensionCacheTests(TestCase):
+    websites = {
+        'job_categories': {'1': 'Technology', '2': 'Sales'},
+        'job_types': {'1': 'Full-time', '2': 'Internship'},
+        'companies': [
+            {'company_name': 'Alpha', 'company_logo': 'alpha.png', 'company_tags': ['Retail', 'Tech']},
+            {'company_name': 'Beta', 'company_tags': ['Tech']},
+        ],
+    }
+
+    def test_lookups_never_query(self):
+        dimensions = DimensionCache.from_websites(self.websites)
+        with self.assertNumQueries(0):
+            self.assertEqual(dimensions.get_company(self.websites['companies'][0]).name, 'Alpha')
+            self.assertEqual(dimensions.get_category('Sales').name, 'Sales')
+            self.assertEqual(dimensions.get_job_type('Internship').name, 'Internship')
+            self.assertIsNone(dimensions.get_category('Unknown'))
+
+    def test_first_load_creates_the_missing_rows(self):
+        # Categories, job types and tags: a select, an insert and a select each. Companies: the same
+        # plus the new ones' tags, then the metadata update and the tag links.
+        with self.assertNumQueries(3 * 3 + 4 + 2):
+            DimensionCache.from_websites(self.websites)
+        self.assertEqual(Company.objects.get(name='Alpha').logo, 'alpha.png')
+        self.assertEqual(sorted(Company.objects.get(name='Alpha').tags.values_list('name', flat=True)), ['Retail', 'Tech'])
+
+    def test_later_loads_only_read(self):
+        DimensionCache.from_websites(self.websites)
+        # One select per dimension, plus the companies' tags
+        with self.assertNumQueries(5):
+            dimensions = DimensionCache.from_websites(self.websites)
+        self.assertEqual(set(dimensions.companies), {'Alpha', 'Beta'})
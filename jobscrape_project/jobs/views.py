@@ -5,12 +5,12 @@ from rest_framework.pagination import PageNumberPagination
 from django.db.models import Q, Case, When, Value, DateTimeField, IntegerField
 from datetime import datetime, timezone, timedelta
 from django.utils import timezone
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 
 from jobs.models import JobListing, Company
 from jobs.serializers import JobSerializer, CompanySerializer, CompnayAllJobSerializer
 
-from jobs.job_titles import job_titles
+from utils.autocomplete import autocomplete
+from utils.search import search_jobs
 
 
 SYNONYMS = {
@@ -29,8 +29,8 @@ def job_title_autocomplete(request):
     if not search_term:
         return Response([])
 
-    # Match job titles from the predefined list
-    matching_jobs = [title for title in job_titles if search_term.lower() in title.lower()][:10]  # Limit to 10 results
+    # Titles with a word starting with the term, the ones with the most live jobs first
+    matching_jobs = autocomplete(search_term, limit=10)
 
     return Response(matching_jobs)
 
@@ -47,6 +47,59 @@ class StandardResultsSetPagination(PageNumberPagination):
             'results': data
         })
     
+def filter_jobs(queryset, query_params, min_results=StandardResultsSetPagination.page_size):
+    # The days, search, location, category and job_type filters shared by /jobs/ and /companies/<id>/jobs/
+    days = query_params.get('days', None)
+    search = query_params.get('search', None)
+    fuzzy = query_params.get('fuzzy', None)
+    location = query_params.get('location', None)
+    category = query_params.get('category', None)
+    job_types = query_params.getlist('job_type', None)
+
+    # The stored search vector is only for matching, never worth sending to the client
+    queryset = queryset.defer('search_vector')
+
+    # Apply the filtering if 'days' is not None
+    if days is not None:
+        cutoff_date = timezone.now() - timedelta(days=int(days))
+        # posted_on lets PostgreSQL skip the partitions of older weeks
+        queryset = queryset.filter(posted_on__gte=timezone.localtime(cutoff_date).date()).filter(
+            Q(date_posted__isnull=False, date_posted__gte=cutoff_date) |
+            Q(date_posted__isnull=True, discovered_at__gte=cutoff_date)
+        ).annotate(
+            ordering_date=Case(
+                When(date_posted__isnull=False, then='date_posted'),
+                When(date_posted__isnull=True, then='discovered_at'),
+                output_field=DateTimeField()
+            ),
+            priority=Case(
+                When(date_posted__isnull=False, then=Value(0)),
+                When(date_posted__isnull=True, then=Value(1)),
+                output_field=IntegerField()
+            )
+        ).order_by('priority', '-ordering_date')
+
+    if location is not None:
+        queryset = queryset.filter(state_location__iexact=location)
+
+    if category is not None:
+        queryset = queryset.filter(category__name__iexact=category)
+
+    if job_types:
+        queryset = queryset.filter(job_type__name__in=job_types)
+
+    if search is not None and search != '':
+        # Matched against the stored search vector (GIN index), the term's synonyms included.
+        # fuzzy=true always adds titles that are only close to the search, fuzzy=false never
+        # does, by default they fill in when there's less than a page of exact matches.
+        results = search_jobs(queryset, search, SYNONYMS, fuzzy=fuzzy == 'true')
+        if fuzzy is None and len(results.values_list('id', flat=True)[:min_results]) < min_results:
+            results = search_jobs(queryset, search, SYNONYMS, fuzzy=True)
+        queryset = results
+
+    return queryset
+
+
 class JobViewSet(viewsets.ModelViewSet):
     queryset = JobListing.objects.all()
     serializer_class = JobSerializer
@@ -55,54 +108,7 @@ class JobViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = JobListing.objects.all().order_by('title')
-        
-        days = self.request.query_params.get('days', None)
-        search = self.request.query_params.get('search', None)
-        location = self.request.query_params.get('location', None)
-        category = self.request.query_params.get('category', None)
-        job_types = self.request.query_params.getlist('job_type', None)
-
-        # Apply the filtering if 'days' is not None
-        if days is not None:
-            cutoff_date = timezone.now() - timedelta(days=int(days))
-            queryset = queryset.filter(
-                Q(date_posted__isnull=False, date_posted__gte=cutoff_date) |
-                Q(date_posted__isnull=True, discovered_at__gte=cutoff_date)
-            ).annotate(
-                ordering_date=Case(
-                    When(date_posted__isnull=False, then='date_posted'),
-                    When(date_posted__isnull=True, then='discovered_at'),
-                    output_field=DateTimeField()
-                ),
-                priority=Case(
-                    When(date_posted__isnull=False, then=Value(0)),
-                    When(date_posted__isnull=True, then=Value(1)),
-                    output_field=IntegerField()
-                )
-            ).order_by('priority', '-ordering_date')
-
-
-        if search is not None and search != '':
-            vector = SearchVector('title')
-            # Look up any synonyms for the search term
-            synonyms = SYNONYMS.get(search.lower(), [])
-            # Create a SearchQuery for the search term and any synonyms
-            query = SearchQuery(search, search_type='plain')
-            for synonym in synonyms:
-                query |= SearchQuery(synonym, search_type='plain')
-            queryset = queryset.annotate(rank=SearchRank(vector, query)).filter(rank__gte=0.01).order_by('-rank')
-
-        if location is not None:
-            queryset = queryset.filter(state_location__iexact=location)
-
-
-        if category is not None:
-            queryset = queryset.filter(category__name__iexact=category)
-
-        if job_types:
-            queryset = queryset.filter(job_type__name__in=job_types)
-
-        return queryset
+        return filter_jobs(queryset, self.request.query_params)
 
 
 class CompanyViewSet(viewsets.ModelViewSet):
@@ -123,49 +129,7 @@ class CompanyViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def jobs(self, request, pk=None):
         jobs = JobListing.objects.filter(company_id=pk).order_by('title')
-
-        days = self.request.query_params.get('days', None)
-        search = self.request.query_params.get('search', None)
-        location = self.request.query_params.get('location', None)
-        category = self.request.query_params.get('category', None)
-        job_types = self.request.query_params.getlist('job_type', None)
-
-        if days is not None:
-            cutoff_date = timezone.now() - timedelta(days=int(days))
-            jobs = jobs.filter(
-                Q(date_posted__isnull=False, date_posted__gte=cutoff_date) |
-                Q(date_posted__isnull=True, discovered_at__gte=cutoff_date)
-            ).annotate(
-                ordering_date=Case(
-                    When(date_posted__isnull=False, then='date_posted'),
-                    When(date_posted__isnull=True, then='discovered_at'),
-                    output_field=DateTimeField()
-                ),
-                priority=Case(
-                    When(date_posted__isnull=False, then=Value(0)),
-                    When(date_posted__isnull=True, then=Value(1)),
-                    output_field=IntegerField()
-                )
-            ).order_by('priority', '-ordering_date')
-        
-        if search is not None and search != '':
-            vector = SearchVector('title')
-            # Look up any synonyms for the search term
-            synonyms = SYNONYMS.get(search.lower(), [])
-            # Create a SearchQuery for the search term and any synonyms
-            query = SearchQuery(search, search_type='plain')
-            for synonym in synonyms:
-                query |= SearchQuery(synonym, search_type='plain')
-            jobs = jobs.annotate(rank=SearchRank(vector, query)).filter(rank__gte=0.01).order_by('-rank')
-        
-        if location is not None:
-            jobs = jobs.filter(state_location__iexact=location)
-        
-        if category is not None:
-            jobs = jobs.filter(category__name__iexact=category)
-        
-        if job_types:
-            jobs = jobs.filter(job_type__name__in=job_types)
+        jobs = filter_jobs(jobs, self.request.query_params)
 
         page = self.paginate_queryset(jobs)
         if page is not None:
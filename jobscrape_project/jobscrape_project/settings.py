@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'jobs',
     'rest_framework',
     
@@ -119,6 +120,8 @@ else:
             'PASSWORD': os.getenv('DEV_DB_PASSWORD'),
             'HOST': os.getenv('DEV_DB_HOST'),
             'PORT': os.getenv('DEV_DB_PORT'),
+            # A file for the sqlite test database lets the worker processes of a parallel scrape test reach it
+            'TEST': {'NAME': os.getenv('DEV_TEST_DB_NAME')},
         }
     }
 
@@ -1 +1 @@
-from .date_conversion import convert_date_format
+from .date_conversion import convert_date_format, convert_dates
@@ -0,0 +1,130 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stops a misconfigured endpoint from being paged through forever
+DEFAULT_MAX_PAGES = 100
+
+FIELDS = ('title', 'location', 'date', 'link')
+
+
+class PageLimitReached(Exception):
+    # The endpoint has more jobs than max_pages pages hold, so the slice was only partly read
+    pass
+
+
+def get_path(data, path):
+    # Follow a dotted path ("locations.0.name") through nested dicts and lists. An empty
+    # path is the data itself, a missing key gives None.
+    if not path:
+        return data
+    for key in path.split('.'):
+        if isinstance(data, list):
+            try:
+                data = data[int(key)]
+            except (ValueError, IndexError):
+                return None
+        elif isinstance(data, dict):
+            data = data.get(key)
+        else:
+            return None
+        if data is None:
+            return None
+    return data
+
+
+class ApiSource:
+    # Reads job listings from a site's JSON endpoint (Workday, Greenhouse, Lever and the like)
+    # instead of rendering its career pages. Configured in websites.json with "mode": "api" and
+    # an "api" object:
+    #
+    #   method       GET (pagination in the query string) or POST (pagination in the JSON body)
+    #   params/body  fixed query parameters / JSON body sent with every request
+    #   pagination   "offset" (page_param counts jobs), "page" (page_param counts pages,
+    #                starting at first_page) or "none"
+    #   page_param, size_param, page_size
+    #   max_pages    most pages read per url (default DEFAULT_MAX_PAGES). Raise it for sites with
+    #                more jobs than that: reaching it while the endpoint still has jobs fails the
+    #                slice, so its unseen jobs are kept instead of purged.
+    #   jobs_path    where the list of jobs is in the response ("" when it is the response)
+    #   total_path   where the total number of jobs is, if the endpoint says
+    #   fields       path of title, location, date and link within a job
+    #   link_prefix  put in front of relative links
+    #
+    # The job_urls of the site are the endpoint urls.
+
+    def __init__(self, website_config):
+        api = website_config['api']
+        self.method = api.get('method', 'GET').upper()
+        self.params = api.get('params', {})
+        self.body = api.get('body', {})
+        self.pagination = api.get('pagination', 'offset')
+        self.page_param = api.get('page_param', 'offset' if self.pagination == 'offset' else 'page')
+        self.size_param = api.get('size_param', 'limit')
+        self.page_size = api.get('page_size', 20)
+        self.first_page = api.get('first_page', 1)
+        self.max_pages = api.get('max_pages', DEFAULT_MAX_PAGES)
+        self.jobs_path = api.get('jobs_path', '')
+        self.total_path = api.get('total_path', None)
+        self.fields = api['fields']
+        self.link_prefix = api.get('link_prefix', '')
+
+    def get_request(self, page):
+        # Keyword arguments for StaticFetcher.fetch() of the given page (1-based)
+        paging = {}
+        if self.pagination == 'offset':
+            paging = {self.page_param: (page - 1) * self.page_size, self.size_param: self.page_size}
+        elif self.pagination == 'page':
+            paging = {self.page_param: self.first_page + page - 1, self.size_param: self.page_size}
+
+        if self.method == 'GET':
+            return {'method': 'GET', 'params': {**self.params, **paging}}
+        return {'method': self.method, 'params': self.params, 'json': {**self.body, **paging}}
+
+    def get_field(self, job, field):
+        # A field without a path isn't on the endpoint (an empty path would be the whole job)
+        path = self.fields.get(field)
+        return get_path(job, path) if path else None
+
+    def get_link(self, job):
+        link = self.get_field(job, 'link')
+        if link is not None and self.link_prefix and not link.startswith(('http://', 'https://')):
+            link = self.link_prefix + link
+        return link
+
+    def get_text(self, job, field):
+        value = self.get_field(job, field)
+        if isinstance(value, list):
+            # e.g. several locations
+            value = ', '.join(str(item) for item in value if item is not None)
+        return str(value).strip() if value is not None else None
+
+    def parse(self, data):
+        # The page's jobs as the {title, location, date, link} dicts the extractors return,
+        # and the total number of jobs if the endpoint reports it
+        jobs = get_path(data, self.jobs_path) or []
+        job_data = [
+            {
+                'title': self.get_text(job, 'title'),
+                'location': self.get_text(job, 'location'),
+                'date': self.get_text(job, 'date'),
+                'link': self.get_link(job),
+            }
+            for job in jobs
+        ]
+        total = get_path(data, self.total_path) if self.total_path else None
+        return job_data, total
+
+    def has_next_page(self, page, job_count, total):
+        if self.pagination == 'none' or job_count == 0:
+            return False
+        more = job_count >= self.page_size
+        if total is not None:
+            try:
+                more = page * self.page_size < int(total)
+            except (TypeError, ValueError):
+                pass
+        if more and page >= self.max_pages:
+            logger.error(f"Stopped at max_pages ({self.max_pages}) with jobs left (total: {total}), raise max_pages")
+            raise PageLimitReached(f"More than {self.max_pages} pages of jobs")
+        return more
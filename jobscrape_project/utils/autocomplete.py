@@ -0,0 +1,137 @@
+from bisect import bisect_left
+from functools import lru_cache
+import heapq
+import logging
+import re
+import threading
+import time
+
+from django.db import DatabaseError, connections
+from django.db.models import Count
+
+from jobs.job_titles import job_titles
+from jobs.models import JobListing, ScrapeRun
+
+logger = logging.getLogger(__name__)
+
+# How often (seconds) a request may check whether a scrape finished since the index was built
+REFRESH_CHECK_SECONDS = 60
+CACHE_SIZE = 4096
+WORD_START = re.compile(r'\b\w')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    return SPACES.sub(' ', text).strip().lower()
+
+
+class TitleIndex:
+    # Job titles for autocomplete: the predefined job_titles plus every title that is in
+    # JobListing, each with its number of live jobs. Every title is stored in one sorted array
+    # under each of its word starts ("senior software engineer", "software engineer",
+    # "engineer"), so the titles with a word starting with the typed text are one bisect away.
+
+    def __init__(self, title_counts):
+        self.titles = []
+        self.counts = []
+        self.word_starts = []
+        keys = []
+        for title, count in title_counts.items():
+            title_id = len(self.titles)
+            lowered = normalize(title)
+            self.titles.append(title)
+            self.counts.append(count)
+            self.word_starts.append([lowered[match.start():] for match in WORD_START.finditer(lowered)])
+            for key in self.word_starts[-1]:
+                keys.append((key, title_id))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.title_ids = [title_id for _, title_id in keys]
+        # Every title's position in the results: most live jobs first, then alphabetically
+        self.by_rank = sorted(range(len(self.titles)), key=lambda title_id: (-self.counts[title_id], self.titles[title_id]))
+        self.rank = [0] * len(self.titles)
+        for position, title_id in enumerate(self.by_rank):
+            self.rank[title_id] = position
+        self.complete = lru_cache(maxsize=CACHE_SIZE)(self._complete)
+
+    @classmethod
+    def build(cls):
+        # Casing variants of a title count as one, shown the way most jobs write it
+        counts = {}
+        spellings = {}
+        for title, count in JobListing.objects.exclude(title__isnull=True).values_list('title').annotate(count=Count('id')):
+            key = normalize(title)
+            counts[key] = counts.get(key, 0) + count
+            if count > spellings.get(key, ('', 0))[1]:
+                spellings[key] = (title, count)
+        for title in job_titles:
+            key = normalize(title)
+            counts.setdefault(key, 0)
+            spellings.setdefault(key, (title, 0))
+        return cls({spellings[key][0]: count for key, count in counts.items()})
+
+    def _complete(self, prefix, limit):
+        # The `limit` best ranked titles with a word starting with prefix
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        # With m of the n titles matching, a walk in rank order finds `limit` of them after about
+        # limit * n / m titles, cheaper than ranking all m once m * m > limit * n
+        if (end - start) ** 2 > limit * len(self.titles):
+            best = []
+            for title_id in self.by_rank:
+                if any(word_start.startswith(prefix) for word_start in self.word_starts[title_id]):
+                    best.append(title_id)
+                    if len(best) == limit:
+                        break
+        else:
+            best = heapq.nsmallest(limit, set(self.title_ids[start:end]), key=self.rank.__getitem__)
+        return [self.titles[title_id] for title_id in best]
+
+
+_index = None
+_index_run = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def get_latest_run():
+    return ScrapeRun.objects.filter(finished_at__isnull=False).order_by('-finished_at').values_list('id', flat=True).first()
+
+
+def get_index():
+    # Built on first use and rebuilt once a newer scrape run has finished. The check is a query,
+    # so it runs at most every REFRESH_CHECK_SECONDS; requests in between only read memory.
+    global _index, _index_run, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < REFRESH_CHECK_SECONDS:
+        return _index
+    with _lock:
+        if _index is None or time.monotonic() - _checked_at >= REFRESH_CHECK_SECONDS:
+            latest_run = get_latest_run()
+            if _index is None or latest_run != _index_run:
+                _index = TitleIndex.build()
+                _index_run = latest_run
+            _checked_at = time.monotonic()
+    return _index
+
+
+def warm_index():
+    # Build the index in the background at startup, so the first autocomplete request doesn't wait for it
+    def build():
+        try:
+            get_index()
+        except DatabaseError as e:
+            # e.g. a database that isn't migrated yet, the first request tries again
+            logger.warning(f"Autocomplete index not built at startup: {e}")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=build, name='autocomplete-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def autocomplete(term, limit=10):
+    prefix = normalize(term)
+    if not prefix:
+        return []
+    return get_index().complete(prefix, limit)
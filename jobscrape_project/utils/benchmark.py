@@ -0,0 +1,404 @@
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import lxml.html
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.text import slugify
+
+from jobs.models import JobListing, ListingPage, ScrapeCheckpoint, ScrapeRun
+
+from .date_conversion import convert_date_format, convert_dates, site_formats
+from .dimension_cache import DimensionCache
+from .extraction import SiteExtractor, get_extractor, parse_html
+from .job_scraper import JobScraper
+from .politeness import DomainPolicy, PolitenessScheduler
+from .telemetry import get_run_stats
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = 'data/snapshots'
+# Results of the committed snapshots that every run is compared against
+BASELINE_PATH = os.path.join(SNAPSHOT_DIR, 'baseline.json')
+# Jobs per page (or per load more click) of the paginated and load more variants
+PAGE_SIZE = 10
+
+# Metric -> True when higher is better
+METRICS = {
+    'pages_per_second': True,
+    'jobs_per_second': True,
+    'parse_ms_per_page': False,
+    'queries_per_job': False,
+    'queries_per_page': False,
+    'dates_per_second': True,
+}
+# The metrics a regression fails on: they come out the same on every machine. Timings depend on the
+# machine and its load, against a baseline recorded elsewhere they are only reported.
+GATED_METRICS = ('queries_per_job', 'queries_per_page')
+
+# What the date selectors of the sites return, one list per (imaginary) site
+DATE_SAMPLES = {
+    'absolute': ['Jun 14, 2023', 'Jun 15, 2023', 'Dec 1, 2023', 'Mar 3, 2023', 'May 30, 2023'],
+    'numeric': ['06/14/2023', '07/01/2023', '12/31/2023', '01/02/2024'],
+    'iso': ['2023-06-14', '2023-06-15T10:00:00', '2023-06-16T08:30:00Z'],
+    'day_first': ['14 Jun 2023', '1 Dec 2023', '15 June 2023'],
+    'relative': ['Today', 'Posted Today', '3 days ago', 'Posted 30+ Days Ago', '2 months', 'Yesterday'],
+}
+
+LOAD_MORE_SCRIPT = """
+var chunks = %s;
+document.getElementById('bench-load-more').addEventListener('click', function (event) {
+    var button = event.target;
+    setTimeout(function () {
+        var jobs = document.querySelectorAll(%s);
+        jobs[jobs.length - 1].insertAdjacentHTML('afterend', chunks.shift());
+        if (!chunks.length) button.remove();
+    }, 50);
+});
+"""
+
+
+def get_snapshot_dir(website_config, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, slugify(website_config['company_name']))
+
+
+def load_snapshots(website_config, snapshot_dir=SNAPSHOT_DIR):
+    # {listing url: html} of the pages captured for a company
+    directory = get_snapshot_dir(website_config, snapshot_dir)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    snapshots = {}
+    for url, filename in manifest['pages'].items():
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            snapshots[url] = f.read()
+    return snapshots
+
+
+def save_snapshots(website_config, snapshots, snapshot_dir=SNAPSHOT_DIR):
+    directory = get_snapshot_dir(website_config, snapshot_dir)
+    os.makedirs(directory, exist_ok=True)
+    pages = {}
+    for number, (url, html) in enumerate(snapshots.items(), start=1):
+        pages[url] = f'{number}.html'
+        with open(os.path.join(directory, pages[url]), 'w', encoding='utf-8') as f:
+            f.write(html)
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump({'company_name': website_config['company_name'], 'pages': pages}, f, indent=2)
+
+
+def capture_snapshots(websites, snapshot_dir=SNAPSHOT_DIR):
+    # Store the rendered listing pages of every company, the only step that talks to the real sites
+    scraper = JobScraper(driver_path='drivers/chromedriver.exe', dynamic=True)
+    try:
+        for website in websites['companies']:
+            snapshots = {}
+            for job in website['job_urls']:
+                for url in job.get('url', []):
+                    if scraper.is_dynamic(website):
+                        readiness = scraper.get_readiness(website)
+                        scraper.driver.get(url)
+                        readiness.wait_for_page(scraper.driver)
+                        snapshots[url] = scraper.driver.page_source
+                    else:
+                        snapshots[url] = scraper.fetcher.fetch(url).text
+            save_snapshots(website, snapshots, snapshot_dir)
+            logger.info(f"Captured {len(snapshots)} pages of {website['company_name']}")
+    finally:
+        scraper.close()
+
+
+def build_variants(html, website_config, page_size=PAGE_SIZE):
+    # Turn one captured page into a paginated site (a next link on every page) and a load more site
+    # (a button that adds the next jobs), both for replaying through the browser
+    extractor = get_extractor(website_config)
+    root = parse_html(html)
+    if not isinstance(extractor, SiteExtractor) or root is None:
+        return {}
+    job_count = len(extractor.job(root))
+    if job_count <= page_size:
+        return {}
+
+    pages = []
+    for start in range(0, job_count, page_size):
+        page_root = deepcopy(root)
+        for index, job_element in enumerate(extractor.job(page_root)):
+            if not start <= index < start + page_size:
+                job_element.drop_tree()
+        if start + page_size < job_count:
+            next_link = lxml.html.fragment_fromstring(f'<a id="bench-next" href="{len(pages) + 2}.html">Next</a>')
+            page_root.body.append(next_link)
+        pages.append(lxml.html.tostring(page_root, encoding='unicode'))
+
+    load_more_root = deepcopy(root)
+    chunks = []
+    for index, job_element in enumerate(extractor.job(load_more_root)):
+        if index >= page_size:
+            if (index - page_size) % page_size == 0:
+                chunks.append('')
+            chunks[-1] += lxml.html.tostring(job_element, encoding='unicode', with_tail=False)
+            job_element.drop_tree()
+    load_more_root.body.append(lxml.html.fragment_fromstring('<button id="bench-load-more">Load more</button>'))
+    script = lxml.html.Element('script')
+    script.text = LOAD_MORE_SCRIPT % (json.dumps(chunks), json.dumps(website_config['job_selector']))
+    load_more_root.body.append(script)
+
+    return {'paginated': pages, 'load_more': lxml.html.tostring(load_more_root, encoding='unicode')}
+
+
+class SnapshotServer:
+    # Serves the snapshots from memory on localhost, with ETags so conditional requests get a 304.
+    # fail() makes a path answer with errors first, like a flaky site.
+
+    def __init__(self):
+        self.pages = {}
+        self.failures = {}
+        # Paths in the order they were requested
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                failures = server.failures.get(self.path)
+                if failures:
+                    status, retry_after = failures.pop(0)
+                    self.send_response(status)
+                    if retry_after is not None:
+                        self.send_header('Retry-After', str(retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                html = server.pages.get(self.path)
+                if html is None:
+                    self.send_error(404)
+                    return
+                body = html.encode('utf-8')
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def add(self, path, html):
+        self.pages[path] = html
+        return self.base_url + path
+
+    def fail(self, path, status, times=1, retry_after=None):
+        self.failures.setdefault(path, []).extend([(status, retry_after)] * times)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class QueryCounter:
+    # Counts the queries of every database connection, including the ones the pipeline's
+    # threads open while it is installed
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        connection_created.connect(self.install)
+        for connection in connections.all():
+            self.install(connection=connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.install)
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+def build_benchmark_websites(websites, server, browser=False, snapshot_dir=SNAPSHOT_DIR):
+    # {variant: websites.json like configuration pointing at the local server}
+    variants = {'page': [], 'paginated': [], 'load_more': []}
+    for website in websites['companies']:
+        snapshots = load_snapshots(website, snapshot_dir)
+        if not snapshots:
+            logger.warning(f"No snapshots for {website['company_name']}, skipping it")
+            continue
+        slug = slugify(website['company_name'])
+        base_config = dict(website, dynamic=browser, load_more_selector=None, infinite_scroll=False,
+                           next_page_selector=None)
+
+        job_urls = []
+        for job in website['job_urls']:
+            urls = [
+                server.add(f'/{slug}/page/{list(snapshots).index(url) + 1}.html', snapshots[url])
+                for url in job.get('url', []) if url in snapshots
+            ]
+            if urls:
+                job_urls.append(dict(job, url=urls))
+        variants['page'].append(dict(base_config, job_urls=job_urls))
+
+        if not browser:
+            # Pagination and load more buttons only exist in a browser
+            continue
+        first_job = job_urls[0] if job_urls else None
+        if first_job is None:
+            continue
+        extra = build_variants(next(iter(snapshots.values())), website)
+        if not extra:
+            continue
+        for number, html in enumerate(extra['paginated'], start=1):
+            server.add(f'/{slug}/paginated/{number}.html', html)
+        variants['paginated'].append(dict(
+            base_config, next_page_selector='#bench-next',
+            job_urls=[dict(first_job, url=[f'{server.base_url}/{slug}/paginated/1.html'])],
+        ))
+        variants['load_more'].append(dict(
+            base_config, load_more_selector='#bench-load-more',
+            job_urls=[dict(first_job, url=[server.add(f'/{slug}/load_more/1.html', extra['load_more'])])],
+        ))
+
+    return {
+        variant: dict(websites, companies=companies) for variant, companies in variants.items() if companies
+    }
+
+
+def run_pass(websites, dimensions, scheduler, browser=False):
+    # One scrape of every company, returns its metrics
+    run = ScrapeRun.objects.create()
+    scraper = JobScraper(driver_path='drivers/chromedriver.exe', dynamic=browser, dimensions=dimensions,
+                         run_id=run.id, scheduler=scheduler)
+    job_categories = websites.get('job_categories', {})
+    job_types = websites.get('job_types', {})
+    try:
+        with QueryCounter() as queries:
+            start = time.perf_counter()
+            for website in websites['companies']:
+                scraper.scrape_jobs(website, job_categories, job_types)
+            elapsed = time.perf_counter() - start
+    finally:
+        scraper.close()
+
+    totals = get_run_stats(run)['totals']
+    pages, jobs = totals['pages'], totals['jobs_found']
+    # Per job metrics are left out of warm passes, where every page is skipped
+    return {
+        'seconds': round(elapsed, 3),
+        'pages': pages,
+        'jobs': jobs,
+        'pages_per_second': round(pages / elapsed, 2),
+        'jobs_per_second': round(jobs / elapsed, 2) if jobs else None,
+        'parse_ms_per_page': round(totals['parse_seconds'] * 1000 / pages, 3) if pages else None,
+        'queries_per_job': round(queries.count / jobs, 3) if jobs else None,
+        'queries_per_page': round(queries.count / pages, 3) if pages else None,
+    }
+
+
+def reset_tables():
+    # Every cold pass starts from an empty job table, as a first run would
+    JobListing.objects.all().delete()
+    ListingPage.objects.all().delete()
+    ScrapeCheckpoint.objects.all().delete()
+
+
+def run_benchmark(websites, browser=False, repeat=5, snapshot_dir=SNAPSHOT_DIR):
+    # Replays the snapshots through the scraper. Every variant is scraped cold (empty tables) and
+    # warm (right after, so pages come back unchanged); the best of `repeat` rounds is kept (best_of).
+    # Must be run against a throwaway database.
+    results = {}
+    with SnapshotServer() as server:
+        benchmark_websites = build_benchmark_websites(websites, server, browser, snapshot_dir)
+        # The local server doesn't need protecting
+        scheduler = PolitenessScheduler({'127.0.0.1': DomainPolicy(max_concurrency=64, requests_per_minute=10 ** 9, burst=10 ** 6)})
+        for variant, variant_websites in benchmark_websites.items():
+            dimensions = DimensionCache.from_websites(variant_websites)
+            rounds = {'cold': [], 'warm': []}
+            for _ in range(repeat):
+                reset_tables()
+                rounds['cold'].append(run_pass(variant_websites, dimensions, scheduler, browser))
+                rounds['warm'].append(run_pass(variant_websites, dimensions, scheduler, browser))
+            results[variant] = {scrape_pass: best_of(pass_results) for scrape_pass, pass_results in rounds.items()}
+    return results
+
+
+def best_of(pass_results):
+    # The best value of every metric over the rounds, each one on its own: a hiccup in one round
+    # (a GC pause, another process) shouldn't decide the parse time of a run that was fast elsewhere
+    best = dict(min(pass_results, key=lambda result: result['seconds']))
+    for metric, higher_is_better in METRICS.items():
+        values = [result[metric] for result in pass_results if result.get(metric) is not None]
+        if values:
+            best[metric] = max(values) if higher_is_better else min(values)
+    return best
+
+
+def run_date_benchmark(jobs_per_page=25, pages=400):
+    # Date parsing of `pages` listing pages per sample site, job by job and a page at a time
+    results = {}
+    for name, parse_page in (
+        ('single', lambda site, page: [convert_date_format(date_str, site) for date_str in page]),
+        ('batch', lambda site, page: convert_dates(page, site)),
+    ):
+        site_formats.clear()
+        count = 0
+        start = time.perf_counter()
+        for site, samples in DATE_SAMPLES.items():
+            page = [samples[index % len(samples)] for index in range(jobs_per_page)]
+            for _ in range(pages):
+                parse_page(site, page)
+                count += len(page)
+        elapsed = time.perf_counter() - start
+        results[name] = {'seconds': round(elapsed, 3), 'dates': count, 'dates_per_second': round(count / elapsed)}
+    return {'dates': results}
+
+
+def compare_to_baseline(results, baseline, threshold, compared_metrics=GATED_METRICS):
+    # Returns a description of every compared metric that got worse than the baseline by more than threshold
+    regressions = []
+    for variant, passes in baseline.items():
+        for scrape_pass, metrics in passes.items():
+            current = results.get(variant, {}).get(scrape_pass)
+            if current is None:
+                continue
+            for metric in compared_metrics:
+                higher_is_better = METRICS[metric]
+                if not metrics.get(metric) or current.get(metric) is None:
+                    continue
+                change = (current[metric] - metrics[metric]) / metrics[metric]
+                if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+                    regressions.append(
+                        f"{variant}/{scrape_pass} {metric}: {metrics[metric]} -> {current[metric]} ({change:+.0%})"
+                    )
+    return regressions
@@ -0,0 +1,110 @@
+import logging
+import os
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+logger = logging.getLogger(__name__)
+
+# Listing pages only need their markup and scripts
+BLOCKED_RESOURCES = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mov', '*.m4v', '*.mp3', '*.m4a', '*.ogg', '*.wav',
+]
+
+BLOCKED_TRACKERS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googleadservices.com*', '*doubleclick.net*',
+    '*adservice.google.com*', '*connect.facebook.net*', '*facebook.com/tr*', '*bat.bing.com*',
+    '*clarity.ms*', '*hotjar.com*', '*segment.io*', '*cdn.segment.com*', '*optimizely.com*',
+    '*nr-data.net*', '*js-agent.newrelic.com*', '*snap.licdn.com*', '*px.ads.linkedin.com*',
+    '*analytics.tiktok.com*', '*adsrvr.org*', '*quantserve.com*', '*scorecardresearch.com*',
+]
+
+
+def get_process_tree_rss(pid):
+    # Resident memory (bytes) of a process and all of its descendants, read from /proc.
+    # Returns None where /proc isn't available.
+    if not os.path.isdir('/proc'):
+        return None
+
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, the parent pid comes right after it
+                parent_pid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent_pid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class BrowserProfile:
+    # How the scraper's Chrome is started, and when it gets replaced by a fresh one
+
+    def __init__(self, headless=True, page_load_strategy='eager', block_resources=True,
+                 recycle_after_pages=50, max_memory_mb=1024):
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block_resources = block_resources
+        self.recycle_after_pages = recycle_after_pages
+        self.max_memory_mb = max_memory_mb
+
+    def get_options(self):
+        options = Options()
+        if self.headless:
+            options.add_argument("--headless=new")
+        # Keep the desktop layout the selectors were written against
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--mute-audio")
+        options.page_load_strategy = self.page_load_strategy
+        if self.block_resources:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        return options
+
+    def create_driver(self):
+        driver = webdriver.Chrome(options=self.get_options())
+        if self.block_resources:
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCES + BLOCKED_TRACKERS})
+            except WebDriverException as e:
+                logger.warning(f"Could not block resources through CDP: {e}")
+        return driver
+
+    def needs_recycling(self, driver, pages_loaded):
+        if self.recycle_after_pages and pages_loaded >= self.recycle_after_pages:
+            logger.info(f"Recycling Chrome after {pages_loaded} pages")
+            return True
+        if self.max_memory_mb:
+            try:
+                rss = get_process_tree_rss(driver.service.process.pid)
+            except AttributeError:
+                rss = None
+            if rss is not None and rss > self.max_memory_mb * 1024 * 1024:
+                logger.info(f"Recycling Chrome at {rss / 1024 / 1024:.0f} MB after {pages_loaded} pages")
+                return True
+        return False
@@ -0,0 +1,45 @@
+import logging
+
+from jobs.models import ScrapeCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class SliceCheckpoints:
+    # What a run already finished of one (company, category, job type) slice: completed urls, and
+    # for the url that was cut short, how many of its pages were written. The write stage records
+    # progress once a page is in the database, so a resumed run picks up right after it.
+
+    def __init__(self, run_id, company, category, job_type):
+        self.run_id = run_id
+        self.slice = {'company': company, 'category': category, 'job_type': job_type}
+        self.checkpoints = {
+            checkpoint.url: checkpoint
+            for checkpoint in ScrapeCheckpoint.objects.filter(run_id=run_id, **self.slice)
+        }
+
+    def is_url_done(self, url):
+        checkpoint = self.checkpoints.get(url)
+        return checkpoint is not None and checkpoint.completed
+
+    def get_pages_done(self, url):
+        checkpoint = self.checkpoints.get(url)
+        return checkpoint.pages_done if checkpoint is not None else 0
+
+    def save(self, url, **fields):
+        self.checkpoints[url], _ = ScrapeCheckpoint.objects.update_or_create(
+            run_id=self.run_id, url=url, defaults=fields, **self.slice
+        )
+
+    def page_done(self, url, page):
+        self.save(url, pages_done=page)
+
+    def url_done(self, url):
+        self.save(url, completed=True)
+
+    def get_remaining_urls(self, urls):
+        remaining = [url for url in urls if not self.is_url_done(url)]
+        if len(remaining) < len(urls):
+            logger.info(f"Resuming {self.slice['company']} / {self.slice['category']} / {self.slice['job_type']}: "
+                        f"{len(urls) - len(remaining)} of {len(urls)} urls already done")
+        return remaining
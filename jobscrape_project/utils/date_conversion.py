@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 from django.utils import timezone
 import calendar
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 def subtract_months(date, num_months):
     month = date.month - 1 - num_months
     year = date.year + month // 12
@@ -10,66 +13,132 @@ def subtract_months(date, num_months):
     day = min(date.day, calendar.monthrange(year, month)[1])
     return datetime(year, month, day)
 
-def convert_date_format(date_str):
-    
-    if date_str.lower() == "today":
-        return timezone.now()
+formats =  [
+    "%Y-%m-%d",             # YYYY-MM-DD
+    "%Y-%d-%m",             # YYYY-DD-MM
+    "%d-%m-%Y",             # DD-MM-YYYY
+    "%m-%d-%Y",             # MM-DD-YYYY
+    "%Y-%m-%dT%H:%M:%S",    # ISO 8601 / RFC 3339 without timezone
+    "%Y-%m-%dT%H:%M:%S%z",  # ISO 8601 / RFC 3339 with timezone
+    "%b %d, %Y",            # Month abbreviation followed by day and year: Jun 15, 2023
+    "%d %b %Y",             # Day followed by month abbreviation and year: 15 Jun 2023
+    "%b %d %Y",             # Month abbreviation followed by day and year without comma: Jun 15 2023
+    "%Y/%m/%d",             # YYYY/MM/DD
+    "%Y/%d/%m",             # YYYY/DD/MM
+    "%m/%d/%Y",             # MM/DD/YYYY
+    "%d/%m/%Y",             # DD/MM/YYYY
+
+    "%Y.%m.%d",             # YYYY.MM.DD
+    "%Y.%d.%m",             # YYYY.DD.MM
+    "%d.%m.%Y",             # DD.MM.YYYY
+    "%m.%d.%Y",             # MM.DD.YYYY
+    "%Y %b %d",             # YYYY Jun 15
+    "%Y %b. %d",            # YYYY Jun. 15
+    "%Y %B %d",             # YYYY June 15
+    "%Y-%b-%d",             # YYYY-Jun-15
+    "%Y-%B-%d",             # YYYY-June-15
+    "%d %b. %Y",            # 15 Jun. 2023
+    "%d %B %Y",             # 15 June 2023
+    "%d-%b-%Y",             # 15-Jun-2023
+    "%d-%B-%Y",             # 15-June-2023
+    "%d/%b/%Y",             # 15/Jun/2023
+    "%d/%B/%Y",             # 15/June/2023
+    "%B %d, %Y",            # June 15, 2023
+]
+
+LETTERS = re.compile(r'[A-Za-z]+')
+DIGITS = re.compile(r'\d+')
+SPACES = re.compile(r'\s+')
+
+def get_shape(date_str):
+    # "Jun 15, 2023" -> "a 9, 9": letters and digits collapsed, separators kept
+    return SPACES.sub(' ', DIGITS.sub('9', LETTERS.sub('a', date_str)))
+
+# Only formats whose output has the same shape as the string can parse it, in the order above.
+# The shapes come from formatting a sample date with every format.
+formats_by_shape = {}
+for date_format in formats:
+    formats_by_shape.setdefault(get_shape(datetime(2023, 6, 15, 12, 30, 45, tzinfo=timezone.utc).strftime(date_format)), []).append(date_format)
+
+# Relative dates, matched against the whole (lower cased) string
+RELATIVE_PATTERNS = [
+    (re.compile(r'^(?:today|just posted|just now)$'), lambda number: timezone.now()),
+    (re.compile(r'^yesterday$'), lambda number: timezone.now() - timedelta(days=1)),
+    (re.compile(r'^(?:about\s+|over\s+)?(\d+)\+?\s*(?:hours?|hrs?|h|minutes?|mins?)(?:\s+ago)?$'),
+     lambda number: timezone.now()),
+    (re.compile(r'^(?:about\s+|over\s+)?(\d+)\+?\s*(?:days?|d)(?:\s+ago)?$'),
+     lambda number: timezone.now() - timedelta(days=number)),
+    (re.compile(r'^(?:about\s+|over\s+)?(\d+)\+?\s*(?:weeks?|w)(?:\s+ago)?$'),
+     lambda number: timezone.now() - timedelta(weeks=number)),
+    (re.compile(r'^(?:about\s+|over\s+)?(\d+)\+?\s*(?:months?|mo|m)(?:\s+ago)?$'),
+     lambda number: subtract_months(timezone.now(), number)),
+]
+
+ISO_PREFIX = re.compile(r'^\d{4}-\d{2}-\d{2}T')
+# Words some sites put around the date: "Posted: 3 days ago", "Posted on Monday, June 5, 2023"
+POSTED_PREFIX = re.compile(r'^posted(?:\s+on)?\s*:?\s*', re.IGNORECASE)
+WEEKDAY_PREFIX = re.compile(
+    r'^(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tues?|wed|thu(?:rs?)?|fri|sat|sun)\.?,?\s+',
+    re.IGNORECASE
+)
+
+# The format that last worked for each site, tried before anything else. Only remembered when
+# the string couldn't also be read the other way round (05/06/2023 is May 6 or June 5), so a
+# site's first ambiguous date doesn't decide how the rest of its dates are read.
+site_formats = {}
+
+def parse_relative_date(date_str):
+    lowered = date_str.lower()
+    for pattern, convert in RELATIVE_PATTERNS:
+        match = pattern.match(lowered)
+        if match:
+            return convert(int(match.group(1)) if match.groups() else None)
+    return None
+
+def is_ambiguous(parsed, date_format):
+    return '%d' in date_format and '%m' in date_format and parsed.day <= 12 and parsed.day != parsed.month
 
-    if "d" in date_str.lower() or "day" in date_str.lower():
+def convert_date_format(date_str, site=None):
+    date_str = WEEKDAY_PREFIX.sub('', POSTED_PREFIX.sub('', date_str.strip()))
+
+    relative_date = parse_relative_date(date_str)
+    if relative_date is not None:
+        return relative_date
+
+    date_format = site_formats.get(site)
+    if date_format is not None:
         try:
-            days_ago = int(re.search(r'(\d+)', date_str).group())
-            target_date = timezone.now() - timedelta(days=days_ago)
-            return target_date
-        except (ValueError, AttributeError):
-            raise ValueError("Invalid format for days ago")
+            return datetime.strptime(date_str, date_format)
+        except ValueError:
+            pass
 
-    if "m" in date_str.lower() or "month" in date_str.lower():
+    if ISO_PREFIX.match(date_str):
         try:
-            months_ago = int(re.search(r'(\d+)', date_str).group())
-            target_date = subtract_months(timezone.now(), months_ago)
-            return target_date
-        except (ValueError, AttributeError):
-            raise ValueError("Invalid format for months ago")
-
-    formats =  [
-        "%Y-%m-%d",             # YYYY-MM-DD
-        "%Y-%d-%m",             # YYYY-DD-MM
-        "%d-%m-%Y",             # DD-MM-YYYY
-        "%m-%d-%Y",             # MM-DD-YYYY
-        "%Y-%m-%dT%H:%M:%S",    # ISO 8601 / RFC 3339 without timezone
-        "%Y-%m-%dT%H:%M:%S%z",  # ISO 8601 / RFC 3339 with timezone
-        "%b %d, %Y",            # Month abbreviation followed by day and year: Jun 15, 2023
-        "%d %b %Y",             # Day followed by month abbreviation and year: 15 Jun 2023
-        "%b %d %Y",             # Month abbreviation followed by day and year without comma: Jun 15 2023
-        "%Y/%m/%d",             # YYYY/MM/DD
-        "%Y/%d/%m",             # YYYY/DD/MM
-        "%m/%d/%Y",             # MM/DD/YYYY
-        "%d/%m/%Y",             # DD/MM/YYYY
-        
-        "%Y.%m.%d",             # YYYY.MM.DD
-        "%Y.%d.%m",             # YYYY.DD.MM
-        "%d.%m.%Y",             # DD.MM.YYYY
-        "%m.%d.%Y",             # MM.DD.YYYY
-        "%Y %b %d",             # YYYY Jun 15
-        "%Y %b. %d",            # YYYY Jun. 15
-        "%Y %B %d",             # YYYY June 15
-        "%Y-%b-%d",             # YYYY-Jun-15
-        "%Y-%B-%d",             # YYYY-June-15
-        "%d %b %Y",             # 15 Jun 2023
-        "%d %b. %Y",            # 15 Jun. 2023
-        "%d %B %Y",             # 15 June 2023
-        "%d-%b-%Y",             # 15-Jun-2023
-        "%d-%B-%Y",             # 15-June-2023
-        "%d/%b/%Y",             # 15/Jun/2023
-        "%d/%B/%Y",             # 15/June/2023
-    ]
-
-    for date_format  in formats:
+            return datetime.fromisoformat(date_str)
+        except ValueError:
+            pass
+
+    for date_format in formats_by_shape.get(get_shape(date_str), []):
         try:
-            return datetime.strptime(date_str, date_format)
-            # input_date = datetime.strptime(date_str, date_format).date()
-            # return input_date.strftime("%Y-%M-%D")
+            parsed = datetime.strptime(date_str, date_format)
         except ValueError:
             continue
+        if site is not None and not is_ambiguous(parsed, date_format):
+            site_formats[site] = date_format
+        return parsed
+
+    raise ValueError("Invalid date format. Please provide a valid date string.")
 
-    raise ValueError("Invalid date format. Please provide a valid date string.")
\ No newline at end of file
+def convert_dates(date_strs, site=None):
+    # Parse a whole page's dates at once: {date string: datetime, or None if it can't be parsed}.
+    # A page usually repeats the same few strings, each is only parsed (and warned about) once.
+    dates = {}
+    for date_str in date_strs:
+        if date_str is None or date_str in dates:
+            continue
+        try:
+            dates[date_str] = convert_date_format(date_str, site)
+        except ValueError as ve:
+            logger.warning(f"Failed to convert '{date_str}' to a date. Error: {ve}")
+            dates[date_str] = None
+    return dates
@@ -0,0 +1,105 @@
+import logging
+
+from jobs.models import Company, Tag, Category, JobType
+
+logger = logging.getLogger(__name__)
+
+# websites.json key -> Company field, synced on every run
+COMPANY_FIELDS = {
+    'company_logo': 'logo',
+    'company_desc': 'description',
+    'company_career_url': 'career_url',
+    'compnany_job_base_url': 'job_base_url',
+}
+
+
+def get_or_create_by_name(model, names):
+    # Resolve every name with one select, plus one insert and one select for the missing ones
+    names = set(names)
+    objects = {obj.name: obj for obj in model.objects.filter(name__in=names)}
+    missing = names - set(objects)
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        objects.update({obj.name: obj for obj in model.objects.filter(name__in=missing)})
+    return objects
+
+
+class DimensionCache:
+    # Company, Category, JobType and Tag rows for a whole scrape run, resolved up front
+    # from websites.json so the scrape itself never has to look them up again.
+
+    def __init__(self):
+        self.categories = {}
+        self.job_types = {}
+        self.tags = {}
+        self.companies = {}
+
+    @classmethod
+    def from_websites(cls, websites):
+        dimensions = cls()
+        dimensions.load(websites)
+        return dimensions
+
+    def load(self, websites):
+        companies = websites.get('companies', [])
+        self.categories = get_or_create_by_name(Category, websites.get('job_categories', {}).values())
+        self.job_types = get_or_create_by_name(JobType, websites.get('job_types', {}).values())
+        self.tags = get_or_create_by_name(
+            Tag, {tag_name for website in companies for tag_name in website.get('company_tags', [])}
+        )
+        self.load_companies(companies)
+
+    def load_companies(self, companies):
+        names = {website.get('company_name', "Not Disclosing") for website in companies}
+
+        self.companies = {}
+        for company in Company.objects.filter(name__in=names).order_by('id').prefetch_related('tags'):
+            self.companies.setdefault(company.name, company)
+
+        missing = names - set(self.companies)
+        if missing:
+            Company.objects.bulk_create([Company(name=name) for name in missing])
+            for company in Company.objects.filter(name__in=missing).order_by('id').prefetch_related('tags'):
+                self.companies.setdefault(company.name, company)
+
+        # Sync the company metadata by diff, so edits to websites.json reach existing companies too
+        changed = []
+        TagThrough = Company.tags.through
+        stale_tags = []
+        new_tags = []
+        for website in companies:
+            company = self.get_company(website)
+            updated = False
+            for key, field in COMPANY_FIELDS.items():
+                value = website.get(key, None)
+                if getattr(company, field) != value:
+                    setattr(company, field, value)
+                    updated = True
+            if updated:
+                changed.append(company)
+
+            current_tag_ids = {tag.id for tag in company.tags.all()}
+            wanted_tag_ids = {self.tags[tag_name].id for tag_name in website.get('company_tags', [])}
+            stale_tags.extend((company.id, tag_id) for tag_id in current_tag_ids - wanted_tag_ids)
+            new_tags.extend(
+                TagThrough(company_id=company.id, tag_id=tag_id) for tag_id in wanted_tag_ids - current_tag_ids
+            )
+
+        if changed:
+            Company.objects.bulk_update(changed, list(COMPANY_FIELDS.values()))
+        for company_id, tag_id in stale_tags:
+            TagThrough.objects.filter(company_id=company_id, tag_id=tag_id).delete()
+        if new_tags:
+            TagThrough.objects.bulk_create(new_tags, ignore_conflicts=True)
+
+        logger.info(f"Loaded {len(self.companies)} companies, {len(changed)} updated, "
+                    f"{len(stale_tags)} tags removed, {len(new_tags)} tags added")
+
+    def get_company(self, website_config):
+        return self.companies[website_config.get('company_name', "Not Disclosing")]
+
+    def get_category(self, name):
+        return self.categories.get(name)
+
+    def get_job_type(self, name):
+        return self.job_types.get(name)
@@ -0,0 +1,264 @@
+import json
+import logging
+
+import lxml.html
+from bs4 import BeautifulSoup
+from cssselect import HTMLTranslator, SelectorError
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# HTML rules, like the browser and BeautifulSoup: element names ignore case, :checked and the like work
+translator = HTMLTranslator()
+
+# Text of every descendant except what BeautifulSoup's get_text() leaves out too
+TEXT_XPATH = etree.XPath(
+    './/text()[not(ancestor::script or ancestor::style or ancestor::template)]', smart_strings=False
+)
+
+# Runs the site's selectors inside the page and returns every job as [title, location, date, link],
+# following the same rules as the extractors below
+BROWSER_EXTRACT_SCRIPT = """
+var config = arguments[0];
+var skipped = {SCRIPT: true, STYLE: true, TEMPLATE: true};
+function select(element, selector) {
+    return selector === null ? null : element.querySelector(selector);
+}
+function getText(found, nextSibling) {
+    if (!found) return null;
+    if (nextSibling) {
+        var next = found.nextSibling;
+        if (!next || (next.nodeType !== Node.TEXT_NODE && next.nodeType !== Node.COMMENT_NODE) || !next.nodeValue) return null;
+        return next.nodeValue.trim();
+    }
+    var parts = [];
+    var walker = document.createTreeWalker(found, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        var node = walker.currentNode;
+        if (skipped[node.parentNode.nodeName]) continue;
+        var value = node.nodeValue.trim();
+        if (value) parts.push(value);
+    }
+    return parts.join('');
+}
+var jobs = document.querySelectorAll(config.job);
+var result = [];
+for (var i = 0; i < jobs.length; i++) {
+    var job = jobs[i];
+    var link = config.linkInJobSelector ? job : select(job, config.link);
+    result.push([
+        getText(select(job, config.title), false),
+        getText(select(job, config.location), config.nextSibling),
+        getText(select(job, config.date), false),
+        link ? link.getAttribute('href') : null
+    ]);
+}
+return JSON.stringify(result);
+"""
+
+SELECTOR_KEYS = (
+    'job_selector', 'title_selector', 'location_selector', 'date_selector', 'link_selector',
+    'next_sibling', 'link_in_job_selector',
+)
+
+# Compiled extractors, one per distinct site configuration
+_extractors = {}
+
+
+def warn_missing_selectors(website_config):
+    # Once per site, rather than once for every job element
+    site = website_config.get('company_name', "Not Disclosing")
+    for field in ('title', 'location', 'date'):
+        if website_config.get(f'{field}_selector', None) is None:
+            logger.warning(f"{site}: {field}_selector is missing in the website configuration.")
+    if website_config.get('link_selector', None) is None and not website_config.get('link_in_job_selector', False):
+        logger.warning(f"{site}: link_selector is missing in the website configuration.")
+
+
+def compile_selector(selector):
+    # CSS -> XPath, compiled once and evaluated against the whole document
+    if selector is None:
+        return None
+    return etree.XPath(translator.css_to_xpath(selector.strip()), smart_strings=False)
+
+
+def parse_html(html):
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input that still carries an XML encoding declaration
+        return lxml.html.document_fromstring(html.encode('utf-8'))
+
+
+class SiteExtractor:
+    # Parses a listing page once with lxml and reads title/location/date/link from every
+    # job element with the site's precompiled selectors. The values match what
+    # BeautifulSoup's select_one()/get_text(strip=True) used to return.
+
+    FIELDS = ('title', 'location', 'date', 'link')
+
+    def __init__(self, website_config):
+        self.next_sibling = website_config.get('next_sibling', None)
+        self.link_in_job_selector = website_config.get('link_in_job_selector', False)
+        self.job = compile_selector(website_config['job_selector'])
+        self.selectors = {
+            field: compile_selector(website_config.get(f'{field}_selector', None)) for field in self.FIELDS
+        }
+        if self.link_in_job_selector:
+            self.selectors['link'] = None
+        warn_missing_selectors(website_config)
+
+    def get_job_elements(self, html):
+        root = parse_html(html)
+        if root is None:
+            return []
+        return self.job(root)
+
+    @staticmethod
+    def serialize(job_element):
+        return lxml.html.tostring(job_element, encoding='unicode', with_tail=False)
+
+    @staticmethod
+    def get_text(selected, next_sibling=False):
+        if selected is None:
+            return None
+        if next_sibling:
+            # The text right after the selected element (or a comment standing there)
+            if selected.tail:
+                return selected.tail.strip()
+            next_element = selected.getnext()
+            if next_element is not None and next_element.tag is etree.Comment and next_element.text:
+                return next_element.text.strip()
+            return None
+        return ''.join(text.strip() for text in TEXT_XPATH(selected))
+
+    def extract(self, job_elements):
+        if not job_elements:
+            return []
+
+        # Like soupsieve's select_one(), a field selector is matched against the whole document
+        # (its first part may sit outside the job element) and the first match inside the job
+        # element wins. So every selector runs once per page, then each job element is walked once.
+        root = job_elements[0].getroottree().getroot()
+        matches = {
+            field: set(xpath(root)) for field, xpath in self.selectors.items() if xpath is not None
+        }
+
+        job_data = []
+        for job_element in job_elements:
+            selected = {}
+            for descendant in job_element.iterdescendants():
+                for field, field_matches in matches.items():
+                    if field not in selected and descendant in field_matches:
+                        selected[field] = descendant
+                if len(selected) == len(matches):
+                    break
+
+            if self.link_in_job_selector:  # If the job link is in the job_selector
+                link = job_element.get('href')
+            else:
+                link = selected['link'].get('href') if 'link' in selected else None
+
+            job_data.append({
+                'title': self.get_text(selected.get('title')),
+                'location': self.get_text(selected.get('location'), self.next_sibling),
+                'date': self.get_text(selected.get('date')),
+                'link': link,
+            })
+        return job_data
+
+
+class SoupExtractor:
+    # Fallback for site configurations with selectors lxml's translator doesn't support
+
+    def __init__(self, website_config):
+        self.website_config = website_config
+        warn_missing_selectors(website_config)
+
+    def get_job_elements(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        return soup.select(self.website_config['job_selector'])
+
+    @staticmethod
+    def serialize(job_element):
+        return str(job_element)
+
+    @staticmethod
+    def get_text(element, selector, next_sibling=False):
+        if selector is None:
+            return None
+        selected_element = element.select_one(selector)
+        if selected_element:
+            if next_sibling:
+                next_element = selected_element.nextSibling
+                return next_element.strip() if next_element else None
+            else:
+                return selected_element.get_text(strip=True)
+
+        return None
+
+    def get_link(self, element):
+        if self.website_config.get('link_in_job_selector', False):  # If the job link is in the job_selector
+            return element['href'] if 'href' in element.attrs else None
+        selector = self.website_config.get('link_selector', None)
+        if selector is None:
+            return None
+        selected_element = element.select_one(selector)
+        return selected_element['href'] if selected_element and 'href' in selected_element.attrs else None
+
+    def extract(self, job_elements):
+        config = self.website_config
+        return [
+            {
+                'title': self.get_text(job_element, config.get('title_selector', None)),
+                'location': self.get_text(job_element, config.get('location_selector', None), config.get('next_sibling', None)),
+                'date': self.get_text(job_element, config.get('date_selector', None)),
+                'link': self.get_link(job_element),
+            }
+            for job_element in job_elements
+        ]
+
+
+class BrowserExtractor:
+    # Extracts all jobs of the page currently loaded in the browser with a single
+    # execute_script call, without serializing the page and parsing it in Python.
+
+    FIELDS = ('title', 'location', 'date', 'link')
+
+    def __init__(self, website_config):
+        self.config = {
+            'job': website_config['job_selector'],
+            'title': website_config.get('title_selector', None),
+            'location': website_config.get('location_selector', None),
+            'date': website_config.get('date_selector', None),
+            'link': website_config.get('link_selector', None),
+            'nextSibling': bool(website_config.get('next_sibling', None)),
+            'linkInJobSelector': bool(website_config.get('link_in_job_selector', False)),
+        }
+
+    def extract(self, driver):
+        # Returns the raw JSON (handy as a page fingerprint) and the parsed jobs
+        serialized = driver.execute_script(BROWSER_EXTRACT_SCRIPT, self.config)
+        return serialized, [dict(zip(self.FIELDS, values)) for values in json.loads(serialized)]
+
+
+def get_extractor(website_config):
+    key = tuple(website_config.get(selector_key) for selector_key in SELECTOR_KEYS)
+    extractor = _extractors.get(key)
+    if extractor is None:
+        try:
+            extractor = SiteExtractor(website_config)
+        except SelectorError as e:
+            logger.warning(f"{website_config.get('company_name')}: selectors can't be compiled for lxml ({e}), "
+                           f"falling back to BeautifulSoup")
+            extractor = SoupExtractor(website_config)
+        _extractors[key] = extractor
+    return extractor
+
+
+def load_extractors(websites):
+    # Compile every site's selectors once, right after websites.json is loaded
+    for website in websites.get('companies', []):
+        get_extractor(website)
@@ -0,0 +1,232 @@
+from functools import lru_cache
+import re
+
+# Offline lookup of the US state in a job location ("Atlanta, GA", "Remote - TX", "Austin, Texas"),
+# so most jobs get their state_location while they are scraped. The states are returned the way the
+# geocoding API names them (utils.geocoding), anything this can't place is left to get_state.
+
+STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'PR': 'Puerto Rico', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+# Large cities and job hubs whose name is unambiguous without a state. Springfield, Portland,
+# Arlington and the like are only listed with their state ("Arlington VA"), and so are names
+# shared with a city abroad: a bare "Cambridge" or "Birmingham" is left to the geocoder.
+CITIES = {
+    'AL': ['Birmingham AL', 'Huntsville', 'Montgomery', 'Tuscaloosa'],
+    'AK': ['Anchorage', 'Juneau', 'Fairbanks'],
+    'AZ': ['Phoenix', 'Tucson', 'Mesa', 'Chandler', 'Scottsdale', 'Gilbert', 'Tempe'],
+    'AR': ['Little Rock', 'Bentonville', 'Fort Smith'],
+    'CA': ['Los Angeles', 'San Francisco', 'San Diego', 'San Jose', 'Sacramento', 'Fresno', 'Oakland',
+           'Long Beach', 'Bakersfield', 'Anaheim', 'Santa Ana', 'Irvine', 'Riverside', 'Stockton',
+           'Palo Alto', 'Mountain View', 'Sunnyvale', 'Santa Clara', 'Cupertino', 'Menlo Park',
+           'Redwood City', 'San Mateo', 'Fremont', 'Berkeley', 'Santa Monica', 'Burbank',
+           'Costa Mesa', 'Carlsbad', 'Milpitas', 'South San Francisco', 'Emeryville', 'Culver City',
+           'El Segundo', 'Torrance', 'Walnut Creek', 'San Ramon', 'Pleasanton', 'Santa Barbara',
+           'Bay Area', 'Silicon Valley', 'SF'],
+    'CO': ['Denver', 'Colorado Springs', 'Boulder', 'Fort Collins', 'Englewood',
+           'Broomfield', 'Littleton'],
+    'CT': ['Hartford', 'New Haven', 'Stamford', 'Bridgeport', 'Greenwich'],
+    'DE': ['Dover DE'],
+    'DC': ['Washington DC', 'Washington D.C.'],
+    'FL': ['Miami', 'Orlando', 'Tampa', 'Jacksonville', 'Tallahassee', 'Fort Lauderdale',
+           'St. Petersburg', 'Boca Raton', 'West Palm Beach', 'Sarasota', 'Gainesville', 'Hialeah',
+           'Pensacola', 'Naples', 'Clearwater', 'Fort Myers'],
+    'GA': ['Atlanta', 'Savannah', 'Alpharetta', 'Marietta', 'Macon', 'Augusta GA', 'Sandy Springs'],
+    'HI': ['Honolulu'],
+    'ID': ['Boise', 'Idaho Falls', 'Coeur d\'Alene'],
+    'IL': ['Chicago', 'Naperville', 'Evanston', 'Schaumburg', 'Oak Brook', 'Deerfield',
+           'Northbrook', 'Champaign', 'Rockford', 'Joliet'],
+    'IN': ['Indianapolis', 'Fort Wayne', 'South Bend', 'Evansville'],
+    'IA': ['Des Moines', 'Cedar Rapids', 'Iowa City', 'Davenport'],
+    'KS': ['Wichita', 'Overland Park', 'Topeka', 'Olathe', 'Lenexa'],
+    'KY': ['Louisville', 'Lexington KY', 'Bowling Green'],
+    'LA': ['New Orleans', 'Baton Rouge', 'Shreveport', 'Lafayette LA'],
+    'ME': ['Augusta ME', 'Bangor'],
+    'MD': ['Baltimore', 'Bethesda', 'Rockville', 'Gaithersburg', 'Silver Spring', 'Columbia MD',
+           'Annapolis', 'Frederick', 'Germantown'],
+    'MA': ['Boston', 'Cambridge MA', 'Worcester', 'Waltham', 'Somerville', 'Burlington MA', 'Lowell',
+           'Framingham', 'Woburn', 'Needham', 'Lexington MA'],
+    'MI': ['Detroit', 'Ann Arbor', 'Grand Rapids', 'Lansing', 'Dearborn', 'Southfield',
+           'Kalamazoo', 'Flint'],
+    'MN': ['Minneapolis', 'Saint Paul', 'St. Paul', 'Rochester MN', 'Duluth', 'Eden Prairie',
+           'Bloomington MN', 'Minnetonka'],
+    'MS': ['Jackson MS', 'Gulfport', 'Hattiesburg'],
+    'MO': ['St. Louis', 'Saint Louis', 'Springfield MO', 'Columbia MO', 'Chesterfield'],
+    'MT': ['Billings', 'Missoula', 'Bozeman', 'Helena'],
+    'NE': ['Omaha', 'Lincoln NE'],
+    'NV': ['Las Vegas', 'Reno', 'Henderson'],
+    'NH': ['Manchester NH', 'Nashua', 'Concord NH', 'Portsmouth NH'],
+    'NJ': ['Newark NJ', 'Jersey City', 'Princeton', 'Hoboken', 'Trenton', 'Edison',
+           'Parsippany', 'Morristown', 'Paterson'],
+    'NM': ['Albuquerque', 'Santa Fe', 'Las Cruces'],
+    'NY': ['New York City', 'NYC', 'Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island',
+           'Buffalo', 'Albany', 'Syracuse', 'Yonkers', 'White Plains', 'Long Island City',
+           'Rochester NY', 'Ithaca'],
+    'NC': ['Charlotte', 'Raleigh', 'Durham', 'Greensboro', 'Winston-Salem', 'Cary',
+           'Chapel Hill', 'Research Triangle Park', 'Asheville', 'Wilmington NC', 'Morrisville'],
+    'ND': ['Fargo', 'Bismarck', 'Grand Forks'],
+    'OH': ['Columbus', 'Cleveland', 'Cincinnati', 'Toledo', 'Akron', 'Dayton', 'Dublin OH'],
+    'OK': ['Oklahoma City', 'Tulsa'],
+    'OR': ['Portland OR', 'Beaverton', 'Hillsboro', 'Eugene', 'Salem OR'],
+    'PA': ['Philadelphia', 'Pittsburgh', 'Harrisburg', 'Allentown', 'King of Prussia',
+           'Conshohocken', 'Malvern', 'Erie', 'Scranton', 'State College'],
+    'PR': ['San Juan'],
+    'RI': ['Providence', 'Warwick'],
+    'SC': ['Charleston SC', 'Columbia SC', 'Greenville SC', 'Myrtle Beach'],
+    'SD': ['Sioux Falls', 'Rapid City'],
+    'TN': ['Nashville', 'Memphis', 'Knoxville', 'Chattanooga', 'Franklin TN'],
+    'TX': ['Houston', 'Dallas', 'Austin', 'San Antonio', 'Fort Worth', 'El Paso', 'Plano',
+           'Irving', 'Frisco', 'Round Rock', 'Corpus Christi', 'Lubbock', 'Laredo', 'McKinney',
+           'The Woodlands', 'Sugar Land', 'Richardson', 'Garland', 'Denton'],
+    'UT': ['Salt Lake City', 'Provo', 'Lehi', 'Ogden', 'Draper', 'Orem'],
+    'VT': ['Burlington VT', 'Montpelier'],
+    'VA': ['Virginia Beach', 'Norfolk', 'Reston', 'McLean', 'Herndon', 'Chantilly', 'Fairfax',
+           'Alexandria', 'Chesapeake', 'Tysons', 'Arlington VA', 'Richmond VA', 'Ashburn', 'Leesburg'],
+    'WA': ['Seattle', 'Redmond', 'Bellevue', 'Tacoma', 'Spokane', 'Kirkland', 'Everett',
+           'Vancouver WA', 'Olympia', 'Bothell'],
+    'WV': ['Charleston WV', 'Morgantown', 'Huntington WV'],
+    'WI': ['Milwaukee', 'Madison', 'Green Bay', 'Waukesha'],
+    'WY': ['Cheyenne', 'Casper', 'Jackson Hole'],
+}
+
+# A part naming one of these means the job isn't in the US: "Cambridge, United Kingdom",
+# "Toronto, ON, CA" (where CA would otherwise be California), "Hyderabad, Telangana, IN"
+NON_US = {
+    'canada', 'united kingdom', 'uk', 'great britain', 'england', 'scotland', 'wales',
+    'northern ireland', 'ireland', 'india', 'germany', 'france', 'spain', 'portugal', 'italy',
+    'netherlands', 'belgium', 'luxembourg', 'austria', 'switzerland', 'denmark', 'norway',
+    'sweden', 'finland', 'poland', 'czech republic', 'czechia', 'slovakia', 'hungary', 'romania',
+    'bulgaria', 'greece', 'croatia', 'serbia', 'ukraine', 'lithuania', 'latvia', 'estonia',
+    'turkey', 'israel', 'egypt', 'united arab emirates', 'uae', 'saudi arabia', 'qatar',
+    'south africa', 'nigeria', 'kenya', 'pakistan', 'bangladesh', 'sri lanka', 'mexico',
+    'costa rica', 'colombia', 'peru', 'chile', 'argentina', 'brazil', 'australia', 'new zealand',
+    'singapore', 'malaysia', 'indonesia', 'philippines', 'vietnam', 'thailand', 'japan',
+    'south korea', 'korea', 'china', 'taiwan', 'hong kong',
+    # Country codes that aren't also a state abbreviation
+    'gb', 'fr', 'es', 'pt', 'it', 'nl', 'be', 'lu', 'at', 'ch', 'dk', 'no', 'se', 'fi', 'pl', 'cz',
+    'sk', 'hu', 'ro', 'bg', 'gr', 'hr', 'rs', 'ua', 'lt', 'lv', 'ee', 'tr', 'eg', 'ae', 'sa', 'qa',
+    'za', 'ng', 'ke', 'pk', 'bd', 'lk', 'mx', 'cr', 'pe', 'cl', 'br', 'au', 'nz', 'sg', 'my', 'ph',
+    'vn', 'th', 'jp', 'kr', 'cn', 'tw', 'hk',
+    # Provinces and states whose jobs often come without the country
+    'ontario', 'on', 'british columbia', 'bc', 'quebec', 'qc', 'alberta', 'ab', 'manitoba', 'mb',
+    'nova scotia', 'ns', 'karnataka', 'telangana', 'maharashtra', 'tamil nadu', 'haryana',
+    'uttar pradesh', 'west bengal', 'new south wales', 'nsw', 'victoria',
+}
+
+# State abbreviations that are also the country code of a country with many jobs (India, Germany,
+# Canada, Israel, Indonesia, Colombia, Argentina), and state names that are also a country. "Berlin,
+# DE" is not Delaware and "Tbilisi, Georgia" not Georgia, so they only count for a location that is
+# otherwise US-qualified: one with a known US city or a "US"/"USA" part. The rest go to get_state.
+COUNTRY_LIKE_STATES = {'ca', 'de', 'in', 'il', 'id', 'co', 'ar', 'georgia'}
+US_NAMES = {'us', 'usa', 'united states', 'united states of america'}
+# Parts that say nothing about the place: "TX / Remote"
+NO_PLACE = {'remote', 'hybrid', 'onsite', 'on site', 'in office', 'anywhere'}
+
+# Parts of a location: "Austin, TX", "Remote - TX", "Remote (Texas)", "TX / Remote"
+PART_SEPARATORS = re.compile(r'\s+[-–]\s+|[,;|/()\[\]]')
+# Several locations in one string, the first one we can place wins
+LOCATION_SEPARATORS = re.compile(r';|\||\s+or\s+|\s+and\s+|\n')
+NON_WORD = re.compile(r'[^a-z\s]+')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    # Lower case words only: "St. Louis" -> "st louis", "TX 78701" -> "tx"
+    return SPACES.sub(' ', NON_WORD.sub(' ', text.lower().replace('.', ''))).strip()
+
+
+# Everything keyed by its normalized text. Abbreviations only count as a whole part ("Remote - OR"
+# is Oregon), names are also found inside a part ("Greater Seattle Area").
+STATE_INDEX = {}
+for abbreviation, name in STATES.items():
+    STATE_INDEX[normalize(abbreviation)] = name
+    STATE_INDEX[normalize(name)] = name
+STATE_INDEX['washington dc'] = STATES['DC']
+
+CITY_INDEX = {}
+for abbreviation, cities in CITIES.items():
+    for city in cities:
+        CITY_INDEX[normalize(city)] = STATES[abbreviation]
+
+# Longest names in words, bound the word n-grams tried inside a part
+MAX_STATE_WORDS = max(len(key.split()) for key in STATE_INDEX)
+MAX_CITY_WORDS = max(len(key.split()) for key in CITY_INDEX)
+
+
+def find_name(words, index, max_words, skip=()):
+    # A name somewhere inside a part. Longer names first, so "west virginia" isn't read as
+    # "virginia" and "south san francisco" not as "san francisco".
+    for size in range(max_words, 0, -1):
+        for start in range(len(words) - size + 1):
+            key = ' '.join(words[start:start + size])
+            if len(key) > 2 and key in index and key not in skip:
+                return index[key]
+    return None
+
+
+def is_us_qualified(parts):
+    return any(part in US_NAMES or part in CITY_INDEX for part in parts)
+
+
+def resolve_parts(parts):
+    # The state is usually last: "Washington, DC" is DC, not Washington. A bare abbreviation only
+    # counts as the last part that names a place ("Remote - OR", "TX / Remote") or in a US-qualified
+    # location ("US-TX-Austin"), so "Pune, MH, IN" isn't read by its middle part.
+    qualified = is_us_qualified(parts)
+    places = [part for part in parts if part not in US_NAMES and part not in NO_PLACE]
+    for part in reversed(parts):
+        if part not in STATE_INDEX or (part in COUNTRY_LIKE_STATES and not qualified):
+            continue
+        if len(part) == 2 and not qualified and part != places[-1]:
+            continue
+        return STATE_INDEX[part]
+    for part in parts:
+        if part in CITY_INDEX:
+            return CITY_INDEX[part]
+    return None
+
+
+def resolve_one(location):
+    parts = [normalize(part) for part in PART_SEPARATORS.split(location)]
+    parts = [part for part in parts if part]
+    # Workday style "US-TX-Austin": split on bare hyphens only if nothing else matched
+    hyphen_parts = [normalize(part) for part in location.split('-')] if len(parts) <= 1 else []
+
+    if any(part in NON_US for part in parts + hyphen_parts):
+        return None
+
+    for candidates in (parts, hyphen_parts):
+        state = resolve_parts(candidates)
+        if state:
+            return state
+
+    skip = () if is_us_qualified(parts) else COUNTRY_LIKE_STATES
+    for index, max_words in ((STATE_INDEX, MAX_STATE_WORDS), (CITY_INDEX, MAX_CITY_WORDS)):
+        for part in parts:
+            state = find_name(part.split(), index, max_words, skip)
+            if state:
+                return state
+    return None
+
+
+@lru_cache(maxsize=8192)
+def resolve_state(location):
+    # The state of a US job location, or None if it can't be placed offline
+    if not location:
+        return None
+    for one_location in LOCATION_SEPARATORS.split(location):
+        state = resolve_one(one_location)
+        if state:
+            return state
+    return None
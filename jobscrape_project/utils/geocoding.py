@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import re
+import threading
+
+import requests
+
+from utils.politeness import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+GEOCODING_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+DEFAULT_WORKERS = 8
+DEFAULT_REQUESTS_PER_SECOND = 20  # under the Geocoding API's 50 per second quota
+DEFAULT_BURST = 10
+# Locations the API has no state for (e.g. "Remote") are counted as nationwide
+FALLBACK_STATE = 'United States'
+
+SPACES = re.compile(r'\s+')
+
+
+def normalize_location(location):
+    # "  Austin,  TX " and "austin, tx" are the same place and share one cache entry
+    return SPACES.sub(' ', location).strip().lower()
+
+
+def get_state_from_response(data):
+    # Raises KeyError/IndexError on a response that isn't shaped like a geocoding result
+    if data['results']:
+        for component in data['results'][0]['address_components']:
+            if 'administrative_area_level_1' in component['types']:
+                return component['long_name']
+    return None
+
+
+class Geocoder:
+    # Looks up the state of many locations at once: `workers` requests in flight, at most
+    # `requests_per_second` of them, over one keep-alive session per thread.
+
+    def __init__(self, api_key, url=GEOCODING_URL, workers=DEFAULT_WORKERS,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST, timeout=10):
+        self.api_key = api_key
+        self.url = url
+        self.workers = workers
+        self.timeout = timeout
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self._local = threading.local()
+
+    def get_session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def get_state(self, location):
+        self.bucket.acquire()
+        response = self.get_session().get(self.url, params={
+            'address': location,
+            'types': 'administrative_area_level_2',
+            'key': self.api_key,
+        }, timeout=self.timeout)
+        if response.status_code != 200:
+            # Not raise_for_status(), its message has the url and with it the API key
+            raise requests.RequestException(f"HTTP {response.status_code}")
+        data = response.json()
+        if data.get('status') in ('OVER_QUERY_LIMIT', 'REQUEST_DENIED', 'INVALID_REQUEST', 'UNKNOWN_ERROR'):
+            raise requests.RequestException(f"Geocoding failed: {data['status']}")
+        return get_state_from_response(data) or FALLBACK_STATE
+
+    def _lookup(self, location):
+        try:
+            return location, self.get_state(location)
+        except (requests.RequestException, ValueError, IndexError, KeyError) as e:
+            logger.warning(f"Geocoding '{location}' failed: {e}")
+            return location, None
+
+    def get_states(self, locations):
+        # {location: state} of the locations that could be looked up, failed ones are left out
+        # so they are tried again next time
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return {location: state for location, state in executor.map(self._lookup, locations) if state}
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError, RequestException
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying, everything else is returned or raised straight away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/114.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+class StaticFetcher:
+    def __init__(self, max_workers=8, timeout=(5, 20), max_attempts=3, backoff=1.0, pool_size=10, scheduler=None):
+        self.max_workers = max_workers
+        self.timeout = timeout  # (connect, read) seconds
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.scheduler = scheduler  # PolitenessScheduler limiting the requests per host
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, url):
+        # One keep-alive session per host, shared by all fetching threads
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                self._sessions[host] = session
+        return session
+
+    def get_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        # Exponential backoff with jitter: ~1s, 2s, 4s, ...
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    def request(self, session, method, url, headers, **kwargs):
+        if self.scheduler is None:
+            return session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+        with self.scheduler.slot(url):
+            self.scheduler.throttle(url)
+            return session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+
+    def fetch(self, url, headers=None, method='GET', **kwargs):
+        # kwargs (params, json, ...) are passed on to requests
+        session = self.get_session(url)
+        for attempt in range(self.max_attempts):
+            response = None
+            try:
+                response = self.request(session, method, url, headers, **kwargs)
+            except RequestException as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = HTTPError(f"{response.status_code} Server Error for url: {url}", response=response)
+
+            if attempt == self.max_attempts - 1:
+                raise error
+            delay = self.get_delay(attempt, response)
+            logger.warning(f"Fetching {url} failed on attempt {attempt + 1} of {self.max_attempts} ({error}), "
+                           f"retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def fetch_all(self, urls, headers=None):
+        # Fetch the urls concurrently and return the responses in the same order.
+        # headers, if given, is a list with the request headers for each url.
+        if not urls:
+            return []
+        if headers is None:
+            headers = [None] * len(urls)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(self.fetch, urls, headers))
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,51 @@
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import hashlib
+
+# Query parameters that say how a visitor got to the job, not which job it is
+TRACKING_PARAMS = {
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', '_gl', 'yclid',
+    'ref', 'referer', 'referrer', 'refid', 'source', 'src', 'trk', 'trackingid', 'sessionid',
+    'jsessionid', 'campaign', 'campaignid', 'iis', 'iisn',
+}
+TRACKING_PREFIXES = ('utm_', 'hsa_', 'pk_', 'mtm_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_link(link, base_url=None):
+    # Absolute url, lower case scheme and host, no default port, fragment, tracking parameters or
+    # trailing slash, remaining parameters sorted. Two links to the same job come out the same.
+    if not link:
+        return None
+    link = link.strip()
+    if base_url:
+        link = urljoin(base_url, link)
+    parts = urlsplit(link)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def get_identity_key(title, link, base_url=None, company_name=None):
+    # Which job this is: its canonical url, or the company and title for jobs without a link
+    canonical_link = canonicalize_link(link, base_url)
+    if canonical_link:
+        identity = canonical_link
+    else:
+        identity = f'{company_name}\n{title}'
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def get_content_hash(title, location, date_posted, link):
+    # What the job looks like: any change means the stored row has to be updated. Dates count by
+    # day, so "3 days ago" scraped again tomorrow as "4 days ago" is no change.
+    date = date_posted.date().isoformat() if date_posted is not None else ''
+    content = '\0'.join((title or '', location or '', date, link or ''))
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
@@ -0,0 +1,90 @@
+import logging
+
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.models import JobListing
+from utils.search import update_search_vectors
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Written for a job whose content hash changed
+CHANGED_FIELDS = ['content_hash', 'title', 'location', 'state_location', 'date_posted', 'posted_on', 'link',
+                  'last_seen_run']
+
+
+def ingest_jobs(jobs, company, job_type, category, run_id):
+    # Write one page (or url) worth of scraped jobs. A single query fetches the identity keys and
+    # content hashes we already have, then: one bulk insert for the new jobs, a targeted update of
+    # the fields of the jobs that changed, and one update to mark the unchanged ones as seen.
+    jobs_by_key = {}
+    for job in jobs:
+        jobs_by_key.setdefault(job['identity_key'], job)
+    if not jobs_by_key:
+        return 0, 0, 0
+
+    existing = {
+        identity_key: (job_id, content_hash, posted_on)
+        for identity_key, job_id, content_hash, posted_on in JobListing.objects.filter(
+            identity_key__in=list(jobs_by_key)
+        ).values_list('identity_key', 'id', 'content_hash', 'posted_on')
+    }
+    today = timezone.localdate()
+
+    new_jobs = []
+    changed_jobs = []
+    unchanged_ids = []
+    for identity_key, job in jobs_by_key.items():
+        if identity_key not in existing:
+            new_jobs.append(JobListing(
+                identity_key=identity_key,
+                content_hash=job['content_hash'],
+                company=company,
+                title=job['title'],
+                location=job['location'],
+                state_location=job['state_location'],
+                date_posted=job['date_posted'],
+                posted_on=job['posted_on'] or today,
+                link=job['link'],
+                last_seen_run=run_id,
+                job_type=job_type,
+                category=category,
+            ))
+            continue
+        job_id, content_hash, posted_on = existing[identity_key]
+        if content_hash == job['content_hash']:
+            unchanged_ids.append(job_id)
+        else:
+            changed_jobs.append(JobListing(
+                id=job_id,
+                content_hash=job['content_hash'],
+                title=job['title'],
+                location=job['location'],
+                state_location=job['state_location'],
+                date_posted=job['date_posted'],
+                # Without a posting date the job keeps the day it was discovered
+                posted_on=job['posted_on'] or posted_on,
+                link=job['link'],
+                last_seen_run=run_id,
+            ))
+
+    # ON CONFLICT DO NOTHING covers a concurrent worker inserting the same job first (the unique key
+    # is (identity_key, posted_on), what the partitioned PostgreSQL table can enforce)
+    JobListing.objects.bulk_create(new_jobs, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    if changed_jobs:
+        JobListing.objects.bulk_update(changed_jobs, CHANGED_FIELDS, batch_size=BATCH_SIZE)
+
+    # The search vectors of the new jobs and the changed ones, in one UPDATE
+    if new_jobs or changed_jobs:
+        update_search_vectors(JobListing.objects.filter(
+            Q(identity_key__in=[job.identity_key for job in new_jobs]) | Q(id__in=[job.id for job in changed_jobs])
+        ), company, category)
+
+    if unchanged_ids:
+        JobListing.objects.filter(id__in=unchanged_ids).update(last_seen_run=run_id)
+
+    logger.info(f"{company}: {len(new_jobs)} new jobs, {len(changed_jobs)} changed, {len(unchanged_ids)} unchanged")
+    return len(new_jobs), len(changed_jobs), len(unchanged_ids)
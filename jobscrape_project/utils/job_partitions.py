@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# On PostgreSQL jobs_joblisting is range partitioned by posted_on (the date a job was posted, or
+# discovered if the site doesn't say), one partition per week starting on Monday, plus a default
+# partition for dates outside every weekly one. Other databases keep a plain table. The table
+# itself was partitioned by migration 0037, this keeps its weekly partitions coming and going.
+TABLE = 'jobs_joblisting'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{8}})$')
+
+RETENTION_DAYS = 30
+WEEKS_AHEAD = 8
+
+
+def get_posted_on(date_posted):
+    # The partition key of a job posted at date_posted, None when the date isn't known
+    if date_posted is None:
+        return None
+    if isinstance(date_posted, datetime):
+        if timezone.is_aware(date_posted):
+            date_posted = timezone.localtime(date_posted)
+        return date_posted.date()
+    return date_posted
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y%m%d}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_partitions():
+    # {week start: partition name} of the weekly partitions
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), '%Y%m%d').date()] = name
+    return partitions
+
+
+def create_partition(cursor, start):
+    # Rows of the new week that already went to the default partition have to move out first,
+    # PostgreSQL refuses to attach a range the default partition has rows for
+    end = start + timedelta(weeks=1)
+    name = partition_name(start)
+    # Partition bounds have to be literals (PostgreSQL 11), the dates are safe to inline
+    create = f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    cursor.execute(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE posted_on >= %s AND posted_on < %s LIMIT 1", [start, end])
+    if cursor.fetchone():
+        cursor.execute(f"CREATE TEMPORARY TABLE moved_jobs (LIKE {TABLE})")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE posted_on >= %s AND posted_on < %s RETURNING *) "
+            f"INSERT INTO moved_jobs SELECT * FROM moved", [start, end]
+        )
+        cursor.execute(create)
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM moved_jobs")
+        cursor.execute("DROP TABLE moved_jobs")
+    else:
+        cursor.execute(create)
+
+
+def create_partitions(first_week=None, weeks_ahead=WEEKS_AHEAD):
+    # Weekly partitions from first_week (default: the oldest week still kept) up to weeks_ahead
+    # weeks from now. Returns the names of the new ones.
+    if not is_partitioned():
+        return []
+    today = timezone.localdate()
+    week = week_start(first_week or today - timedelta(days=RETENTION_DAYS))
+    last_week = week_start(today + timedelta(weeks=weeks_ahead))
+    existing = get_partitions()
+    created = []
+    while week <= last_week:
+        if week not in existing:
+            with transaction.atomic(), connection.cursor() as cursor:
+                create_partition(cursor, week)
+            created.append(partition_name(week))
+        week += timedelta(weeks=1)
+    return created
+
+
+def drop_partitions(cutoff, dry_run=False):
+    # Detach and drop the weekly partitions that only hold jobs posted before cutoff (a date).
+    # Each one is a catalog change instead of a DELETE of its rows, no bloat is left behind.
+    if not is_partitioned():
+        return []
+    dropped = []
+    for start, name in sorted(get_partitions().items()):
+        if start + timedelta(weeks=1) > cutoff:
+            break
+        if dry_run:
+            dropped.append(name)
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
+
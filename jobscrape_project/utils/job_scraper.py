@@ -1,307 +1,551 @@
-from .date_conversion import convert_date_format
+from .date_conversion import convert_date_format, convert_dates
+from .api_source import ApiSource
+from .browser import BrowserProfile
+from .checkpoints import SliceCheckpoints
+from .http_fetcher import StaticFetcher
+from .dimension_cache import DimensionCache
+from .gazetteer import resolve_state
+from .job_identity import get_content_hash, get_identity_key
+from .job_ingestion import ingest_jobs
+from .job_partitions import get_posted_on
+from .extraction import BrowserExtractor, get_extractor
+from .page_fingerprints import PageTracker, fingerprint_elements
+from .page_readiness import PageNotReady, PageReadiness, instrument_driver
+from .politeness import PolitenessScheduler
+from .purge import purge
+from .scrape_pipeline import FetchedPage, ScrapePipeline
+from .telemetry import ScrapeTelemetry
 
 import time
-from datetime import datetime
-import requests
+from collections import Counter
 import logging
-import hashlib
 import json
 
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 from selenium.common.exceptions import NoSuchElementException
 from requests.exceptions import RequestException
 from selenium.common.exceptions import WebDriverException
 
-from jobs.models import JobListing, Company, Tag, Category, JobType
+from jobs.models import JobListing, ScrapeRun
 
 # Initialize a logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_hash(job_data):
-    job_string = json.dumps(job_data, sort_keys=True)  # Convert the job data to a sorted string
-    job_hash = hashlib.md5(job_string.encode())  # Create a hash from the job string
-    return job_hash.hexdigest()  # Return the hexadecimal representation of the hash
-
-
 class JobScraper:
-    def __init__(self, driver_path, dynamic=False):
+    def __init__(self, driver_path, dynamic=False, dimensions=None, run_id=None, browser_profile=None, scheduler=None):
         self.driver_path = driver_path
         self.dynamic = dynamic
-
-        # Define chrome options
-        chrome_options = Options()
-
-        # If the dynamic option is set, add the --headless option
-        if dynamic:
-            chrome_options.add_argument("--headless")
-
-        # Initialize the Chrome driver
-        # self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver = webdriver.Chrome()
+        # Preloaded DimensionCache shared by every website of the run
+        self.dimensions = dimensions
+        # ScrapeRun that rows seen by this scraper are stamped with, created on first use if not given
+        self._run_id = run_id
+
+        # If the dynamic option is set, Chrome runs headless
+        self.browser_profile = browser_profile or BrowserProfile(headless=dynamic)
+
+        # Chrome is only started once a dynamic site needs it
+        self._driver = None
+        self.pages_loaded = 0
+        # Per-host concurrency and rate limits, shared with the other workers of the run if given
+        self.scheduler = scheduler or PolitenessScheduler()
+        self.current_url = None
+        self.current_company = None
+        # Pooled HTTP client for sites that don't need JavaScript
+        self.fetcher = StaticFetcher(scheduler=self.scheduler)
+        self._readiness = {}
+        # Pages are extracted and written in the background while the next one is fetched
+        self.pipeline = ScrapePipeline(self.extract_page, self.write_page)
+        # Jobs written so far: new, existing and pages skipped as unchanged. Only the write stage updates it.
+        self.stats = Counter()
+        # Stage timings and job counts per url, saved as ScrapeStat rows after every slice
+        self.telemetry = ScrapeTelemetry()
 
     def __del__(self):
-        self.driver.quit()
+        self.close()
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            # Initialize the Chrome driver
+            self._driver = self.browser_profile.create_driver()
+            instrument_driver(self._driver)
+            self.pages_loaded = 0
+        return self._driver
+
+    def recycle_driver(self):
+        # A long-lived Chrome keeps growing, replace it once it served enough pages or got too big.
+        # Called between urls, so no page state is lost.
+        if self._driver is not None and self.browser_profile.needs_recycling(self._driver, self.pages_loaded):
+            self._driver.quit()
+            self._driver = None
+
+    def recycle_between_pages(self, previous_url, readiness):
+        # The same within a long listing, right after moving to its next page. The pages before it
+        # are already in the pipeline, so that is where a fresh Chrome can take over, but only on
+        # pages with an address of their own: the new browser opens the page again there. A
+        # listing that pages by script keeps its browser until the url is done.
+        page_url = self.driver.current_url
+        if page_url == previous_url or not self.browser_profile.needs_recycling(self._driver, self.pages_loaded):
+            return False
+        self._driver.quit()
+        self._driver = None
+        self.throttle()
+        with self.timer('navigation'):
+            self.driver.get(page_url)
+        self.pages_loaded += 1
+        with self.timer('wait'):
+            if not readiness.wait_for_jobs(self.driver):
+                raise PageNotReady(f"No jobs on {page_url} within {readiness.max_wait}s")
+        return True
+
+    def close(self):
+        pipeline = getattr(self, 'pipeline', None)
+        if pipeline is not None:
+            pipeline.close()
+        driver = getattr(self, '_driver', None)
+        if driver is not None:
+            driver.quit()
+            self._driver = None
+        fetcher = getattr(self, 'fetcher', None)
+        if fetcher is not None:
+            fetcher.close()
+
+    @property
+    def run_id(self):
+        if self._run_id is None:
+            self._run_id = ScrapeRun.objects.create().id
+        return self._run_id
+
+    def is_dynamic(self, website_config):
+        if website_config is None:
+            return self.dynamic
+        return website_config.get('dynamic', self.dynamic)
 
-    def load_website(self, url, load_more_selector=None, infinite_scroll=False, next_page_selector=None, website_config=None, job_type=None, category=None):
+    @staticmethod
+    def is_api(website_config):
+        return website_config is not None and website_config.get('mode') == 'api'
+
+    def throttle(self):
+        # Every page load, click and scroll counts against the current site's rate limit
+        self.scheduler.throttle(self.current_url)
+
+    def timer(self, stage):
+        # Time a stage of the url the browser is on
+        return self.telemetry.timer(self.current_company, self.current_url, stage)
+
+    def load_website(self, url, load_more_selector=None, infinite_scroll=False, next_page_selector=None, website_config=None, job_type=None, category=None, company=None, checkpoints=None):
+        if self.is_api(website_config):
+            return self.scrape_api_urls([url], website_config, company, job_type, category, checkpoints)
+        if not self.is_dynamic(website_config):
+            return self.scrape_static_urls([url], website_config, company, job_type, category, checkpoints)
+
+        self.recycle_driver()
+        readiness = self.get_readiness(website_config)
+        pages = PageTracker([url])
+        self.current_url = url
+        self.current_company = company
+        # Pages an interrupted run already wrote are paged through, but not extracted again
+        pages_done = checkpoints.get_pages_done(url) if checkpoints is not None else 0
         max_attempts = 3
         for attempt in range(max_attempts):
             try:
-                if self.dynamic:
-                    self.driver.get(url)
-                    time.sleep(5)
-
-                    # If the page has a "Load More" button, click it until it disappears
-                    while load_more_selector and self.load_more(load_more_selector):
-                        pass
-
-                    # If the page uses infinite scrolling, scroll to the bottom
-                    if infinite_scroll:
-                        self.infinite_scroll_page()
+                with self.scheduler.slot(url):
+                    self.throttle()
+                    with self.timer('navigation'):
+                        self.driver.get(url)
+                    self.pages_loaded += 1
+                    with self.timer('wait'):
+                        if not readiness.wait_for_jobs(self.driver):
+                            # Fails the slice, so its jobs are kept rather than purged as unlisted
+                            raise PageNotReady(f"No jobs on {url} within {readiness.max_wait}s")
+
+                    with self.timer('interaction'):
+                        # If the page has a "Load More" button, click it until it disappears
+                        while load_more_selector and self.load_more(load_more_selector, readiness):
+                            pass
+
+                        # If the page uses infinite scrolling, scroll to the bottom
+                        if infinite_scroll:
+                            self.infinite_scroll_page(readiness)
 
                     # Loop to navigate through multiple pages
-                    all_job_listings = []
-                    job_id = 0
+                    page = 1
 
                     while True:
-                        html = self.driver.page_source
-                        # create soup object only once per page
-                        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                        for job_element in soup.select(website_config['job_selector']):
-                            job_id += 1
-                            all_job_listings.append(self.scrape_job(job_element, website_config, job_id, job_type, category))
+                        if page > pages_done:
+                            self.scrape_browser_page(url, page, website_config, company, job_type, category, pages)
+                            if checkpoints is not None:
+                                self.pipeline.after(lambda page=page: checkpoints.page_done(url, page))
+                        else:
+                            logger.info(f"Page {page} of {url} was written before the run was interrupted, skipped")
+                        page += 1
+                        previous_url = self.driver.current_url
                         try:
                             # Break the loop if navigate_next_page() returns False
 
-                            if not self.navigate_next_page(next_page_selector):
+                            if not self.navigate_next_page(next_page_selector, readiness):
                                 break
                         except Exception as e:
                             logger.error(f"Error navigating to the next page: {str(e)}")
                             break
+                        if self.recycle_between_pages(previous_url, readiness):
+                            # Should the new browser fail, the retry doesn't extract the earlier pages again
+                            pages_done = max(pages_done, page - 1)
 
-                    return all_job_listings
-                else:
-                    response = requests.get(url)
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    all_job_listings = []
-                    job_id = 0
-                    for job_element in soup.select(website_config['job_selector']):
-                        job_id += 1
-                        all_job_listings.append(self.scrape_job(job_element, website_config, job_id))
-                    return all_job_listings
+                    if checkpoints is not None:
+                        self.pipeline.after(lambda: checkpoints.url_done(url))
+                    return
             except RequestException:
                 logger.warning(f"RequestException encountered on attempt {attempt + 1} of {max_attempts}")
+                if attempt == max_attempts - 1:
+                    # The page never loaded, scrape_job_urls has to keep the slice's unseen jobs
+                    raise
                 time.sleep(2)  # Wait for 2 seconds before the next attempt
 
 
-    def load_more(self, load_more_selector):
+    def get_readiness(self, website_config):
+        # One readiness tracker per site, kept for the scraper's lifetime
+        site = website_config.get('company_name', "Not Disclosing")
+        if site not in self._readiness:
+            self._readiness[site] = PageReadiness(website_config)
+        return self._readiness[site]
+
+    def scrape_static_urls(self, urls, website_config, company, job_type, category, checkpoints=None):
+        # Fetch all urls at once, asking the server to skip the ones that didn't change since the last run.
+        # The fetcher retries with its own backoff, so a failure here is final.
+        pages = PageTracker(urls)
+        responses = self.fetcher.fetch_all(urls, [pages.get_conditional_headers(url) for url in urls])
+
+        for url, response in zip(urls, responses):
+            self.telemetry.add(company, url, pages=1, navigation_seconds=response.elapsed.total_seconds())
+            check_unchanged = True
+            if response.status_code == 304:
+                if pages.refresh(url, 1, self.run_id):
+                    logger.info(f"Listing page not modified, skipped: {url}")
+                    self.telemetry.add(company, url, pages_unchanged=1)
+                    # Counted like an unchanged browser page, in the write stage that owns the stats
+                    self.pipeline.after(self.count_unchanged_page)
+                else:
+                    # Some of the page's known jobs are gone, so it has to be scraped in full
+                    response = self.fetcher.fetch(url)
+                    self.telemetry.add(company, url, navigation_seconds=response.elapsed.total_seconds())
+                    check_unchanged = False
+            if response.status_code != 304:
+                self.pipeline.put(FetchedPage(url, 1, website_config, company, job_type, category, pages,
+                                              html=response.text, response=response, check_unchanged=check_unchanged))
+            if checkpoints is not None:
+                self.pipeline.after(lambda url=url: checkpoints.url_done(url))
+
+    def scrape_api_urls(self, urls, website_config, company, job_type, category, checkpoints=None):
+        # Page through the site's JSON endpoints over the pooled HTTP client, no browser involved.
+        # Every response page goes through the same extract and write stages as a listing page.
+        source = ApiSource(website_config)
+        pages = PageTracker(urls)
+        for url in urls:
+            # Pages an interrupted run already wrote can simply be skipped
+            page = (checkpoints.get_pages_done(url) if checkpoints is not None else 0) + 1
+            total = None
+            while True:
+                response = self.fetcher.fetch(url, **source.get_request(page))
+                self.telemetry.add(company, url, pages=1, navigation_seconds=response.elapsed.total_seconds())
+                with self.telemetry.timer(company, url, 'parse'):
+                    job_data, page_total = source.parse(response.json())
+                # Some endpoints (Workday) only report the total on the first page
+                total = page_total or total
+
+                self.pipeline.put(FetchedPage(url, page, website_config, company, job_type, category, pages,
+                                              job_data=job_data,
+                                              fingerprint=fingerprint_elements([json.dumps(job_data, sort_keys=True)])))
+                if checkpoints is not None:
+                    self.pipeline.after(lambda url=url, page=page: checkpoints.page_done(url, page))
+
+                if not source.has_next_page(page, len(job_data), total):
+                    break
+                page += 1
+
+            if checkpoints is not None:
+                self.pipeline.after(lambda url=url: checkpoints.url_done(url))
+
+    def scrape_browser_page(self, url, page, website_config, company, job_type, category, pages):
+        self.telemetry.add(company, url, pages=1)
+        # Read the jobs straight out of the browser, unless the site sets "extraction": "html"
+        if website_config.get('extraction', 'browser') == 'browser':
+            try:
+                with self.telemetry.timer(company, url, 'parse'):
+                    serialized, job_data = BrowserExtractor(website_config).extract(self.driver)
+            except WebDriverException as e:
+                logger.warning(f"In-browser extraction failed, parsing the page source instead: {e}")
+            else:
+                self.pipeline.put(FetchedPage(url, page, website_config, company, job_type, category, pages,
+                                              job_data=job_data, fingerprint=fingerprint_elements([serialized])))
+                return
+
+        self.pipeline.put(FetchedPage(url, page, website_config, company, job_type, category, pages,
+                                      html=self.driver.page_source))
+
+    def extract_page(self, fetched_page):
+        with self.telemetry.timer(fetched_page.company, fetched_page.url, 'parse'):
+            self.parse_page(fetched_page)
+
+    def parse_page(self, fetched_page):
+        # Extract stage: parse the page only once, with the site's precompiled selectors
+        if fetched_page.job_data is None:
+            fetched_page.extractor = get_extractor(fetched_page.website_config)
+            fetched_page.job_elements = fetched_page.extractor.get_job_elements(fetched_page.html)
+            fetched_page.fingerprint = fingerprint_elements(
+                fetched_page.extractor.serialize(job_element) for job_element in fetched_page.job_elements
+            )
+        fetched_page.html = None
+
+        # Don't bother extracting a page whose job elements are exactly the ones we saw last time,
+        # the write stage only has to mark its jobs as seen
+        fetched_page.unchanged = fetched_page.check_unchanged and fetched_page.pages.is_unchanged(
+            fetched_page.url, fetched_page.page, fetched_page.fingerprint
+        )
+        if not fetched_page.unchanged:
+            fetched_page.job_listings = self.get_job_listings(fetched_page)
+
+    def get_job_listings(self, fetched_page):
+        job_data = fetched_page.job_data
+        if job_data is None:
+            job_data = fetched_page.extractor.extract(fetched_page.job_elements)
+        fetched_page.job_elements = None
+        return self.scrape_page_jobs(job_data, fetched_page.website_config)
+
+    def scrape_page_jobs(self, job_data, website_config):
+        # All dates of the page are parsed in one go, each distinct string once
+        site = website_config.get('company_name', "Not Disclosing")
+        dates = convert_dates([job['date'] for job in job_data], site)
+        return [self.scrape_job(job, website_config, dates) for job in job_data]
+
+    def count_unchanged_page(self):
+        self.stats['unchanged pages'] += 1
+
+    def write_page(self, fetched_page):
+        with self.telemetry.timer(fetched_page.company, fetched_page.url, 'write'):
+            self.save_page(fetched_page)
+
+    def save_page(self, fetched_page):
+        # Write stage: all jobs of the page in one batch
+        url, page, pages = fetched_page.url, fetched_page.page, fetched_page.pages
+        if fetched_page.unchanged:
+            if pages.refresh(url, page, self.run_id):
+                logger.info(f"Listing page unchanged, skipped: {url} (page {page})")
+                self.count_unchanged_page()
+                self.telemetry.add(fetched_page.company, url, pages_unchanged=1)
+                return
+            # Some of its known jobs are gone after all, so write the page in full
+            fetched_page.job_listings = self.get_job_listings(fetched_page)
+
+        job_listings = fetched_page.job_listings
+        new, changed, unchanged = ingest_jobs(job_listings, fetched_page.company, fetched_page.job_type, fetched_page.category, self.run_id)
+        pages.save(url, page, fetched_page.fingerprint, [job['identity_key'] for job in job_listings], fetched_page.response)
+        self.stats['new'] += new
+        self.stats['changed'] += changed
+        self.stats['existing'] += changed + unchanged
+        self.telemetry.add(fetched_page.company, url, jobs_found=len(job_listings), jobs_created=new, jobs_updated=changed)
+        logger.info(f"Saved {len(job_listings)} jobs from {url} (page {page}), {new} new")
+
+    def parse_listing_page(self, html, website_config):
+        extractor = get_extractor(website_config)
+        job_data = extractor.extract(extractor.get_job_elements(html))
+        return self.scrape_page_jobs(job_data, website_config)
+
+    def load_more(self, load_more_selector, readiness):
         try:
             load_more_button = self.driver.find_element(By.CSS_SELECTOR, load_more_selector)
-            last_height = self.driver.execute_script("return document.body.scrollHeight")
+            last_count = readiness.count_jobs(self.driver)
 
             try:
                 # Use JavaScript to click the button
+                self.throttle()
                 self.driver.execute_script("arguments[0].click();", load_more_button)
             except WebDriverException as e:
-                # If an error occurs, print it out and return False
-                print(f"An error occurred while trying to click the load more button: {e}")
-                return False
-
-            time.sleep(7)
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if last_height == new_height:
+                logger.warning(f"An error occurred while trying to click the load more button: {e}")
                 return False
-            last_height = new_height
 
-            return True
+            # No new jobs within the site's timeout means there is nothing more to load
+            return readiness.wait_for_job_count_change(self.driver, last_count)
         except NoSuchElementException:
             return False
         except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+            logger.exception(f"An unexpected error occurred: {e}")
             return False
 
-    def navigate_next_page(self, next_page_selector):
+    def navigate_next_page(self, next_page_selector, readiness):
         try:     
             if next_page_selector is not None and isinstance(next_page_selector, str):
                 next_page_element = self.driver.find_elements(By.CSS_SELECTOR, next_page_selector)
                 if next_page_element:
-                    try:
-                        # Try clicking the element first
-                        next_page_element[-1].click()
-                        
-                    except WebDriverException:
-                        next_page_url = next_page_element[-1].get_attribute("href")
-
-                        if not next_page_url:
-                            return False
-                        else:
-                            self.driver.get(next_page_url)
-                    time.sleep(7)
-                    return True
+                    last_signature = readiness.get_job_signature(self.driver)
+                    self.throttle()
+                    with self.timer('navigation'):
+                        try:
+                            # Try clicking the element first
+                            next_page_element[-1].click()
+
+                        except WebDriverException:
+                            next_page_url = next_page_element[-1].get_attribute("href")
+
+                            if not next_page_url:
+                                return False
+                            else:
+                                self.driver.get(next_page_url)
+                    self.pages_loaded += 1
+                    # A next button that doesn't change the job list means we are on the last page
+                    with self.timer('wait'):
+                        return readiness.wait_for_job_signature_change(self.driver, last_signature)
             return False
         except Exception as e:
             logger.error(f"Error in navigating to the next page: {e}")
             return False
 
 
-    def infinite_scroll_page(self):
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
+    def infinite_scroll_page(self, readiness):
         while True:
+            last_height = self.driver.execute_script("return document.body.scrollHeight")
+            last_count = readiness.count_jobs(self.driver)
+            self.throttle()
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(7)
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+            if not readiness.wait_for_height_or_count_change(self.driver, last_height, last_count):
                 break
-            last_height = new_height
 
     def get_soup(self, url, load_more_selector=None, infinite_scroll=False, next_page_selector=None):
         html = self.load_website(url, load_more_selector, infinite_scroll, next_page_selector)
         return BeautifulSoup(html, 'html.parser')
 
-    def scrape_jobs(self, website_config, job_categories, job_types):
-        JobListing.objects.update(to_be_deleted=True)
-        
-        load_more_selector = website_config.get('load_more_selector', None)
-        infinite_scroll = website_config.get('infinite_scroll', False)
-        next_page_selector = website_config.get('next_page_selector', None)
-
-        # We are getting or creating the company outside the loop.
-        company_name = website_config.get('company_name', "Not Disclosing")
-        company, created = Company.objects.get_or_create(name=company_name)
-        if created:
-            # If the company is newly created
-            company_logo = website_config.get('company_logo', None)
-            company_desc = website_config.get('company_desc', None)
-            company_career_url = website_config.get('company_career_url', None)
-            compnany_job_base_url = website_config.get('compnany_job_base_url', None)
-            company_tags = website_config.get('company_tags', [])  # This should be a list of tag names
-            # Add tags to the company
-            for tag_name in company_tags:
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                company.tags.add(tag)
-            company.logo = company_logo
-            company.description = company_desc
-            company.career_url = company_career_url
-            company.job_base_url = compnany_job_base_url
-            company.save()
-
-        all_job_listings = []
+    @staticmethod
+    def get_job_slices(website_config, job_categories, job_types, dimensions):
+        # Group the job urls by (category, job type) so that every slice is reconciled exactly once,
+        # even when the same slice is listed more than once in the website configuration.
+        slices = {}
         for job in website_config['job_urls']:
-            try:
-                category_id = job.get('category_id')
-                type_id = job.get('type_id')
-
-                category_name = job_categories.get(category_id, None)
-                type_name = job_types.get(type_id, None)
-                
-                if category_name:
-                    category, _ = Category.objects.get_or_create(name=category_name)
-                else:
-                    print(f"Category name for id {category_id} is not found. Skipping this job.")
-                    continue
+            category_id = job.get('category_id')
+            type_id = job.get('type_id')
 
-                if type_name:
-                    job_type, _ = JobType.objects.get_or_create(name=type_name)
-                else:
-                    print(f"Job type name for id {type_id} is not found. Skipping this job.")
-                    continue    
+            category_name = job_categories.get(category_id, None)
+            type_name = job_types.get(type_id, None)
 
-                JobListing.objects.filter(company=company, job_type=job_type, category=category).update(to_be_deleted=True)
+            category = dimensions.get_category(category_name)
+            job_type = dimensions.get_job_type(type_name)
 
-                for url in job.get('url', []):
-                    job_listings = self.load_website(url, load_more_selector, infinite_scroll, next_page_selector, website_config, job_type, category)
-                    all_job_listings.extend(job_listings)
-                
-                JobListing.objects.filter(to_be_deleted=True, company=company, category=category, job_type=job_type).delete()
-            except Exception as e:
-                JobListing.objects.filter(company=company, category=category, job_type=job_type).update(to_be_deleted=False)
-                print(f"An error occurred: {e}")
+            if not category:
+                logger.warning(f"Category name for id {category_id} is not found. Skipping this job.")
+                continue
 
-        return all_job_listings
+            if not job_type:
+                logger.warning(f"Job type name for id {type_id} is not found. Skipping this job.")
+                continue
 
-    @staticmethod
-    def scrape_job(job_element, website_config, job_id, job_type, category):
-        def get_text(element, selector, next_sibling=False):
-            if selector is None:
-                logger.warning(f"Selector for element '{element}' is missing in the website configuration.")
-                return None
-            selected_element = element.select_one(selector)
-            if selected_element:
-                if next_sibling:
-                    next_element = selected_element.nextSibling
-                    return next_element.strip() if next_element else None
-                else:
-                    return selected_element.get_text(strip=True)
+            key = (category.id, job_type.id)
+            if key not in slices:
+                slices[key] = (category, job_type, [])
+            slices[key][2].extend(job.get('url', []))
 
-            return None
+        return list(slices.values())
 
-        def get_link(element, selector, link_in_job_selector):
-            if link_in_job_selector:  # If the job link is in the job_selector
-                return element['href'] if 'href' in element.attrs else None
-            elif selector is None:  # If the job link is not in the job_selector
-                logger.warning(f"Selector for element '{element}' is missing in the website configuration.")
-                return None
-            else:
-                selected_element = element.select_one(selector)
-                return selected_element['href'] if selected_element and 'href' in selected_element.attrs else None
+    def scrape_jobs(self, website_config, job_categories, job_types):
+        dimensions = self.dimensions
+        if dimensions is None:
+            # Used on its own, resolve just this website's dimension rows
+            dimensions = DimensionCache.from_websites(
+                {'job_categories': job_categories, 'job_types': job_types, 'companies': [website_config]}
+            )
+        company = dimensions.get_company(website_config)
+
+        stats = Counter()
+        for category, job_type, urls in self.get_job_slices(website_config, job_categories, job_types, dimensions):
+            stats += self.scrape_job_urls(website_config, company, category, job_type, urls)
+
+        return stats
+
+    def scrape_job_urls(self, website_config, company, category, job_type, urls):
+        # Scrape and reconcile a single (company, category, job type) slice. Every job seen is
+        # stamped with the current run, and once the whole slice has been scraped the slice's rows
+        # from older runs are removed. Nothing outside the slice is touched, so several slices can
+        # be scraped at the same time.
+        load_more_selector = website_config.get('load_more_selector', None)
+        infinite_scroll = website_config.get('infinite_scroll', False)
+        next_page_selector = website_config.get('next_page_selector', None)
 
-        # Extract details
-        company_name = website_config.get('company_name', "Not Disclosing")
-        company = Company.objects.get(name=company_name)
+        run_id = self.run_id
+        stats_before = self.stats.copy()
+        failed = False
+        try:
+            # When resuming a run, urls it already completed are not scraped again. A slice that was
+            # done entirely only needs reconciling.
+            checkpoints = SliceCheckpoints(run_id, company, category, job_type)
+            remaining_urls = checkpoints.get_remaining_urls(urls)
+            try:
+                if self.is_api(website_config):
+                    # Sites with a JSON endpoint are read from it directly
+                    self.scrape_api_urls(remaining_urls, website_config, company, job_type, category, checkpoints)
+                elif self.is_dynamic(website_config):
+                    for url in remaining_urls:
+                        self.load_website(url, load_more_selector, infinite_scroll, next_page_selector, website_config, job_type, category, company, checkpoints)
+                else:
+                    # Static sites skip Selenium entirely and fetch all of the slice's urls at once
+                    self.scrape_static_urls(remaining_urls, website_config, company, job_type, category, checkpoints)
+            finally:
+                # Let the extract and write stages catch up with the slice's last page
+                errors = self.pipeline.flush()
+            if errors:
+                raise errors[0]
+
+            removed = purge(JobListing.objects.filter(company=company, category=category, job_type=job_type, last_seen_run__lt=run_id))
+            self.telemetry.add(company, '', jobs_removed=removed)
+        except Exception as e:
+            # The slice wasn't fully scraped, so keep its unseen rows until a run completes it
+            logger.exception(f"Scraping {company} ({category}, {job_type}) failed, its unseen jobs are kept: {e}")
+            failed = True
+        finally:
+            # Persist the observed wait times so the site's timeout can tighten on later runs
+            readiness = self._readiness.get(website_config.get('company_name', "Not Disclosing"))
+            if readiness is not None:
+                readiness.save()
+            self.telemetry.save(run_id)
+
+        stats = self.stats - stats_before
+        if failed:
+            stats['failed slices'] = 1
+        return stats
 
-        title = get_text(job_element, website_config.get('title_selector', None))
+    @staticmethod
+    def scrape_job(job_data, website_config, dates=None):
+        # Turn the raw text extracted from one job element into the fields we store
+        title = job_data['title']
         
-        location = get_text(job_element, website_config.get('location_selector', None), website_config.get('next_sibling', None))
-        print("LO", location)
+        location = job_data['location']
         if location is None or location.strip() == "":
             location = "United States"
-        date_posted_str = get_text(job_element, website_config.get('date_selector', None))
+        date_posted_str = job_data['date']
         
-        # Updated date_posted conversion
+        # Updated date_posted conversion, dates holds the page's already parsed dates
         date_posted = None
-        if date_posted_str is not None:
+        if date_posted_str is not None and dates is not None:
+            date_posted = dates.get(date_posted_str)
+        elif date_posted_str is not None:
             try:
-                date_posted = convert_date_format(date_posted_str)
+                date_posted = convert_date_format(date_posted_str, website_config.get('company_name', "Not Disclosing"))
             except ValueError as ve:
                 logger.warning(f"Failed to convert '{date_posted_str}' to a date. Error: {ve}")
 
-        link = get_link(job_element, website_config.get('link_selector', None), website_config.get('link_in_job_selector', False))     
+        link = job_data['link']
 
-        # Create job data
-        job_data = {
+        # The identity key says which job this is (its canonical url), the content hash whether
+        # anything about it changed since it was stored
+        return {
             'title': title,
+            'location': location,
+            # Most locations are placed offline, get_state geocodes the rest later
+            'state_location': resolve_state(location),
+            'date_posted': date_posted,
+            'posted_on': get_posted_on(date_posted),
             'link': link,
+            'identity_key': get_identity_key(title, link, website_config.get('compnany_job_base_url', None),
+                                             website_config.get('company_name', None)),
+            'content_hash': get_content_hash(title, location, date_posted, link),
         }
-
-        # Create a hash of the job data
-        job_hash = create_hash(job_data)
-
-        # Get or create a Job object
-        job, created = JobListing.objects.get_or_create(
-            hash=job_hash,
-            defaults={
-                'company': company,
-                'title': title,
-                'location': location,
-                'date_posted': date_posted,
-                'link': link,
-                'to_be_deleted': False,  # Newly scraped jobs are not marked as "to be deleted"
-                'job_type': job_type,
-                'category': category
-            }
-        )
-
-        if not created:
-            logger.info(f"Job already exists: {link}")
-            # If the job exists, unmark it as "to_be_deleted" and update the hash
-            job.to_be_deleted = False
-            job.save()
-
-        return job_data
\ No newline at end of file
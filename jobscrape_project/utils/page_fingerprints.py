@@ -0,0 +1,65 @@
+import hashlib
+import logging
+
+from jobs.models import JobListing, ListingPage
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_elements(job_elements):
+    # job_elements are the serialized (HTML) job elements of a page
+    digest = hashlib.sha1()
+    for job_element in job_elements:
+        digest.update(job_element.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class PageTracker:
+    # Remembers, per listing url and page number, the validators the server sent (static sites)
+    # and a fingerprint of the job elements (all sites), so unchanged pages can be skipped.
+
+    def __init__(self, urls):
+        self.pages = {
+            (listing_page.url, listing_page.page): listing_page
+            for listing_page in ListingPage.objects.filter(url__in=urls)
+        }
+
+    def get_conditional_headers(self, url, page=1):
+        listing_page = self.pages.get((url, page))
+        headers = {}
+        if listing_page is not None:
+            if listing_page.etag:
+                headers['If-None-Match'] = listing_page.etag
+            if listing_page.last_modified:
+                headers['If-Modified-Since'] = listing_page.last_modified
+        return headers
+
+    def is_unchanged(self, url, page, fingerprint):
+        listing_page = self.pages.get((url, page))
+        return listing_page is not None and listing_page.fingerprint == fingerprint
+
+    def refresh(self, url, page, run_id):
+        # Mark the page's known jobs as seen with one update. If some of them are no longer in
+        # the table (cleaned up since), the page has to be scraped in full after all.
+        listing_page = self.pages.get((url, page))
+        if listing_page is None:
+            return False
+        job_keys = listing_page.job_keys
+        updated = JobListing.objects.filter(identity_key__in=job_keys).update(last_seen_run=run_id)
+        if updated < len(job_keys):
+            logger.info(f"{len(job_keys) - updated} known jobs of {url} (page {page}) are gone, rescraping it")
+            return False
+        return True
+
+    def save(self, url, page, fingerprint, job_keys, response=None):
+        defaults = {
+            'fingerprint': fingerprint,
+            'job_keys': sorted(set(job_keys)),
+            'etag': None,
+            'last_modified': None,
+        }
+        if response is not None:
+            defaults['etag'] = response.headers.get('ETag')
+            defaults['last_modified'] = response.headers.get('Last-Modified')
+        self.pages[(url, page)], _ = ListingPage.objects.update_or_create(url=url, page=page, defaults=defaults)
@@ -0,0 +1,192 @@
+import logging
+import time
+
+from django.db import transaction
+from selenium.common.exceptions import (
+    JavascriptException, StaleElementReferenceException, TimeoutException, WebDriverException
+)
+from selenium.webdriver.support.ui import WebDriverWait
+
+from jobs.models import PageWaitStat
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for any single wait unless the site sets "max_wait" in websites.json
+DEFAULT_MAX_WAIT = 15
+# Learned page-ready timeouts never go below this
+MIN_WAIT = 2
+# Learned timeout = slowest typical wait times this margin
+TIMEOUT_MARGIN = 2
+# How many observed waits we need before trusting them, and how many we keep per site
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+POLL_FREQUENCY = 0.2
+# The page counts as settled once the DOM and the network have been quiet this long
+QUIET_PERIOD = 0.5
+# Some pages never go quiet (polling, analytics beacons), so settling is capped separately
+IDLE_TIMEOUT = 3
+
+# Counts in-flight XHR/fetch requests and remembers the last DOM mutation or network event.
+# Safe to run more than once per document.
+INSTRUMENT_SCRIPT = """
+if (!window.__scrapeReadiness) {
+    var state = window.__scrapeReadiness = {pending: 0, lastActivity: Date.now()};
+    var touch = function () { state.lastActivity = Date.now(); };
+    new MutationObserver(touch).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++;
+        touch();
+        this.addEventListener('loadend', function () { state.pending--; touch(); });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            state.pending++;
+            touch();
+            return fetch.apply(this, arguments).finally(function () { state.pending--; touch(); });
+        };
+    }
+}
+"""
+
+IDLE_SCRIPT = INSTRUMENT_SCRIPT + """
+var state = window.__scrapeReadiness;
+return state.pending <= 0 && Date.now() - state.lastActivity >= arguments[0];
+"""
+
+JOB_COUNT_SCRIPT = "return document.querySelectorAll(arguments[0]).length;"
+
+# Cheap signature of the current job list, used to notice that a new page has been rendered
+JOB_SIGNATURE_SCRIPT = """
+var jobs = document.querySelectorAll(arguments[0]);
+var parts = [jobs.length];
+for (var i = 0; i < Math.min(jobs.length, 3); i++) {
+    parts.push(jobs[i].textContent);
+}
+return parts.join('|');
+"""
+
+
+class PageNotReady(Exception):
+    # A listing page that showed no jobs even with the full max_wait
+    pass
+
+
+def instrument_driver(driver):
+    # Install the instrumentation before any page script runs, so requests fired during the
+    # initial load are counted too. The idle check re-installs it if this isn't available.
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': INSTRUMENT_SCRIPT})
+    except (WebDriverException, AttributeError) as e:
+        logger.info(f"Could not register the readiness script through CDP: {e}")
+
+
+def get_adaptive_timeout(samples, max_wait):
+    if len(samples) < MIN_SAMPLES:
+        return max_wait
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return min(max_wait, max(MIN_WAIT, p95 * TIMEOUT_MARGIN))
+
+
+class PageReadiness:
+    def __init__(self, website_config):
+        self.site = website_config.get('company_name', "Not Disclosing")
+        self.job_selector = website_config['job_selector']
+        self.max_wait = website_config.get('max_wait') or DEFAULT_MAX_WAIT
+
+        stat = PageWaitStat.objects.filter(site=self.site).first()
+        self.timeout = get_adaptive_timeout(stat.samples if stat else [], self.max_wait)
+        self.observed_waits = []
+
+    def wait(self, driver, condition, timeout=None, record=True):
+        start = time.monotonic()
+        try:
+            # Scripts can fail while a click is still navigating away, just poll again
+            WebDriverWait(driver, timeout or self.timeout, poll_frequency=POLL_FREQUENCY,
+                          ignored_exceptions=(JavascriptException, StaleElementReferenceException)).until(condition)
+        except TimeoutException:
+            return False
+        # Only successful waits are recorded, a timeout says nothing about how fast the site is
+        if record:
+            self.observed_waits.append(time.monotonic() - start)
+        return True
+
+    def count_jobs(self, driver):
+        return driver.execute_script(JOB_COUNT_SCRIPT, self.job_selector)
+
+    def get_job_signature(self, driver):
+        return driver.execute_script(JOB_SIGNATURE_SCRIPT, self.job_selector)
+
+    def is_idle(self, driver):
+        return driver.execute_script(IDLE_SCRIPT, QUIET_PERIOD * 1000)
+
+    def wait_for_page(self, driver):
+        # Jobs are rendered, or the page settled without any (an empty category)
+        def page_ready(d):
+            # 'interactive' is enough, with the eager page load strategy images etc. may still be loading
+            if d.execute_script("return document.readyState") == 'loading':
+                return False
+            return self.count_jobs(d) > 0 or self.is_idle(d)
+
+        ready = self.wait(driver, page_ready)
+        self.wait_for_idle(driver)
+        return ready
+
+    def wait_for_jobs(self, driver):
+        # wait_for_page() with the learned timeout, and if that runs out or the page settles without
+        # jobs, once more for jobs with the full max_wait. A page that is only slower than usual must
+        # not pass for an empty one: the slice's jobs would all be purged as no longer listed.
+        if self.wait_for_page(driver) and self.count_jobs(driver) > 0:
+            return True
+        logger.info(f"{self.site}: no jobs within {self.timeout:.2f}s, waiting up to {self.max_wait}s")
+        return self.wait_for_more(driver, lambda d: self.count_jobs(d) > 0)
+
+    def wait_for_idle(self, driver):
+        return self.wait(driver, self.is_idle, timeout=min(self.timeout, IDLE_TIMEOUT), record=False)
+
+    # A timeout in the waits below reads as "there is no more", so they always get the full max_wait:
+    # a learned timeout that is too tight would cut the listing short and its unseen jobs would be
+    # deleted. Only the page-ready wait above is tightened, and only it provides samples.
+
+    def wait_for_more(self, driver, condition):
+        return self.wait(driver, condition, timeout=self.max_wait, record=False)
+
+    def wait_for_job_count_change(self, driver, previous_count):
+        changed = self.wait_for_more(driver, lambda d: self.count_jobs(d) != previous_count)
+        if changed:
+            self.wait_for_idle(driver)
+        return changed
+
+    def wait_for_job_signature_change(self, driver, previous_signature):
+        def new_page(d):
+            signature = self.get_job_signature(d)
+            return signature != previous_signature and signature != '0'
+
+        changed = self.wait_for_more(driver, new_page)
+        if changed:
+            self.wait_for_idle(driver)
+        return changed
+
+    def wait_for_height_or_count_change(self, driver, previous_height, previous_count):
+        def grew(d):
+            height = d.execute_script("return document.body.scrollHeight")
+            return height != previous_height or self.count_jobs(d) != previous_count
+
+        changed = self.wait_for_more(driver, grew)
+        if changed:
+            self.wait_for_idle(driver)
+        return changed
+
+    def save(self):
+        if not self.observed_waits:
+            return
+        with transaction.atomic():
+            stat, _ = PageWaitStat.objects.select_for_update().get_or_create(site=self.site)
+            stat.samples = (stat.samples + self.observed_waits)[-MAX_SAMPLES:]
+            stat.save()
+        logger.info(f"{self.site}: {len(self.observed_waits)} waits, max {max(self.observed_waits):.2f}s, "
+                    f"timeout was {self.timeout:.2f}s")
+        self.observed_waits = []
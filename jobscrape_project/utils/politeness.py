@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import logging
+import multiprocessing
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per company overrides go in websites.json as "max_concurrency", "requests_per_minute" and "burst"
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 5
+
+
+def get_domain(url):
+    return (urlsplit(url).hostname or '').lower()
+
+
+class TokenBucket:
+    # Allows `burst` requests at once and `rate` requests per second after that. The state lives
+    # in shared memory, so one bucket can be shared by the threads and worker processes of a run.
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = multiprocessing.Lock()
+        self._state = multiprocessing.RawArray('d', [burst, time.monotonic()])  # tokens, last refill
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate)
+                self._state[1] = now
+                if tokens >= 1:
+                    self._state[0] = tokens - 1
+                    return
+                self._state[0] = tokens
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class DomainPolicy:
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 burst=DEFAULT_BURST):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.slots = multiprocessing.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+
+
+class PolitenessScheduler:
+    # Caps how many browsers/requests work on a host at the same time and how fast they may hit it.
+    # Build it in the parent process before starting workers so they all share the same limits.
+
+    def __init__(self, policies=None):
+        self.policies = policies or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_websites(cls, websites):
+        policies = {}
+        for website in websites.get('companies', []):
+            for job in website.get('job_urls', []):
+                for url in job.get('url', []):
+                    domain = get_domain(url)
+                    if domain not in policies:
+                        policies[domain] = DomainPolicy(
+                            max_concurrency=website.get('max_concurrency') or DEFAULT_MAX_CONCURRENCY,
+                            requests_per_minute=website.get('requests_per_minute') or DEFAULT_REQUESTS_PER_MINUTE,
+                            burst=website.get('burst') or DEFAULT_BURST,
+                        )
+        return cls(policies)
+
+    def __getstate__(self):
+        # The shared policies travel to spawned workers, the thread lock is per process
+        return {'policies': self.policies}
+
+    def __setstate__(self, state):
+        self.__init__(state['policies'])
+
+    def get_policy(self, url):
+        domain = get_domain(url)
+        policy = self.policies.get(domain)
+        if policy is None:
+            # A host that isn't in websites.json (a redirect, a next page link), limited in this process only
+            with self._lock:
+                policy = self.policies.get(domain)
+                if policy is None:
+                    policy = self.policies[domain] = DomainPolicy()
+        return policy
+
+    @contextmanager
+    def slot(self, url):
+        # Hold one of the host's concurrency slots for the duration of the block
+        policy = self.get_policy(url)
+        start = time.monotonic()
+        policy.slots.acquire()
+        waited = time.monotonic() - start
+        if waited > 1:
+            logger.info(f"Waited {waited:.1f}s for a free slot on {get_domain(url)}")
+        try:
+            yield
+        finally:
+            policy.slots.release()
+
+    def throttle(self, url):
+        # Block until the host's rate limit allows one more request
+        self.get_policy(url).bucket.acquire()
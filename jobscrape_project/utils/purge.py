@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def purge(queryset, batch_size=DEFAULT_BATCH_SIZE, pause=0, dry_run=False, progress=None):
+    # Delete the rows of queryset in primary key ranges of about batch_size rows, each in its own
+    # short transaction, with `pause` seconds between them so readers and writers get the locks
+    # back. Each batch is a regular delete(): on a model with no delete signals and nothing
+    # pointing to it (JobListing) Django turns it into one DELETE without loading any rows, and
+    # anywhere else cascades and signals still run. `progress(deleted, total)` is called after
+    # every batch. Returns the number of rows deleted (would be, with dry_run).
+    total = queryset.count()
+    if dry_run or not total:
+        return total
+
+    model = queryset.model
+    pk = model._meta.pk.attname
+    db = queryset.db
+    deleted = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by(pk)
+        if last_pk is not None:
+            batch = batch.filter(**{f'{pk}__gt': last_pk})
+        pks = list(batch.values_list(pk, flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic(using=db):
+            _, deleted_by_model = queryset.filter(**{f'{pk}__gte': pks[0], f'{pk}__lte': pks[-1]}).delete()
+        deleted += deleted_by_model.get(model._meta.label, 0)
+        last_pk = pks[-1]
+        if progress is not None:
+            progress(deleted, total)
+        if len(pks) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    logger.info(f"Purged {deleted} {model._meta.verbose_name_plural}")
+    return deleted
@@ -0,0 +1,147 @@
+import logging
+import queue
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Pages that can wait between two stages. When a queue is full the stage before it blocks,
+# so a slow database holds the browser back instead of piling pages up in memory.
+DEFAULT_QUEUE_SIZE = 4
+
+
+class FetchedPage:
+    # One listing page on its way through the pipeline. The fetch stage fills in either the
+    # html or, when the jobs were read inside the browser, job_data and its fingerprint.
+
+    def __init__(self, url, page, website_config, company, job_type, category, pages, html=None,
+                 job_data=None, fingerprint=None, response=None, check_unchanged=True):
+        self.url = url
+        self.page = page
+        self.website_config = website_config
+        self.company = company
+        self.job_type = job_type
+        self.category = category
+        self.pages = pages  # PageTracker of the page's url
+        self.html = html
+        self.job_data = job_data
+        self.fingerprint = fingerprint
+        self.response = response
+        self.check_unchanged = check_unchanged
+        # Set by the extract stage
+        self.unchanged = False
+        self.extractor = None
+        self.job_elements = None
+        self.job_listings = None
+
+
+class _Flush:
+    # Travels through the queues behind the pages put before it
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Callback:
+    def __init__(self, callback):
+        self.callback = callback
+
+
+class ScrapePipeline:
+    # fetch -> extract -> write. The fetch stage is the caller's thread (it owns the browser),
+    # extraction and database writes each run in a thread of their own, so a page is parsed
+    # and saved while the browser is already loading the next one.
+
+    def __init__(self, extract, write, queue_size=DEFAULT_QUEUE_SIZE):
+        self.extract = extract
+        self.write = write
+        self.extract_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._errors = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        self._threads = [
+            threading.Thread(target=self._run_extract, name='scrape-extract', daemon=True),
+            threading.Thread(target=self._run_write, name='scrape-write', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, fetched_page):
+        self.start()
+        self.extract_queue.put(fetched_page)
+
+    def after(self, callback):
+        # Run callback in the write stage once every page put so far is written, unless one of
+        # them failed since the last flush
+        self.put(_Callback(callback))
+
+    def flush(self):
+        # Wait until every page put so far is written and return the errors raised on the way
+        if self._threads:
+            marker = _Flush()
+            self.extract_queue.put(marker)
+            marker.done.wait()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def close(self):
+        if not self._threads:
+            return
+        self.extract_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _fail(self, stage, fetched_page, error):
+        logger.exception(f"{stage} failed for {fetched_page.url} (page {fetched_page.page}): {error}")
+        with self._lock:
+            self._errors.append(error)
+
+    def _run_extract(self):
+        while True:
+            item = self.extract_queue.get()
+            if item is None or isinstance(item, (_Flush, _Callback)):
+                self.write_queue.put(item)
+                if item is None:
+                    return
+                continue
+            try:
+                self.extract(item)
+            except Exception as e:
+                self._fail("Extraction", item, e)
+            else:
+                self.write_queue.put(item)
+
+    def _run_write(self):
+        try:
+            while True:
+                item = self.write_queue.get()
+                if item is None:
+                    return
+                if isinstance(item, _Flush):
+                    item.done.set()
+                    continue
+                if isinstance(item, _Callback):
+                    with self._lock:
+                        failed = bool(self._errors)
+                    if not failed:
+                        try:
+                            item.callback()
+                        except Exception as e:
+                            logger.exception(f"Pipeline callback failed: {e}")
+                            with self._lock:
+                                self._errors.append(e)
+                    continue
+                try:
+                    self.write(item)
+                except Exception as e:
+                    self._fail("Writing", item, e)
+        finally:
+            # The thread's own database connection
+            connection.close()
@@ -0,0 +1,80 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+import logging
+
+import django
+from django.apps import apps
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# The JobScraper owned by the current worker process
+_scraper = None
+
+
+def _init_worker(driver_path, run_id, browser_profile, scheduler):
+    global _scraper
+    # Spawned workers start from a fresh interpreter, forked ones already have Django loaded
+    if not apps.ready:
+        django.setup()
+
+    from utils.job_scraper import JobScraper
+
+    _scraper = JobScraper(driver_path=driver_path, dynamic=True, run_id=run_id, browser_profile=browser_profile,
+                          scheduler=scheduler)
+    # Pool workers leave through os._exit, so quit Chrome from a multiprocessing finalizer
+    Finalize(_scraper, _scraper.close, exitpriority=10)
+
+
+def _scrape_unit(website_config, company, category, job_type, urls):
+    return _scraper.scrape_job_urls(website_config, company, category, job_type, urls)
+
+
+def get_scrape_units(websites, dimensions):
+    from utils.job_scraper import JobScraper
+    from utils.politeness import get_domain
+
+    job_categories = websites.get('job_categories', {})
+    job_types = websites.get('job_types', {})
+
+    # Companies and dimensions come from the run's DimensionCache, resolved before any
+    # worker starts, so that the workers never race each other on get_or_create.
+    units_by_domain = defaultdict(list)
+    for website in websites["companies"]:
+        company = dimensions.get_company(website)
+        for category, job_type, urls in JobScraper.get_job_slices(website, job_categories, job_types, dimensions):
+            units_by_domain[get_domain(urls[0]) if urls else ''].append((website, company, category, job_type, urls))
+
+    # Start the biggest units first so a long site doesn't end up alone at the tail of the run
+    for domain_units in units_by_domain.values():
+        domain_units.sort(key=lambda unit: len(unit[4]), reverse=True)
+
+    # Take turns between domains (busiest first), so the workers don't all queue up on one
+    # host's concurrency limit while the other hosts sit idle
+    queues = sorted(units_by_domain.values(), key=lambda domain_units: sum(len(unit[4]) for unit in domain_units),
+                    reverse=True)
+    units = []
+    while queues:
+        units.extend(domain_units.pop(0) for domain_units in queues)
+        queues = [domain_units for domain_units in queues if domain_units]
+    return units
+
+
+def scrape_in_parallel(units, workers, driver_path, run_id, browser_profile=None, scheduler=None):
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+    # Workers write their jobs as they go and only send back how many they saw
+    stats = Counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(driver_path, run_id, browser_profile, scheduler)) as executor:
+        futures = {executor.submit(_scrape_unit, *unit): unit for unit in units}
+        for future in as_completed(futures):
+            website, company, category, job_type, urls = futures[future]
+            try:
+                stats += future.result()
+            except Exception as e:
+                logger.error(f"Scraping {company} / {category} / {job_type} failed: {e}")
+                stats['failed slices'] += 1
+
+    return stats
@@ -0,0 +1,58 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Q, Value
+
+# Text search configuration of both the stored vectors and the queries, they have to agree
+SEARCH_CONFIG = 'english'
+# Minimum trigram similarity of a title to a misspelled search. The % operator that uses the
+# trigram index applies pg_trgm.similarity_threshold (0.3 by default) first, so going lower also
+# takes lowering that setting.
+FUZZY_THRESHOLD = 0.3
+
+
+def get_search_vector(company_name, category_name):
+    # What JobListing.search_vector holds: the title counts most, then the company, the category
+    # and the location. The company and category names are passed in, an UPDATE can't join them.
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(company_name or ''), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(category_name or ''), weight='C', config=SEARCH_CONFIG)
+        + SearchVector('location', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset, company, category):
+    # Recompute the vectors of the jobs in queryset, which all belong to company and category.
+    # tsvectors only exist on PostgreSQL, elsewhere search_vector stays empty. Renaming a company
+    # or category with save() updates its jobs through jobs.signals; a queryset.update() of the
+    # names sends no signals and leaves the vectors stale until the jobs are scraped again.
+    if connections[queryset.db].vendor != 'postgresql':
+        return 0
+    return queryset.update(search_vector=get_search_vector(company.name, category.name if category else None))
+
+
+def get_search_query(search, synonyms=None):
+    # The search term OR'ed with its synonyms, as one tsquery
+    query = SearchQuery(search, search_type='plain', config=SEARCH_CONFIG)
+    for synonym in (synonyms or {}).get(search.lower(), []):
+        query |= SearchQuery(synonym, search_type='plain', config=SEARCH_CONFIG)
+    return query
+
+
+def search_jobs(queryset, search, synonyms=None, fuzzy=False):
+    # search_vector @@ query is answered from the GIN index, only the matches get ranked. With
+    # fuzzy, titles close to the search ("sofware enginer") match too, through the trigram index,
+    # and come after the full text matches.
+    query = get_search_query(search, synonyms)
+    if not fuzzy:
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by(F('rank').desc(nulls_last=True))
+
+    return queryset.annotate(
+        rank=SearchRank(F('search_vector'), query),
+        similarity=TrigramSimilarity('title', search),
+    ).filter(
+        Q(search_vector=query) | Q(title__trigram_similar=search, similarity__gte=FUZZY_THRESHOLD)
+    # Titles only found by similarity have no rank, NULLs would come first in a descending order
+    ).order_by(F('rank').desc(nulls_last=True), F('similarity').desc(nulls_last=True))
@@ -0,0 +1,101 @@
+from collections import Counter
+from contextlib import contextmanager
+import threading
+import time
+
+from django.db.models import Sum
+
+from jobs.models import ScrapeStat
+
+STAGES = ('navigation', 'wait', 'interaction', 'parse', 'write')
+COUNTERS = ('pages', 'pages_unchanged', 'jobs_found', 'jobs_created', 'jobs_updated', 'jobs_removed')
+FIELDS = tuple(f'{stage}_seconds' for stage in STAGES) + COUNTERS
+
+
+class ScrapeTelemetry:
+    # Collects stage timings and job counts per (company, url) in memory. The fetch, extract and
+    # write stages all report here from their own threads, save() writes them out as ScrapeStat rows.
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, company, url, **values):
+        key = (company.id if company is not None else None, url or '')
+        with self._lock:
+            self._stats.setdefault(key, Counter()).update(values)
+
+    @contextmanager
+    def timer(self, company, url, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(company, url, **{f'{stage}_seconds': time.perf_counter() - start})
+
+    def save(self, run_id):
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        ScrapeStat.objects.bulk_create([
+            ScrapeStat(run_id=run_id, company_id=company_id, url=url, **values)
+            for (company_id, url), values in stats.items()
+        ])
+
+
+def get_run_stats(run):
+    # A url can have several rows (a resumed run, a url shared by two slices), add them up
+    rows = (
+        run.stats.values('company__name', 'url')
+        .annotate(**{field: Sum(field) for field in FIELDS})
+        .order_by('company__name', 'url')
+    )
+    stats = [
+        {'company': row['company__name'], 'url': row['url'], **{field: row[field] or 0 for field in FIELDS}}
+        for row in rows
+    ]
+    totals = {field: sum(stat[field] for stat in stats) for field in FIELDS}
+    duration = None
+    if run.finished_at is not None:
+        duration = (run.finished_at - run.started_at).total_seconds()
+    return {
+        'run': run.id,
+        'started_at': run.started_at.isoformat(),
+        'finished_at': run.finished_at.isoformat() if run.finished_at is not None else None,
+        'duration_seconds': duration,
+        'totals': totals,
+        'stats': stats,
+    }
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(run_stats):
+    # Prometheus text exposition format, e.g. for the node exporter's textfile collector
+    run = escape_label(run_stats['run'])
+    lines = []
+
+    if run_stats['duration_seconds'] is not None:
+        lines += [
+            '# HELP jobscrape_run_duration_seconds Wall clock time of the scrape run.',
+            '# TYPE jobscrape_run_duration_seconds gauge',
+            f'jobscrape_run_duration_seconds{{run="{run}"}} {run_stats["duration_seconds"]}',
+        ]
+
+    metrics = [
+        ('jobscrape_stage_seconds', 'Time spent in each scrape stage.', 'stage',
+         [(stage, f'{stage}_seconds') for stage in STAGES]),
+        ('jobscrape_pages', 'Listing pages scraped, and skipped as unchanged.', 'kind',
+         [('scraped', 'pages'), ('unchanged', 'pages_unchanged')]),
+        ('jobscrape_jobs', 'Jobs found on the listing pages and what happened to them.', 'kind',
+         [('found', 'jobs_found'), ('created', 'jobs_created'), ('updated', 'jobs_updated'), ('removed', 'jobs_removed')]),
+    ]
+    for name, help_text, label, series in metrics:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        for stat in run_stats['stats']:
+            labels = f'run="{run}",company="{escape_label(stat["company"] or "")}",url="{escape_label(stat["url"])}"'
+            for label_value, field in series:
+                lines.append(f'{name}{{{labels},{label}="{label_value}"}} {stat[field]}')
+
+    return '\n'.join(lines) + '\n'